@@ -0,0 +1,480 @@
+"""
+영작문 첨삭 기능을 다른 학교 시스템에서 호출할 수 있도록 제공하는 ASGI 서비스
+
+실행 방법:
+    uvicorn api_server:app --host 0.0.0.0 --port 8000
+
+엔드포인트:
+- POST /check    {"text": ..., "profile": ...}   → 문법/맞춤법 오류 목록 (profile: fast|balanced|thorough)
+- POST /analyze  {"text": ...}                   → 텍스트 통계, 어휘 분석
+- POST /rewrite  {"text": ..., "level": ...}     → 재작성된 텍스트
+- POST /tts      {"text": ..., "voice": ...}     → 음성 파일 (audio/mpeg)
+- POST /tts/stream {"text": ..., "voice": ..., "format": "audio"|"ndjson"}
+                                                 → 합성되는 대로 보내는 음성 (chunked). ndjson이면 한 줄에 하나씩
+                                                   {"type": "audio", "data": base64} / {"type": "word", "text", "start", "duration"}
+- GET  /tts/jobs/<작업 ID>/audio                  → 화면에서 요청한 음성 합성 작업의 파일을 합성되는 대로 이어서 보냄
+- GET  /metrics                                  → Prometheus 지표 (처리 단계별 시간, 캐시, 엔진, API 실패)
+- GET  /cascade?limit=20                         → 엔진별 지연 시간/효용 통계와 최근 실행 결정 기록
+
+동시에 들어온 /check 요청은 마이크로 배치 스케줄러가 모아서 LanguageTool과 Gramformer를
+한 번에 호출합니다. 대기열이 가득 차면 429 응답으로 요청을 거절합니다.
+음성 스트리밍 응답은 본문을 다 보낼 때까지 처리 중인 요청으로 셉니다.
+"""
+import asyncio
+import base64
+import contextlib
+import json
+import os
+import tempfile
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from chunked_check import sentence_spans
+from engcheck_loader import load_eng_check
+from instrumentation import METRIC_HELP, increment, render_prometheus, span
+from job_queue import JobQueue, ACTIVE_STATUSES
+
+# 서비스 설정 (환경 변수로 조정)
+MAX_BATCH_SIZE = int(os.environ.get("ENGCHECK_MAX_BATCH_SIZE", "16"))
+MAX_BATCH_WAIT_MS = float(os.environ.get("ENGCHECK_MAX_BATCH_WAIT_MS", "20"))
+MAX_QUEUE_SIZE = int(os.environ.get("ENGCHECK_MAX_QUEUE_SIZE", "64"))
+MAX_INFLIGHT_REQUESTS = int(os.environ.get("ENGCHECK_MAX_INFLIGHT_REQUESTS", "64"))
+MAX_TEXT_LENGTH = int(os.environ.get("ENGCHECK_MAX_TEXT_LENGTH", "20000"))
+
+REQUESTS_REJECTED = "engcheck_requests_rejected_total"
+METRIC_HELP[REQUESTS_REJECTED] = "대기열이 가득 차 429로 거절한 요청 수"
+
+REWRITE_LEVELS = ("similar", "improved", "advanced")
+DEFAULT_VOICE = "en-US-JennyNeural"
+TTS_STREAM_FORMATS = ("audio", "ndjson")
+# 합성 중인 작업 파일에 새 조각이 쓰였는지 확인하는 간격(초)
+TTS_TAIL_INTERVAL = 0.1
+
+
+class QueueFullError(Exception):
+    """대기열이 가득 차 요청을 더 받을 수 없을 때 발생합니다."""
+
+
+class RequestError(Exception):
+    """요청 본문이 올바르지 않을 때 발생합니다."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class MicroBatcher:
+    """
+    동시에 들어온 요청을 짧은 시간 동안 모아 한 번의 배치 함수 호출로 처리하는 스케줄러
+
+    Parameters:
+    - name: 배치 이름 (로그, 오류 메시지용)
+    - batch_fn: 입력 목록을 받아 같은 순서의 결과 목록을 반환하는 동기 함수 (스레드 풀에서 실행)
+    - max_batch_size: 한 번에 묶을 최대 요청 수
+    - max_wait_ms: 첫 요청이 들어온 뒤 추가 요청을 기다리는 최대 시간
+    - max_queue_size: 대기열 한도. 넘으면 QueueFullError가 발생합니다
+    """
+
+    def __init__(self, name, batch_fn, max_batch_size=MAX_BATCH_SIZE,
+                 max_wait_ms=MAX_BATCH_WAIT_MS, max_queue_size=MAX_QUEUE_SIZE):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_queue_size = max_queue_size
+        self._queue = None
+        self._worker = None
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._worker
+            self._worker = None
+
+        # 처리되지 못한 요청은 실패로 응답
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(QueueFullError(f"{self.name} 배치 처리가 중단되었습니다"))
+
+    def submit(self, item):
+        """
+        요청을 대기열에 넣고 결과를 받을 Future를 반환합니다.
+        대기열이 가득 차 있으면 즉시 QueueFullError를 발생시킵니다.
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, future))
+        except asyncio.QueueFull:
+            raise QueueFullError(f"{self.name} 대기열이 가득 찼습니다")
+        return future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+
+            # 배치가 다 차지 않았으면 잠시 기다렸다가 그 사이 들어온 요청을 함께 처리
+            if self._queue.qsize() < self.max_batch_size - 1:
+                await asyncio.sleep(self.max_wait_ms / 1000)
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            # 클라이언트가 이미 포기한 요청은 제외
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            items = [item for item, _ in batch]
+            try:
+                results = await run_in_threadpool(self.batch_fn, items)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+class InflightLimiter:
+    """동시에 처리 중인 요청 수를 제한합니다. 한도를 넘으면 QueueFullError가 발생합니다."""
+
+    def __init__(self, limit=MAX_INFLIGHT_REQUESTS):
+        self.limit = limit
+        self.inflight = 0
+
+    def __enter__(self):
+        # 이벤트 루프 스레드에서만 호출되므로 별도의 잠금이 필요 없음
+        if self.inflight >= self.limit:
+            raise QueueFullError("처리 중인 요청이 너무 많습니다")
+        self.inflight += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+    def retain(self):
+        """이미 슬롯을 가진 요청이 블록을 나간 뒤에도 쓸 슬롯 하나를 한도 검사 없이 더 잡습니다."""
+        self.inflight += 1
+
+    def release(self):
+        self.inflight -= 1
+
+
+class HeldStreamingResponse(StreamingResponse):
+    """
+    본문을 다 보내거나 연결이 끊길 때까지 InflightLimiter 슬롯을 차지하는 스트리밍 응답
+    (핸들러가 반환한 뒤에도 합성이 계속되므로 반환할 때 슬롯을 돌려주면 한도가 적용되지 않음)
+    """
+
+    limiter = None
+
+    def hold(self, limiter):
+        limiter.retain()
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        # 본문 생성기가 시작되기 전에 연결이 끊겨 취소되어도 슬롯을 돌려주도록 생성기가 아니라 여기서 반납
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self.limiter is not None:
+                self.limiter.release()
+                self.limiter = None
+
+
+# LanguageTool 배치 함수: 여러 글의 문장을 모아 메모에 없는 문장만 한 번에 검사 (문맥 규칙은 글마다 검사)
+def languagetool_batch(texts):
+    checker = load_eng_check()
+    spans_per_text = [sentence_spans(text) for text in texts]
+    unique_sentences = list(dict.fromkeys(
+        text[start:end] for text, spans in zip(texts, spans_per_text) for start, end, _ in spans
+    ))
+    checked = dict(zip(unique_sentences, checker.check_sentences_with_languagetool(unique_sentences)))
+
+    return [
+        checker.merge_languagetool_errors(text, spans, [checked[text[start:end]] for start, end, _ in spans])
+        for text, spans in zip(texts, spans_per_text)
+    ]
+
+
+# Gramformer 배치 함수: 여러 글의 문장을 모아 중복 없이 한 번씩만 교정
+def gramformer_batch(texts):
+    checker = load_eng_check()
+    sentences_per_text = [checker.custom_sent_tokenize(text) for text in texts]
+    unique_sentences = list(dict.fromkeys(
+        sentence for sentences in sentences_per_text for sentence in sentences
+    ))
+    corrected = dict(zip(unique_sentences, checker.correct_sentences_with_gramformer(unique_sentences)))
+
+    return [
+        checker.gramformer_errors_from_correction(text, ' '.join(corrected[s] for s in sentences))
+        for text, sentences in zip(texts, sentences_per_text)
+    ]
+
+
+batchers = {
+    'languagetool': MicroBatcher('languagetool', languagetool_batch),
+    'gramformer': MicroBatcher('gramformer', gramformer_batch),
+}
+limiter = InflightLimiter()
+
+
+# 요청 본문에서 텍스트를 읽고 검증
+async def read_payload(request):
+    try:
+        payload = await request.json()
+    except Exception:
+        raise RequestError("JSON 형식의 요청 본문이 필요합니다")
+
+    if not isinstance(payload, dict) or not isinstance(payload.get("text"), str):
+        raise RequestError("'text' 필드(문자열)가 필요합니다")
+    if not payload["text"].strip():
+        raise RequestError("텍스트가 비어 있습니다")
+    if len(payload["text"]) > MAX_TEXT_LENGTH:
+        raise RequestError(f"텍스트는 최대 {MAX_TEXT_LENGTH}자까지 검사할 수 있습니다", status_code=413)
+    return payload
+
+
+# 처리 중인 요청 수 한도를 적용하는 데코레이터 (한도를 넘으면 429)
+def limited(handler, name=None):
+    name = name or handler.__name__
+
+    async def wrapper(request):
+        try:
+            with limiter:
+                response = await handler(request)
+                if isinstance(response, HeldStreamingResponse):
+                    response.hold(limiter)
+                return response
+        except QueueFullError as e:
+            increment(REQUESTS_REJECTED, endpoint=name)
+            return JSONResponse({"error": str(e)}, status_code=429, headers={"Retry-After": "1"})
+    return wrapper
+
+
+# 공통 오류 처리를 적용하는 엔드포인트 데코레이터
+def endpoint(handler):
+    async def call(request):
+        try:
+            payload = await read_payload(request)
+            with span(f"http:{handler.__name__}"):
+                return await handler(payload)
+        except RequestError as e:
+            return JSONResponse({"error": str(e)}, status_code=e.status_code)
+    return limited(call, handler.__name__)
+
+
+@endpoint
+async def check(payload):
+    text = payload["text"]
+    checker = load_eng_check()
+    analysis_profile = payload.get("profile", checker.DEFAULT_ANALYSIS_PROFILE)
+    if analysis_profile not in checker.ANALYSIS_PROFILES:
+        raise RequestError(f"'profile'은 {', '.join(checker.ANALYSIS_PROFILES)} 중 하나여야 합니다")
+    profile_engines = checker.ANALYSIS_PROFILES[analysis_profile]['engines']
+
+    engines = []
+    # 긴 글은 배치에 넣지 않고 check_grammar가 조각 단위로 병렬 검사
+    if checker.has_languagetool and 'languagetool' in profile_engines and len(text) <= checker.LANGUAGETOOL_CHUNK_CHARS:
+        engines.append('languagetool')
+    if checker.has_gramformer and 'gramformer' in profile_engines:
+        engines.append('gramformer')
+
+    # 배치 엔진에 먼저 요청을 넣고, 하나라도 거절되면 이미 넣은 요청은 취소
+    futures = {}
+    try:
+        for name in engines:
+            futures[name] = batchers[name].submit(text)
+    except QueueFullError:
+        for future in futures.values():
+            future.cancel()
+        raise
+
+    results = await asyncio.gather(*futures.values(), return_exceptions=True)
+
+    # 배치 처리에 실패한 엔진은 check_grammar가 직접 실행하도록 결과에서 제외
+    engine_results = {
+        name: result for name, result in zip(futures, results)
+        if not isinstance(result, BaseException)
+    }
+
+    errors = await run_in_threadpool(checker.check_grammar, text, engine_results, analysis_profile)
+    return JSONResponse({"errors": errors, "profile": analysis_profile})
+
+
+@endpoint
+async def analyze(payload):
+    text = payload["text"]
+    checker = load_eng_check()
+
+    def run_analysis():
+        tokens = checker.vocabulary_tokens(text)
+        lexical = checker.measure_lexical_diversity(text, tokens)
+        vocab_profile = checker.profile_vocabulary(text, tokens)
+        return {
+            "stats": checker.analyze_text(text),
+            "vocab_analysis": checker.analyze_vocabulary(text),
+            "diversity_score": lexical["mattr"],
+            "lexical_metrics": lexical,
+            "vocab_level": vocab_profile["levels"],
+            "vocab_profile": vocab_profile,
+        }
+
+    return JSONResponse(await run_in_threadpool(run_analysis))
+
+
+@endpoint
+async def rewrite(payload):
+    level = payload.get("level", "similar")
+    if level not in REWRITE_LEVELS:
+        raise RequestError(f"'level'은 {', '.join(REWRITE_LEVELS)} 중 하나여야 합니다")
+
+    checker = load_eng_check()
+    rewritten = await run_in_threadpool(checker.rewrite_text, payload["text"], level)
+    return JSONResponse({"text": rewritten, "level": level})
+
+
+@endpoint
+async def tts(payload):
+    voice = payload.get("voice", DEFAULT_VOICE)
+    checker = load_eng_check()
+
+    fd, output_file = tempfile.mkstemp(prefix="speech_api_", suffix=".mp3")
+    os.close(fd)
+    try:
+        await checker.text_to_speech(payload["text"], voice, output_file)
+        with open(output_file, "rb") as f:
+            audio_bytes = f.read()
+    finally:
+        with contextlib.suppress(OSError):
+            os.remove(output_file)
+
+    return Response(audio_bytes, media_type="audio/mpeg")
+
+
+@endpoint
+async def tts_stream(payload):
+    voice = payload.get("voice", DEFAULT_VOICE)
+    stream_format = payload.get("format", "audio")
+    if stream_format not in TTS_STREAM_FORMATS:
+        raise RequestError(f"'format'은 {', '.join(TTS_STREAM_FORMATS)} 중 하나여야 합니다")
+    checker = load_eng_check()
+
+    if stream_format == "audio":
+        return HeldStreamingResponse(checker.stream_text_to_speech(payload["text"], voice), media_type="audio/mpeg")
+
+    # 오디오 조각 사이사이에 그때까지 도착한 단어 시간 정보를 함께 보냄
+    async def lines():
+        word_boundaries = []
+        sent = 0
+        async for audio in checker.stream_text_to_speech(payload["text"], voice, word_boundaries):
+            for word in word_boundaries[sent:]:
+                yield json.dumps(dict(word, type="word"), ensure_ascii=False) + "\n"
+            sent = len(word_boundaries)
+            yield json.dumps({"type": "audio", "data": base64.b64encode(audio).decode()}) + "\n"
+        for word in word_boundaries[sent:]:
+            yield json.dumps(dict(word, type="word"), ensure_ascii=False) + "\n"
+
+    return HeldStreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+# 작업 대기열 데이터베이스 (화면의 음성 합성 작업 조회용, 이 프로세스에서는 작업을 실행하지 않음)
+_job_store = None
+
+
+def get_job_store():
+    global _job_store
+    if _job_store is None:
+        _job_store = JobQueue()
+    return _job_store
+
+
+@limited
+async def tts_job_audio(request):
+    job_id = request.path_params["job_id"]
+    store = get_job_store()
+    job = await run_in_threadpool(store.get, job_id)
+    if job is None or job["kind"] != "tts":
+        return JSONResponse({"error": "음성 합성 작업을 찾을 수 없습니다"}, status_code=404)
+
+    # 작업 스레드가 파일 끝에 이어 쓰는 조각을 따라가며 보내고, 작업이 끝나면 남은 부분까지 보낸 뒤 종료
+    async def tail():
+        position = 0
+        while True:
+            job = await run_in_threadpool(store.get, job_id)
+            if job is None:
+                # 보내는 도중 작업 기록이 지워짐
+                return
+            source = job["result"] if job["status"] == "done" else job["progress"]
+            path = (source or {}).get("path")
+            if path and os.path.exists(path):
+                with open(path, "rb") as f:
+                    f.seek(position)
+                    data = f.read()
+                if data:
+                    position += len(data)
+                    yield data
+            if job["status"] not in ACTIVE_STATUSES:
+                return
+            await asyncio.sleep(TTS_TAIL_INTERVAL)
+
+    return HeldStreamingResponse(tail(), media_type="audio/mpeg")
+
+
+async def metrics(request):
+    return Response(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+async def cascade(request):
+    try:
+        limit = int(request.query_params.get("limit", "20"))
+    except ValueError:
+        return JSONResponse({"error": "'limit'은 정수여야 합니다"}, status_code=400)
+    planner = load_eng_check().get_cascade_planner()
+    return JSONResponse({"engines": planner.status(), "decisions": planner.recent(limit)})
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # 첫 요청이 모델 로드를 기다리지 않도록 시작할 때 미리 불러옴
+    await run_in_threadpool(load_eng_check)
+    for batcher in batchers.values():
+        batcher.start()
+    try:
+        yield
+    finally:
+        for batcher in batchers.values():
+            await batcher.stop()
+
+
+app = Starlette(
+    routes=[
+        Route("/check", check, methods=["POST"]),
+        Route("/analyze", analyze, methods=["POST"]),
+        Route("/rewrite", rewrite, methods=["POST"]),
+        Route("/tts", tts, methods=["POST"]),
+        Route("/tts/stream", tts_stream, methods=["POST"]),
+        Route("/tts/jobs/{job_id}/audio", tts_job_audio, methods=["GET"]),
+        Route("/metrics", metrics, methods=["GET"]),
+        Route("/cascade", cascade, methods=["GET"]),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=os.environ.get("ENGCHECK_HOST", "127.0.0.1"),
+                port=int(os.environ.get("ENGCHECK_PORT", "8000")))
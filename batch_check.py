@@ -0,0 +1,143 @@
+"""
+여러 작문 파일을 한 번에 검사하는 명령행 도구
+
+사용법:
+    python batch_check.py essays/*.txt
+    python batch_check.py essay.txt --task analyze --output results.jsonl
+    python batch_check.py essay.txt --task rewrite --level advanced
+    python batch_check.py slow_essay.txt --profile --top 40
+    python batch_check.py essays/*.txt --analysis-profile fast
+
+--profile을 주면 파일마다 실행을 cProfile과 샘플링 프로파일러로 기록해
+상위 함수 표(.txt), flame graph용 folded stack(.folded), pstats 원본(.prof)을 저장합니다
+(기본 위치: data/profiles, ENGCHECK_PROFILE_DIR 또는 --profile-dir로 변경).
+
+--analysis-profile은 실행할 검사 엔진과 시간 예산을 정합니다. 일괄 채점은 시간 여유가 있으므로
+기본값은 모든 엔진을 실행하는 'thorough'입니다.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+
+from engcheck_loader import load_eng_check
+from profiling import DEFAULT_PROFILE_DIR, DEFAULT_TOP_N, profile_run, render_report
+
+TASKS = ('check', 'analyze', 'rewrite')
+ANALYSIS_PROFILES = ('fast', 'balanced', 'thorough')
+REWRITE_LEVELS = ('similar', 'improved', 'advanced')
+
+
+def run_task(checker, task, text, level="similar", analysis_profile="thorough"):
+    """
+    텍스트 하나에 작업을 실행하고 JSON으로 저장할 수 있는 결과를 반환합니다.
+
+    Parameters:
+    - checker: engcheck_loader.load_eng_check()로 불러온 모듈
+    - task: 'check' (문법 검사), 'analyze' (전체 분석), 'rewrite' (재작성)
+    - level: 재작성 수준
+    - analysis_profile: 문법 검사 분석 프로파일 ('fast', 'balanced', 'thorough')
+    """
+    if task == 'check':
+        errors = checker.check_grammar(text, analysis_profile=analysis_profile)
+        return {'error_count': len(errors), 'grammar_errors': errors}
+    if task == 'analyze':
+        errors = checker.check_grammar(text, analysis_profile=analysis_profile)
+        tokens = checker.vocabulary_tokens(text)
+        lexical = checker.measure_lexical_diversity(text, tokens)
+        vocab_profile = checker.profile_vocabulary(text, tokens)
+        return {
+            'error_count': len(errors),
+            'grammar_errors': errors,
+            'stats': checker.analyze_text(text),
+            'diversity_score': lexical['mattr'],
+            'lexical_metrics': lexical,
+            'vocab_level': vocab_profile['levels'],
+            'vocab_profile': vocab_profile,
+        }
+    return {'rewritten_text': checker.rewrite_text(text, level)}
+
+
+def format_band_matrix(names, batch, band_labels):
+    """profile_vocabulary_batch 결과를 파일별 빈도 구간 토큰 수 표로 만듭니다."""
+    width = max(len(name) for name in names)
+    lines = [" " * width + "".join(f"{label:>8}" for label in band_labels) + f"{'평균순위':>8}"]
+    for name, row, mean_rank in zip(names, batch['band_counts'], batch['mean_rank']):
+        lines.append(f"{name:<{width}}" + "".join(f"{count:>8}" for count in row) + f"{mean_rank:>8.0f}")
+    return "\n".join(lines)
+
+
+def read_inputs(paths):
+    """(이름, 텍스트) 목록을 반환합니다. '-'는 표준 입력입니다."""
+    for path in paths:
+        if path == "-":
+            yield "stdin", sys.stdin.read()
+        else:
+            with open(path, encoding="utf-8") as f:
+                yield path, f.read()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="작문 파일 일괄 검사")
+    parser.add_argument("files", nargs="+", help="검사할 텍스트 파일 ('-'는 표준 입력)")
+    parser.add_argument("--task", choices=TASKS, default="check", help="실행할 작업")
+    parser.add_argument("--level", choices=REWRITE_LEVELS, default="similar", help="재작성 수준")
+    parser.add_argument("--analysis-profile", choices=ANALYSIS_PROFILES, default="thorough",
+                        help="문법 검사 분석 프로파일 (실행할 엔진과 시간 예산)")
+    parser.add_argument("--output", help="결과를 JSON Lines로 저장할 경로")
+    parser.add_argument("--profile", action="store_true", help="파일마다 프로파일 결과 저장")
+    parser.add_argument("--profile-dir", default=DEFAULT_PROFILE_DIR, help="프로파일 결과 저장 위치")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP_N, help="프로파일 표에 넣을 함수 수")
+    args = parser.parse_args(argv)
+
+    checker = load_eng_check()
+    # 재작성은 문법 검사 엔진을 쓰지 않음
+    analysis_profile = args.analysis_profile if args.task != 'rewrite' else None
+    engines = checker.enabled_engines(analysis_profile) if analysis_profile else ()
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else None
+    analyzed = []
+    try:
+        for name, text in read_inputs(args.files):
+            if args.task == 'analyze':
+                analyzed.append((os.path.basename(name), text))
+            label = f"{args.task}_{os.path.basename(name)}"
+            if args.profile:
+                context = profile_run(label, len(text), engines, args.profile_dir, args.top,
+                                      analysis_profile=analysis_profile)
+            else:
+                context = contextlib.nullcontext()
+
+            start = time.perf_counter()
+            with context as report:
+                result = run_task(checker, args.task, text, args.level, args.analysis_profile)
+            elapsed = time.perf_counter() - start
+
+            summary = f"{name}: {len(text)}자, {elapsed:.2f}초"
+            if 'error_count' in result:
+                summary += f", 오류 {result['error_count']}개"
+            print(summary, flush=True)
+            if report is not None:
+                print(render_report(report), flush=True)
+
+            if output:
+                record = {'file': name, 'task': args.task, 'seconds': round(elapsed, 4), **result}
+                if report is not None:
+                    record['profile'] = report['paths']
+                output.write(json.dumps(record, ensure_ascii=False, default=list) + "\n")
+    finally:
+        if output:
+            output.close()
+
+    # 여러 글을 분석했으면 어휘 빈도 구간 분포를 한 번에 계산해 비교 표로 출력
+    if len(analyzed) > 1:
+        names = [name for name, _ in analyzed]
+        batch = checker.profile_vocabulary_batch([text for _, text in analyzed])
+        print(format_band_matrix(names, batch, checker.BAND_LABELS))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
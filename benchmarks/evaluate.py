@@ -0,0 +1,302 @@
+"""
+주석이 달린 학습자 작문 코퍼스(M2 형식)로 검사 엔진을 평가하는 오프라인 도구
+
+엔진을 빼거나 최적화하기 전에 각 엔진이 실제로 얼마나 기여하는지 확인하기 위해,
+check_grammar(분석 프로파일별)와 개별 검사 엔진을 코퍼스 문장마다 실행하고
+정답 수정(edit)과 비교해 정밀도/재현율/F0.5와 문장당 실행 시간을 보고합니다.
+규칙(rule)별로도 맞힌 수/틀린 수와 정밀도, 재현율 기여도(그 규칙이 찾은 정답 수정 / 코퍼스 전체
+정답 수정)를 보고하며, 한국인 학습자 규칙(rules/korean_learner.json)은 한 번도 일치하지 않은
+규칙까지 모두 표에 나옵니다.
+
+- 탐지(detect): 시스템 오류의 토큰 구간이 정답 수정 구간과 겹치면 맞힌 것으로 봄
+- 교정(correct): 구간이 같고 첫 번째 제안이 정답 수정과 같아야 맞힌 것으로 봄
+- Gramformer처럼 글 전체를 고친 결과(GRAMFORMER_CORRECTION)는 원문과 토큰 단위로 비교해
+  수정 구간으로 나눈 뒤 평가합니다.
+- F0.5는 정밀도에 재현율보다 두 배 무게를 둡니다 (잘못된 지적이 학생에게 더 해로움).
+
+M2 형식 (문장 토큰은 공백으로 구분, 구간은 토큰 번호 [시작, 끝)):
+    S This are a sentence .
+    A 1 2|||R:VERB:SVA|||is|||REQUIRED|||-NONE-|||0
+
+사용법 (저장소 루트에서):
+    python -m benchmarks.evaluate
+    python -m benchmarks.evaluate data/learner_essays.m2 --engines languagetool,spelling --output eval.json
+    python -m benchmarks.evaluate --stub-remote   # 외부 API는 benchmarks/stubs.py 구현으로 대체
+
+기본 코퍼스(benchmarks/corpus/learner_sample.m2)는 동작 확인용 작은 예시이므로, 엔진 선택은
+실제 학생 작문에 주석을 단 코퍼스로 판단해야 합니다.
+"""
+import argparse
+import contextlib
+import difflib
+import json
+import os
+import sys
+import time
+from collections import defaultdict, namedtuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from engcheck_loader import load_eng_check  # noqa: E402
+
+DEFAULT_M2_PATH = os.path.join(ROOT_DIR, "benchmarks", "corpus", "learner_sample.m2")
+WHOLE_TEXT_RULES = ('GRAMFORMER_CORRECTION',)
+NOOP_TYPES = ('noop', 'UNK', 'Um')
+
+Edit = namedtuple('Edit', 'start end correction kind')
+
+
+def read_m2(path, annotator=0):
+    """
+    M2 파일을 읽어 (토큰 목록, 정답 수정 목록)을 반환합니다.
+
+    Parameters:
+    - path: M2 파일 경로
+    - annotator: 사용할 주석자 번호 (주석자가 여러 명인 코퍼스)
+    """
+    with open(path, encoding="utf-8") as f:
+        blocks = f.read().strip().split("\n\n")
+    sentences = []
+    for block in blocks:
+        lines = block.strip().splitlines()
+        if not lines or not lines[0].startswith("S "):
+            continue
+        tokens = lines[0][2:].split()
+        edits = []
+        for line in lines[1:]:
+            span, kind, correction, _, _, annotator_id = line[2:].split("|||")
+            start, end = (int(value) for value in span.split())
+            if int(annotator_id) != annotator or kind in NOOP_TYPES or start < 0:
+                continue
+            edits.append(Edit(start, end, "" if correction == "-NONE-" else correction, kind))
+        sentences.append((tokens, edits))
+    return sentences
+
+
+def token_char_spans(tokens):
+    """공백으로 이어 붙인 문장에서 각 토큰의 (시작, 끝) 문자 위치"""
+    spans = []
+    position = 0
+    for token in tokens:
+        spans.append((position, position + len(token)))
+        position += len(token) + 1
+    return spans
+
+
+def token_span(spans, offset, length):
+    """문자 구간과 겹치는 토큰 구간 [시작, 끝). 겹치는 토큰이 없으면 None"""
+    covered = [index for index, (start, end) in enumerate(spans)
+               if start < offset + max(length, 1) and offset < end]
+    if not covered:
+        return None
+    return covered[0], covered[-1] + 1
+
+
+def diff_edits(tokens, corrected_text, kind):
+    """교정된 문장 전체를 원문과 토큰 단위로 비교해 수정 목록으로 나눕니다."""
+    corrected = corrected_text.split()
+    matcher = difflib.SequenceMatcher(None, tokens, corrected, autojunk=False)
+    return [Edit(i1, i2, " ".join(corrected[j1:j2]), kind)
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal']
+
+
+def system_edits(tokens, errors):
+    """검사 결과 오류 목록을 토큰 구간 수정 목록으로 바꿉니다 (kind에는 규칙 이름)."""
+    spans = token_char_spans(tokens)
+    edits = []
+    for error in errors:
+        rule = error.get('rule') or error.get('source') or "?"
+        replacement = error['replacements'][0] if error.get('replacements') else None
+        if rule in WHOLE_TEXT_RULES and replacement is not None:
+            edits.extend(diff_edits(tokens, replacement, rule))
+            continue
+        span = token_span(spans, error['offset'], error.get('length', 0))
+        if span is not None:
+            edits.append(Edit(span[0], span[1], replacement, rule))
+    # 같은 엔진이 같은 구간을 같은 제안으로 두 번 보고하면 한 번만 셈
+    return list({(edit.start, edit.end, edit.correction, edit.kind): edit for edit in edits}.values())
+
+
+def overlaps(system, gold):
+    """탐지 기준 일치 (삽입 수정은 구간 경계에 닿으면 일치)"""
+    if gold.start == gold.end:
+        return system.start <= gold.start <= system.end
+    if system.start == system.end:
+        return gold.start <= system.start <= gold.end
+    return system.start < gold.end and gold.start < system.end
+
+
+def same_correction(system, gold):
+    """교정 기준 일치"""
+    return (system.start == gold.start and system.end == gold.end and system.correction is not None
+            and system.correction.strip().lower() == gold.correction.strip().lower())
+
+
+class Score:
+    """맞힌 시스템 수정 수 / 전체 시스템 수정 수, 찾은 정답 수정 수 / 전체 정답 수정 수"""
+
+    def __init__(self):
+        self.true_positives = 0
+        self.system = 0
+        self.gold_found = 0
+        self.gold = 0
+
+    def add(self, system_edits_, gold_edits, match):
+        self.system += len(system_edits_)
+        self.true_positives += sum(any(match(system, gold) for gold in gold_edits) for system in system_edits_)
+        self.gold += len(gold_edits)
+        self.gold_found += sum(any(match(system, gold) for system in system_edits_) for gold in gold_edits)
+
+    def precision(self):
+        return self.true_positives / self.system if self.system else 0.0
+
+    def recall(self):
+        return self.gold_found / self.gold if self.gold else 0.0
+
+    def f05(self):
+        precision, recall = self.precision(), self.recall()
+        if not precision and not recall:
+            return 0.0
+        return 1.25 * precision * recall / (0.25 * precision + recall)
+
+    def as_dict(self):
+        return {'tp': self.true_positives, 'system': self.system, 'gold_found': self.gold_found, 'gold': self.gold,
+                'precision': round(self.precision(), 4), 'recall': round(self.recall(), 4),
+                'f0.5': round(self.f05(), 4)}
+
+
+def evaluate(check, sentences):
+    """
+    검사 함수 하나를 코퍼스 전체에 실행해 평가합니다.
+
+    Parameters:
+    - check: 텍스트 → 오류 목록 함수
+    - sentences: read_m2 결과
+
+    Returns:
+    - detect/correct 점수, 문장당 평균 시간(ms), 실패 수, 규칙별 점수 딕셔너리
+    """
+    detect, correct = Score(), Score()
+    rules = defaultdict(Score)
+    seconds = 0.0
+    failures = 0
+    for tokens, gold_edits in sentences:
+        text = " ".join(tokens)
+        start = time.perf_counter()
+        try:
+            errors = check(text)
+        except Exception as e:
+            failures += 1
+            print(f"  실패: {e}", file=sys.stderr)
+            errors = []
+        seconds += time.perf_counter() - start
+
+        edits = system_edits(tokens, errors)
+        detect.add(edits, gold_edits, overlaps)
+        correct.add(edits, gold_edits, same_correction)
+        by_rule = defaultdict(list)
+        for edit in edits:
+            by_rule[edit.kind].append(edit)
+        for rule, rule_edits in by_rule.items():
+            rules[rule].add(rule_edits, gold_edits, overlaps)
+    # 재현율 기여는 규칙이 일치한 문장이 아니라 코퍼스 전체 정답 수정 수로 나눔
+    for score in rules.values():
+        score.gold = detect.gold
+    return {
+        'detect': detect.as_dict(),
+        'correct': correct.as_dict(),
+        'ms_per_sentence': round(seconds / max(1, len(sentences)) * 1000, 2),
+        'failures': failures,
+        'rules': {rule: score.as_dict() for rule, score in sorted(rules.items())},
+    }
+
+
+def evaluation_targets(checker, engines=None, profiles=None):
+    """평가할 (이름, 검사 함수) 목록: 분석 프로파일별 check_grammar와 개별 엔진"""
+    targets = []
+    for profile in profiles if profiles is not None else checker.ANALYSIS_PROFILES:
+        targets.append((f"check_grammar:{profile}",
+                        lambda text, profile=profile: checker.check_grammar(text, analysis_profile=profile)))
+    for name, check in checker.grammar_engines().items():
+        if engines is None or name in engines:
+            targets.append((name, check))
+    return targets
+
+
+def format_engine_table(results):
+    lines = [f"{'엔진':<26}{'ms/문장':>9}{'탐지 P':>8}{'R':>7}{'F0.5':>7}{'교정 P':>8}{'R':>7}{'F0.5':>7}{'실패':>5}"]
+    for name, result in results.items():
+        detect, correct = result['detect'], result['correct']
+        lines.append(f"{name:<26}{result['ms_per_sentence']:>9.1f}"
+                     f"{detect['precision']:>8.2f}{detect['recall']:>7.2f}{detect['f0.5']:>7.2f}"
+                     f"{correct['precision']:>8.2f}{correct['recall']:>7.2f}{correct['f0.5']:>7.2f}"
+                     f"{result['failures']:>5}")
+    return "\n".join(lines)
+
+
+def format_rule_table(results, korean_rule_ids):
+    """개별 엔진의 규칙별 점수 표. 한국인 학습자 규칙은 일치하지 않았어도 모두 표시"""
+    lines = [f"{'엔진':<22}{'규칙':<36}{'맞음':>6}{'틀림':>6}{'정밀도':>8}{'재현율 기여':>10}"]
+    for name, result in results.items():
+        if name.startswith("check_grammar:"):
+            continue
+        rules = dict(result['rules'])
+        if name == 'korean_rules':
+            for rule_id in korean_rule_ids:
+                rules.setdefault(rule_id, Score().as_dict())
+        for rule, score in rules.items():
+            lines.append(f"{name:<22}{rule[:35]:<36}{score['tp']:>6}{score['system'] - score['tp']:>6}"
+                         f"{score['precision']:>8.2f}{score['recall']:>10.2f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="M2 주석 코퍼스로 검사 엔진 정밀도/재현율/F0.5 평가")
+    parser.add_argument("corpus", nargs="*", default=[DEFAULT_M2_PATH], help="M2 파일 경로")
+    parser.add_argument("--annotator", type=int, default=0, help="사용할 주석자 번호")
+    parser.add_argument("--engines", help="평가할 개별 엔진 (쉼표로 구분, 기본: 사용 가능한 모든 엔진)")
+    parser.add_argument("--profiles", help="평가할 check_grammar 분석 프로파일 (쉼표로 구분, 기본: 모두)")
+    parser.add_argument("--limit", type=int, help="평가할 최대 문장 수")
+    parser.add_argument("--stub-remote", action="store_true",
+                        help="외부 API(Sapling, GrammarBot, edge-tts)를 로컬 구현으로 대체")
+    parser.add_argument("--output", help="결과를 JSON으로 저장할 경로")
+    args = parser.parse_args(argv)
+
+    sentences = [sentence for path in args.corpus for sentence in read_m2(path, args.annotator)]
+    if args.limit:
+        sentences = sentences[:args.limit]
+
+    checker = load_eng_check()
+    stubs = contextlib.nullcontext()
+    if args.stub_remote:
+        from benchmarks.stubs import install_stubs
+        stubs = install_stubs(checker)
+
+    engines = args.engines.split(",") if args.engines else None
+    profiles = args.profiles.split(",") if args.profiles else None
+    gold_count = sum(len(edits) for _, edits in sentences)
+    print(f"문장 {len(sentences)}개, 정답 수정 {gold_count}개 ({', '.join(args.corpus)})", flush=True)
+
+    results = {}
+    with stubs:
+        for name, check in evaluation_targets(checker, engines, profiles):
+            print(f"평가 중: {name}", file=sys.stderr, flush=True)
+            results[name] = evaluate(check, sentences)
+
+    korean_rule_ids = [rule.id for rule in checker.get_rule_set("korean_learner").rules]
+    print(format_engine_table(results))
+    print()
+    print(format_rule_table(results, korean_rule_ids))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({'corpus': args.corpus, 'sentences': len(sentences), 'gold_edits': gold_count,
+                       'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"\n결과를 저장했습니다: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,442 @@
+"""
+골든 출력 회귀 검사
+
+성능 최적화나 엔진 교체가 학생에게 보이는 결과(오류 위치, 메시지, 교정 제안, 강조 HTML,
+재작성 결과)를 조용히 바꾸지 않았는지 확인합니다. 고정된 코퍼스(benchmarks/golden/corpus.json)로
+다음 함수의 출력을 만들어 저장된 기대 출력(benchmarks/golden/expected.json)과 비교합니다.
+
+- check_grammar (thorough 프로파일, 시간 예산으로 엔진이 빠지지 않도록)
+- grammar_engines()의 개별 검사 엔진
+- analyze_text, analyze_vocabulary, display_grammar_errors
+- rewrite_text (similar/improved/advanced, 텍스트마다 random.seed(0))
+
+네트워크, JVM, 모델 없이 실행할 수 있도록 LanguageTool, GrammarBot, Sapling, Gramformer와 spaCy
+구문 분석기는 실제 클라이언트 대신 기록해 둔 응답(benchmarks/golden/recordings.json)을 돌려주는
+클라이언트로 바꿉니다. 응답은 클라이언트 호출 단위(입력 텍스트 → 응답, spaCy는 Doc.to_json(),
+검사할 규칙을 고른 LanguageTool 요청은 "[enabled_only=...] 텍스트"처럼 규칙을 앞에 붙인 키)로
+기록되므로, 응답을 오류 목록으로 바꾸는 코드(위치 계산, 문장 분리, 병합, 구문 분석 규칙)는 그대로
+실행되어 검사 대상이 됩니다. 문장 메모는 크기 0으로 바꿔 호출 순서와 관계없이 같은 입력으로
+클라이언트를 부릅니다. 기록에 없는 입력으로 호출되면(예: 조각 나누기 방식이 바뀐 경우) 실패로
+보고하며, 이때는 엔진이 모두 있는 환경에서 --record로 다시 기록합니다.
+
+저장소의 recordings.json은 실제 응답 형식에 맞춰 손으로 작성한 응답입니다 (엔진별 source가 'fixture').
+--record는 실제 엔진의 응답으로 바꾸며(source 'recorded'), 호출이 하나라도 실패하거나 응답을 하나도
+기록하지 못한 엔진이 있으면(--allow-missing에 적은 엔진 제외) 아무 파일도 쓰지 않고 실패합니다.
+네트워크 오류가 기대 출력으로 굳어지지 않게 하기 위해서입니다.
+
+비교 결과는 출력마다 보여 줍니다. 오류 목록은 규칙/메시지/교정 제안이 같은 오류끼리 짝지어
+위치만 바뀐 경우를 "위치 이동"으로 따로 표시하고, 그 밖의 출력은 JSON 줄 단위 diff로 보여 줍니다.
+spaCy 모델, 철자 검사기처럼 기록하지 않는 로컬 의존성이 기대 출력을 만든 환경과 다르면 먼저 알려 줍니다.
+
+사용법 (저장소 루트에서):
+    python -m benchmarks.regression                 # 비교 (차이가 있으면 종료 코드 1)
+    python -m benchmarks.regression --only check_grammar,engine:
+    python -m benchmarks.regression --update        # 의도한 변경이면 기대 출력 갱신
+    python -m benchmarks.regression --record        # 실제 엔진으로 응답을 다시 기록하고 기대 출력 갱신
+    python -m benchmarks.regression --record --allow-missing grammarbot,gramformer
+
+set 순서가 실행마다 달라지지 않도록 PYTHONHASHSEED=0으로 다시 실행합니다.
+"""
+import argparse
+import contextlib
+import difflib
+import json
+import os
+import random
+import sys
+from types import SimpleNamespace
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from engcheck_loader import load_eng_check  # noqa: E402
+from sentence_memo import SentenceMemo  # noqa: E402
+import spacy  # noqa: E402
+from spacy.tokens import Doc  # noqa: E402
+
+GOLDEN_DIR = os.path.join(ROOT_DIR, "benchmarks", "golden")
+CORPUS_PATH = os.path.join(GOLDEN_DIR, "corpus.json")
+EXPECTED_PATH = os.path.join(GOLDEN_DIR, "expected.json")
+RECORDINGS_PATH = os.path.join(GOLDEN_DIR, "recordings.json")
+GOLDEN_PROFILE = "thorough"
+REWRITE_LEVELS = ('similar', 'improved', 'advanced')
+HASH_SEED = "0"
+
+# 기록하는 엔진: 이름 → (사용 가능 여부 플래그, 응답을 JSON으로 바꾸는 함수, JSON을 응답으로 되돌리는 함수)
+RECORDED_ENGINES = {
+    'languagetool': ('has_languagetool',
+                     lambda matches: [{'offset': match.offset, 'errorLength': match.errorLength,
+                                       'message': match.message, 'replacements': list(match.replacements),
+                                       'ruleId': match.ruleId} for match in matches],
+                     lambda value: [SimpleNamespace(**match) for match in value]),
+    'grammarbot': ('has_grammarbot',
+                   lambda result: [{'offset': match.offset, 'length': match.length, 'message': match.message,
+                                    'rule': match.rule, 'replacements': list(match.replacements)}
+                                   for match in result.matches],
+                   lambda value: SimpleNamespace(matches=[SimpleNamespace(**match) for match in value])),
+    'sapling': ('has_sapling', dict, dict),
+    'gramformer': ('has_gramformer', lambda candidates: list(candidates or []), list),
+    'spacy': (None, lambda doc: doc.to_json(), lambda value: Doc(PARSER_VOCAB).from_json(value)),
+}
+ALLOW_MISSING_DEFAULT = "grammarbot"
+# 재생한 Doc이 함께 쓰는 spaCy Vocab (lower_ 같은 어휘 속성을 계산하도록 영어 빈 모델의 것을 사용)
+PARSER_VOCAB = spacy.blank("en").vocab
+
+
+def rule_key(text, enabled_only=(), disabled=()):
+    """규칙을 골라 보낸 LanguageTool 요청의 기록 키 (규칙을 고르지 않았으면 텍스트 그대로)"""
+    labels = [f"{label}={','.join(sorted(rules))}"
+              for label, rules in (('enabled_only', enabled_only), ('disabled', disabled)) if rules]
+    return f"[{' '.join(labels)}] {text}" if labels else text
+
+
+class MissingRecording(KeyError):
+    pass
+
+
+class Recorder:
+    """
+    엔진 응답 기록
+
+    Parameters:
+    - recordings: recordings.json 내용 ({'engines': {엔진: {'enabled', 'client', 'responses'}}})
+    - recording: True이면 실제 클라이언트를 호출해 응답을 새로 기록
+    """
+
+    def __init__(self, recordings=None, recording=False):
+        self.engines = (recordings or {}).get('engines', {})
+        self.recording = recording
+        self.missing = []
+        self.failures = []
+        if recording:
+            self.engines = {}
+
+    def engine(self, name):
+        return self.engines.setdefault(name, {'enabled': False, 'client': False, 'responses': {},
+                                              'source': 'recorded'})
+
+    def respond(self, name, text, call):
+        """
+        기록 모드에서는 call()의 응답을 저장하고, 재생 모드에서는 저장한 응답을 돌려줍니다.
+        기록 중 호출이 실패하면 응답을 저장하지 않고 실패 목록에 남긴 뒤 예외를 그대로 전달합니다.
+        """
+        dump, load = RECORDED_ENGINES[name][1:]
+        responses = self.engine(name)['responses']
+        if self.recording:
+            try:
+                responses[text] = dump(call())
+            except Exception as e:
+                self.failures.append((name, text, f"{type(e).__name__}: {e}"))
+                raise
+        elif text not in responses:
+            self.missing.append((name, text))
+            raise MissingRecording(f"{name} 응답 기록 없음: {text[:40]!r}")
+        return load(responses[text])
+
+    def unrecorded(self, allowed=()):
+        """응답을 하나도 기록하지 못한 엔진 이름 목록 (allowed에 있는 엔진 제외)"""
+        return [name for name in RECORDED_ENGINES
+                if name not in allowed and not self.engine(name)['responses']]
+
+    def as_dict(self):
+        return {'engines': self.engines}
+
+
+class RecordedClient:
+    """검사 엔진 클라이언트 대체. 기록 모드에서는 실제 클라이언트를 부르고 응답을 저장합니다."""
+
+    def __init__(self, recorder, name, real=None):
+        self.recorder = recorder
+        self.name = name
+        self.real = real
+
+    def check(self, text, enabled_only=(), disabled=()):
+        return self.recorder.respond(self.name, rule_key(text, enabled_only, disabled),
+                                     lambda: self.real.check(text, enabled_only=enabled_only, disabled=disabled))
+
+    def edits(self, text, session_id=None):
+        return self.recorder.respond(self.name, text, lambda: self.real.edits(text, session_id=session_id))
+
+    def correct(self, sentence, max_candidates=1):
+        return self.recorder.respond(self.name, sentence,
+                                     lambda: self.real.correct(sentence, max_candidates=max_candidates))
+
+    def pipe(self, texts, batch_size=None):
+        # spaCy 모델: 문장마다 따로 분석한 Doc을 기록 (nlp.pipe와 같은 결과)
+        for text in texts:
+            yield self.recorder.respond(self.name, text, lambda: self.real(text))
+
+
+@contextlib.contextmanager
+def recorded_engines(checker, recorder):
+    """
+    eng-check 모듈의 외부 엔진 클라이언트를 RecordedClient로 바꾸고, 블록이 끝나면 원래대로 되돌립니다.
+    재생 모드에서는 기록할 때의 엔진 사용 가능 여부를 그대로 따릅니다.
+    """
+    def client(name, factory):
+        def make(*args, **kwargs):
+            engine = recorder.engine(name)
+            if not recorder.recording:
+                return RecordedClient(recorder, name) if engine['client'] else None
+            real = factory(*args, **kwargs)
+            if real is None:
+                return None
+            engine['client'] = True
+            return RecordedClient(recorder, name, real)
+        return make
+
+    patches = [
+        (checker, 'get_language_tool', client('languagetool', checker.get_language_tool)),
+        (checker, 'get_gramformer', client('gramformer', checker.get_gramformer)),
+        (checker, 'GrammarBotClient', client('grammarbot', getattr(checker, 'GrammarBotClient', None))),
+        (checker, 'SaplingClient', client('sapling', getattr(checker, 'SaplingClient', None))),
+        (checker, 'get_spacy_parser', client('spacy', checker.get_spacy_parser)),
+        (checker, 'get_sentence_memo', lambda engine: SentenceMemo(engine, "golden", maxsize=0, path=None)),
+    ]
+    for name, (flag, _, _) in RECORDED_ENGINES.items():
+        if flag is None:
+            # 사용 가능 여부 플래그가 없는 엔진은 클라이언트를 만들 수 있는지로 판단
+            recorder.engine(name)['enabled'] = True
+        elif recorder.recording:
+            recorder.engine(name)['enabled'] = bool(getattr(checker, flag, False))
+        else:
+            patches.append((checker, flag, recorder.engine(name)['enabled']))
+
+    originals = [(target, name, getattr(target, name, None)) for target, name, _ in patches]
+    previous_key = os.environ.get('SAPLING_API_KEY')
+    if not recorder.recording:
+        # Sapling 검사는 API 키가 있어야 클라이언트를 만들므로 기록할 때와 같은 조건으로 맞춤
+        os.environ['SAPLING_API_KEY'] = 'golden-replay' if recorder.engine('sapling')['client'] else ""
+    try:
+        for target, name, value in patches:
+            setattr(target, name, value)
+        yield
+    finally:
+        for target, name, value in originals:
+            setattr(target, name, value)
+        if previous_key is None:
+            os.environ.pop('SAPLING_API_KEY', None)
+        else:
+            os.environ['SAPLING_API_KEY'] = previous_key
+
+
+def environment(checker):
+    """기록하지 않는 로컬 의존성 중 결과에 영향을 주는 것"""
+    return {
+        'spell_checker': type(checker.get_spell_checker()).__name__,
+        'textblob': bool(checker.has_textblob),
+        'python': f"{sys.version_info.major}.{sys.version_info.minor}",
+    }
+
+
+def normalize(value):
+    """JSON으로 비교할 수 있는 형태로 바꿉니다 (tuple/set → list, 실수는 6자리 반올림)."""
+    if isinstance(value, dict):
+        return {str(key): normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted(normalize(item) for item in value)
+    if isinstance(value, float):
+        return round(value, 6)
+    return value
+
+
+def normalize_errors(errors):
+    """
+    오류 목록 정규화: errorLength는 length로 합치고 위치 순으로 정렬합니다 (같은 위치는 원래 순서 유지).
+    """
+    normalized = []
+    for error in errors:
+        error = dict(error)
+        length = error.pop('errorLength', None)
+        error.setdefault('length', length if length is not None else 0)
+        normalized.append(normalize(error))
+    return sorted(normalized, key=lambda error: (error.get('offset', 0), error['length']))
+
+
+def golden_outputs(checker, text):
+    """
+    텍스트 하나의 출력 이름 → 정규화한 출력. 함수가 예외를 내면 예외 내용을 출력으로 기록합니다.
+    """
+    def capture(fn):
+        try:
+            return fn()
+        except MissingRecording:
+            raise
+        except Exception as e:
+            return {'exception': f"{type(e).__name__}: {e}"}
+
+    def seeded_rewrite(level):
+        random.seed(0)
+        return checker.rewrite_text(text, level)
+
+    def display():
+        highlighted, details = checker.display_grammar_errors(text, errors)
+        return {'html': highlighted, 'details': normalize(details)}
+
+    outputs = {}
+    errors = capture(lambda: checker.check_grammar(text, analysis_profile=GOLDEN_PROFILE))
+    outputs['check_grammar'] = normalize_errors(errors) if isinstance(errors, list) else errors
+    if not isinstance(errors, list):
+        errors = []
+    for name, check in checker.grammar_engines().items():
+        outputs[f"engine:{name}"] = capture(lambda: normalize_errors(check(text)))
+    outputs['analyze_text'] = capture(lambda: normalize(checker.analyze_text(text)))
+    outputs['analyze_vocabulary'] = capture(lambda: normalize(checker.analyze_vocabulary(text)))
+    outputs['display_grammar_errors'] = capture(display)
+    for level in REWRITE_LEVELS:
+        outputs[f"rewrite:{level}"] = capture(lambda: seeded_rewrite(level))
+    return outputs
+
+
+def error_label(error):
+    rule = error.get('rule') or error.get('source') or "?"
+    return f"[{rule}] {error.get('message', '')!r} @{error.get('offset')}+{error.get('length')}"
+
+
+def diff_errors(expected, actual):
+    """오류 목록 차이. 규칙/메시지/교정 제안이 같은데 위치만 다른 오류는 위치 이동으로 표시합니다."""
+    def identity(error):
+        return json.dumps({key: value for key, value in error.items() if key not in ('offset', 'length', 'context')},
+                          sort_keys=True, ensure_ascii=False)
+
+    missing = [error for error in expected if error not in actual]
+    added = [error for error in actual if error not in expected]
+    lines = []
+    for error in list(missing):
+        moved = next((other for other in added if identity(other) == identity(error)), None)
+        if moved is not None:
+            missing.remove(error)
+            added.remove(moved)
+            lines.append(f"  위치 이동: {error_label(error)} → @{moved.get('offset')}+{moved.get('length')}")
+    lines.extend(f"  사라짐: {error_label(error)}" for error in missing)
+    lines.extend(f"  새로 생김: {error_label(error)}" for error in added)
+    if not lines:
+        lines.append("  순서 변경")
+    return lines
+
+
+def diff_output(expected, actual):
+    """출력 하나의 차이를 사람이 읽을 줄 목록으로 만듭니다 (같으면 빈 목록)."""
+    if expected == actual:
+        return []
+    if (isinstance(expected, list) and isinstance(actual, list)
+            and all(isinstance(error, dict) and 'offset' in error for error in expected + actual)):
+        return diff_errors(expected, actual)
+    before = json.dumps(expected, ensure_ascii=False, indent=1, sort_keys=True).splitlines()
+    after = json.dumps(actual, ensure_ascii=False, indent=1, sort_keys=True).splitlines()
+    return [f"  {line}" for line in difflib.unified_diff(before, after, "기대", "실제", lineterm="", n=1)]
+
+
+def compare(expected, actual, only=None):
+    """
+    기대 출력과 실제 출력을 비교합니다.
+
+    Returns:
+    - (텍스트 ID, 출력 이름, 차이 줄 목록) 목록
+    """
+    differences = []
+    for text_id in sorted(set(expected) | set(actual)):
+        expected_outputs, actual_outputs = expected.get(text_id, {}), actual.get(text_id, {})
+        for name in sorted(set(expected_outputs) | set(actual_outputs)):
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            if name not in actual_outputs:
+                differences.append((text_id, name, ["  출력 없음 (엔진이 빠졌거나 출력 이름이 바뀜)"]))
+            elif name not in expected_outputs:
+                differences.append((text_id, name, ["  기대 출력 없음 (--update로 추가)"]))
+            else:
+                lines = diff_output(expected_outputs[name], actual_outputs[name])
+                if lines:
+                    differences.append((text_id, name, lines))
+    return differences
+
+
+def read_json(path, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+        f.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="골든 출력 회귀 검사 (기록한 엔진 응답으로 네트워크/JVM 없이 실행)")
+    parser.add_argument("--only", help="비교할 출력 이름 접두어 (쉼표로 구분, 예: check_grammar,engine:)")
+    parser.add_argument("--update", action="store_true", help="현재 출력으로 기대 출력 파일을 갱신")
+    parser.add_argument("--record", action="store_true",
+                        help="실제 엔진을 호출해 응답을 다시 기록하고 기대 출력을 갱신 (엔진이 모두 있는 환경에서)")
+    parser.add_argument("--allow-missing", default=ALLOW_MISSING_DEFAULT,
+                        help=f"--record에서 응답이 없어도 되는 엔진 (쉼표로 구분, 기본값: {ALLOW_MISSING_DEFAULT})")
+    args = parser.parse_args(argv)
+
+    if os.environ.get("PYTHONHASHSEED") != HASH_SEED:
+        os.environ["PYTHONHASHSEED"] = HASH_SEED
+        os.execv(sys.executable, [sys.executable, os.path.abspath(__file__),
+                                  *(sys.argv[1:] if argv is None else argv)])
+
+    corpus = read_json(CORPUS_PATH)
+    golden = read_json(EXPECTED_PATH, {'environment': {}, 'outputs': {}})
+    recorder = Recorder(read_json(RECORDINGS_PATH), recording=args.record)
+    only = args.only.split(",") if args.only else None
+
+    checker = load_eng_check()
+    current_environment = environment(checker)
+    actual = {}
+    with recorded_engines(checker, recorder):
+        for item in corpus:
+            try:
+                actual[item['id']] = golden_outputs(checker, item['text'])
+            except MissingRecording as e:
+                print(f"{item['id']}: {e}", file=sys.stderr)
+    if recorder.missing:
+        print(f"기록에 없는 엔진 응답 {len(recorder.missing)}건: 엔진이 모두 있는 환경에서 --record로 다시 기록하세요.")
+        for name, text in recorder.missing[:10]:
+            print(f"  {name}: {text[:60]!r}")
+        return 1
+
+    if args.record:
+        # 실패한 호출이나 빠진 엔진은 기대 출력으로 저장하지 않음
+        unrecorded = recorder.unrecorded(allowed=args.allow_missing.split(","))
+        if recorder.failures or unrecorded:
+            print("기록하지 않았습니다 (기존 파일은 그대로입니다).")
+            if recorder.failures:
+                print(f"실패한 엔진 호출 {len(recorder.failures)}건 (네트워크, API 키를 확인하세요):")
+                for name, text, error in recorder.failures[:10]:
+                    print(f"  {name}: {text[:60]!r} → {error}")
+            if unrecorded:
+                print(f"응답을 하나도 기록하지 못한 엔진: {', '.join(unrecorded)} (설치, 설정을 확인하세요)")
+            return 1
+        write_json(RECORDINGS_PATH, recorder.as_dict())
+        print(f"엔진 응답을 기록했습니다: {RECORDINGS_PATH}")
+    if args.update or args.record:
+        write_json(EXPECTED_PATH, {'environment': current_environment, 'outputs': actual})
+        print(f"기대 출력을 갱신했습니다: {EXPECTED_PATH} (텍스트 {len(actual)}개)")
+        return 0
+
+    changed = {key: (value, current_environment.get(key))
+               for key, value in golden['environment'].items() if current_environment.get(key) != value}
+    if changed:
+        print("기대 출력을 만든 환경과 로컬 의존성이 다릅니다 (이로 인한 차이일 수 있음):")
+        for key, (before, after) in changed.items():
+            print(f"  {key}: {before} → {after}")
+
+    differences = compare(golden['outputs'], actual, only)
+    for text_id, name, lines in differences:
+        print(f"\n{text_id} / {name}")
+        print("\n".join(lines))
+    compared = sum(len(outputs) for outputs in actual.values())
+    print(f"\n출력 {compared}개 중 {len(differences)}개가 기대 출력과 다릅니다." if differences
+          else f"출력 {compared}개가 모두 기대 출력과 같습니다.")
+    return 1 if differences else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
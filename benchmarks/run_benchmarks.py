@@ -0,0 +1,265 @@
+"""
+검사 파이프라인 벤치마크
+
+고정된 학습자 작문 코퍼스(small/medium/large)로 각 검사기, 토크나이저, 재작성 함수,
+display_grammar_errors, 어휘 평가 함수와 전체 분석 흐름의 실행 시간을 측정하고
+결과를 JSON으로 저장합니다. 외부 API(Sapling, GrammarBot, GrammarCheck.io, edge-tts)는
+benchmarks/stubs.py의 로컬 구현으로 대체되므로 네트워크 없이 같은 조건에서 반복할 수 있습니다.
+
+사용법 (저장소 루트에서):
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --repeat 10 --sizes large --only check_grammar
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/<이전 커밋>.json --fail-on-regression
+
+결과 파일은 기본적으로 benchmarks/results/<커밋 해시>.json에 저장되어 커밋별로 비교할 수 있습니다.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from engcheck_loader import load_eng_check  # noqa: E402
+from benchmarks.stubs import install_stubs  # noqa: E402
+
+CORPUS_DIR = os.path.join(ROOT_DIR, "benchmarks", "corpus")
+RESULTS_DIR = os.path.join(ROOT_DIR, "benchmarks", "results")
+CORPUS_SIZES = ('small', 'medium', 'large')
+
+
+def load_corpus(sizes=CORPUS_SIZES):
+    corpus = {}
+    for size in sizes:
+        with open(os.path.join(CORPUS_DIR, f"{size}.txt"), encoding="utf-8") as f:
+            corpus[size] = f.read().strip()
+    return corpus
+
+
+def git_revision():
+    """현재 커밋 해시와 작업 트리 변경 여부를 반환합니다."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT_DIR,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return commit, dirty
+
+
+def seeded(fn):
+    """재작성 함수처럼 무작위성이 있는 함수를 같은 시드로 실행합니다."""
+    def run(text):
+        random.seed(0)
+        return fn(text)
+    return run
+
+
+def build_cases(checker, with_languagetool=False):
+    """
+    측정할 항목 목록을 만듭니다.
+
+    Returns:
+    - (이름, 그룹, 준비 함수) 목록. 준비 함수는 텍스트를 받아 측정할 인자 없는 함수를 반환합니다
+    """
+    def simple(fn):
+        return lambda text: (lambda: fn(text))
+
+    def display_case(text):
+        errors = checker.check_grammar(text)
+        return lambda: checker.display_grammar_errors(text, errors)
+
+    def tts_case(text):
+        def run():
+            fd, path = tempfile.mkstemp(prefix="bench_speech_", suffix=".mp3")
+            os.close(fd)
+            try:
+                checker.sync_text_to_speech(text, "en-US-JennyNeural", path)
+            finally:
+                os.remove(path)
+        return run
+
+    def full_analysis(text):
+        checker.analyze_text(text)
+        checker.check_grammar(text)
+        checker.analyze_vocabulary(text)
+        checker.calculate_lexical_diversity(text)
+        checker.evaluate_vocabulary_level(text)
+
+    cases = [
+        ("custom_sent_tokenize", "tokenizer", simple(checker.custom_sent_tokenize)),
+        ("custom_word_tokenize", "tokenizer", simple(checker.custom_word_tokenize)),
+        ("check_korean_english_errors", "checker", simple(checker.check_korean_english_errors)),
+        ("check_additional_patterns", "checker", simple(checker.check_additional_patterns)),
+        ("check_grammar_with_textblob", "checker", simple(checker.check_grammar_with_textblob)),
+        ("check_spelling", "checker", simple(checker.check_spelling)),
+        ("check_grammar_with_sapling", "checker", simple(checker.check_grammar_with_sapling)),
+        ("check_grammar_with_grammarbot", "checker", simple(checker.check_grammar_with_grammarbot)),
+        ("check_grammar_with_grammarcheck_api", "checker", simple(checker.check_grammar_with_grammarcheck_api)),
+        ("correct_grammar_with_gramformer", "checker", simple(checker.correct_grammar_with_gramformer)),
+        ("display_grammar_errors", "render", display_case),
+        ("analyze_text", "vocabulary", simple(checker.analyze_text)),
+        ("analyze_vocabulary", "vocabulary", simple(checker.analyze_vocabulary)),
+        ("calculate_lexical_diversity", "vocabulary", simple(checker.calculate_lexical_diversity)),
+        ("evaluate_vocabulary_level", "vocabulary", simple(checker.evaluate_vocabulary_level)),
+        ("rewrite_similar_level", "rewriter", simple(seeded(checker.rewrite_similar_level))),
+        ("rewrite_improved_level", "rewriter", simple(seeded(checker.rewrite_improved_level))),
+        ("rewrite_advanced_level", "rewriter", simple(seeded(checker.rewrite_advanced_level))),
+        ("sync_text_to_speech", "tts", tts_case),
+        ("check_grammar", "end_to_end", simple(checker.check_grammar)),
+        ("full_analysis", "end_to_end", simple(full_analysis)),
+    ]
+    if with_languagetool:
+        cases.insert(5, ("check_grammar_with_languagetool", "checker",
+                         simple(checker.check_grammar_with_languagetool)))
+    return cases
+
+
+def measure(fn, repeat, warmup=1):
+    """fn을 warmup번 실행한 뒤 repeat번 측정한 시간 통계(초)를 반환합니다."""
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.fmean(timings),
+        'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        'repeat': repeat,
+    }
+
+
+def run_benchmarks(sizes=CORPUS_SIZES, repeat=5, only=None, latency_ms=0, with_languagetool=False):
+    """
+    벤치마크를 실행하고 결과 딕셔너리를 반환합니다.
+
+    Parameters:
+    - sizes: 측정할 코퍼스 크기 목록
+    - repeat: 항목별 반복 측정 횟수
+    - only: 이름에 이 문자열들 중 하나가 포함된 항목만 측정
+    - latency_ms: 외부 API stub에 더할 가짜 지연
+    - with_languagetool: 실제 LanguageTool(JVM)도 측정할지 여부
+    """
+    checker = load_eng_check()
+    corpus = load_corpus(sizes)
+    commit, dirty = git_revision()
+
+    # LanguageTool은 JVM이 필요하므로 명시적으로 요청한 경우에만 실행
+    original_has_languagetool = checker.has_languagetool
+    checker.has_languagetool = original_has_languagetool and with_languagetool
+
+    results = {}
+    try:
+        with install_stubs(checker, latency_ms=latency_ms):
+            for name, group, prepare in build_cases(checker, checker.has_languagetool):
+                if only and not any(keyword in name for keyword in only):
+                    continue
+                results[name] = {'group': group}
+                for size, text in corpus.items():
+                    results[name][size] = measure(prepare(text), repeat)
+                    print(f"{name:40s} {size:7s} median {results[name][size]['median'] * 1000:10.2f} ms",
+                          flush=True)
+    finally:
+        checker.has_languagetool = original_has_languagetool
+
+    return {
+        'metadata': {
+            'commit': commit,
+            'dirty': dirty,
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': repeat,
+            'stub_latency_ms': latency_ms,
+            'corpus_words': {size: len(text.split()) for size, text in corpus.items()},
+            'engines': {
+                'languagetool': checker.has_languagetool and with_languagetool,
+                'gramformer': checker.has_gramformer,
+                'textblob': checker.has_textblob,
+                'spellchecker': checker.has_spellchecker,
+            },
+        },
+        'results': results,
+    }
+
+
+def compare_results(current, baseline, threshold=0.2, min_delta_ms=0.5):
+    """
+    두 결과의 중앙값을 비교해 느려진 항목 목록을 반환합니다.
+
+    Parameters:
+    - threshold: 이 비율 이상 느려지면 회귀로 판단 (0.2 = 20%)
+    - min_delta_ms: 차이가 이보다 작으면 측정 오차로 보고 무시
+    """
+    regressions = []
+    for name, sizes in current['results'].items():
+        for size, stats in sizes.items():
+            if size == 'group':
+                continue
+            base_stats = baseline['results'].get(name, {}).get(size)
+            if not base_stats:
+                continue
+            delta_ms = (stats['median'] - base_stats['median']) * 1000
+            ratio = stats['median'] / max(base_stats['median'], 1e-9)
+            marker = ""
+            if ratio > 1 + threshold and delta_ms > min_delta_ms:
+                marker = "  <-- 회귀"
+                regressions.append((name, size, ratio))
+            print(f"{name:40s} {size:7s} {base_stats['median'] * 1000:10.2f} ms -> "
+                  f"{stats['median'] * 1000:10.2f} ms ({ratio:5.2f}x){marker}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="영작문 검사 파이프라인 벤치마크")
+    parser.add_argument("--repeat", type=int, default=5, help="항목별 반복 측정 횟수")
+    parser.add_argument("--sizes", nargs="+", choices=CORPUS_SIZES, default=list(CORPUS_SIZES))
+    parser.add_argument("--only", nargs="+", help="이름에 이 문자열이 포함된 항목만 측정")
+    parser.add_argument("--stub-latency-ms", type=float, default=0, help="외부 API stub의 가짜 지연")
+    parser.add_argument("--with-languagetool", action="store_true", help="실제 LanguageTool(JVM)도 측정")
+    parser.add_argument("--output", help="결과 JSON 경로 (기본: benchmarks/results/<커밋>.json)")
+    parser.add_argument("--compare", help="비교할 이전 결과 JSON 경로")
+    parser.add_argument("--threshold", type=float, default=0.2, help="회귀로 판단할 느려짐 비율")
+    parser.add_argument("--fail-on-regression", action="store_true", help="회귀가 있으면 종료 코드 1")
+    args = parser.parse_args(argv)
+
+    result = run_benchmarks(args.sizes, args.repeat, args.only, args.stub_latency_ms, args.with_languagetool)
+
+    output = args.output
+    if not output:
+        metadata = result['metadata']
+        suffix = "-dirty" if metadata['dirty'] else ""
+        output = os.path.join(RESULTS_DIR, f"{metadata['commit']}{suffix}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"결과 저장: {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\n비교 기준: {baseline['metadata']['commit']} ({baseline['metadata']['timestamp']})")
+        regressions = compare_results(result, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)}개 항목이 {args.threshold:.0%} 이상 느려졌습니다.")
+            if args.fail_on_regression:
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
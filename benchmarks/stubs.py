@@ -0,0 +1,172 @@
+"""
+벤치마크용 외부 엔진 대체(stub) 구현
+
+Sapling, GrammarBot, GrammarCheck.io, edge-tts와 어휘 빈도 목록 다운로드를 네트워크 없이
+결정적인 결과를 돌려주는 로컬 구현으로 바꿉니다. latency_ms로 네트워크 지연을
+흉내 낼 수 있으며, 기본값 0이면 순수하게 로컬 처리 비용만 측정됩니다.
+"""
+import asyncio
+import contextlib
+import os
+import re
+import tempfile
+import time
+from types import SimpleNamespace
+
+import requests
+
+# 외부 API가 찾아낸 것처럼 보고할 간단한 오류 패턴 (정규식, 교정 제안, 메시지)
+STUB_ERROR_PATTERNS = [
+    (re.compile(r'\ba (?=[aeiou])', re.IGNORECASE), "an ", "Use 'an' before a vowel sound"),
+    (re.compile(r'\b(he|she|it) are\b', re.IGNORECASE), "is", "Subject-verb agreement"),
+    (re.compile(r'\beveryday\b'), "every day", "Did you mean 'every day'?"),
+]
+
+
+def find_stub_errors(text):
+    """STUB_ERROR_PATTERNS로 (시작, 끝, 교정 제안, 메시지) 목록을 만듭니다."""
+    return [
+        (match.start(), match.end(), replacement, message)
+        for pattern, replacement, message in STUB_ERROR_PATTERNS
+        for match in pattern.finditer(text)
+    ]
+
+
+class StubSaplingClient:
+    def __init__(self, api_key=None, latency_ms=0):
+        self.latency_ms = latency_ms
+
+    def edits(self, text, session_id=None):
+        time.sleep(self.latency_ms / 1000)
+        return [
+            {
+                'start': start,
+                'end': end,
+                'replacement': replacement,
+                'general_error_type': message,
+                'error_type': 'STUB_SAPLING',
+                'sentence': text[max(0, start - 20):end + 20],
+            }
+            for start, end, replacement, message in find_stub_errors(text)
+        ]
+
+
+class StubGrammarBotClient:
+    def __init__(self, latency_ms=0):
+        self.latency_ms = latency_ms
+
+    def check(self, text):
+        time.sleep(self.latency_ms / 1000)
+        matches = [
+            SimpleNamespace(offset=start, length=end - start, message=message,
+                            rule='STUB_GRAMMARBOT', replacements=[replacement])
+            for start, end, replacement, message in find_stub_errors(text)
+        ]
+        return SimpleNamespace(matches=matches)
+
+
+class StubResponse:
+    def __init__(self, status_code=200, payload=None, text=""):
+        self.status_code = status_code
+        self._payload = payload
+        self.text = text
+
+    def json(self):
+        return self._payload
+
+
+class StubCommunicate:
+    """edge_tts.Communicate 대체. 텍스트 길이에 비례하는 가짜 오디오를 만듭니다."""
+
+    bytes_per_char = 200
+    chunk_size = 4096
+
+    def __init__(self, text, voice, latency_ms=0):
+        self.text = text
+        self.voice = voice
+        self.latency_ms = latency_ms
+
+    def _audio(self):
+        return b"\x00" * (len(self.text) * self.bytes_per_char)
+
+    async def save(self, output_file):
+        await asyncio.sleep(self.latency_ms / 1000)
+        with open(output_file, "wb") as f:
+            f.write(self._audio())
+
+    async def stream(self):
+        await asyncio.sleep(self.latency_ms / 1000)
+        audio = self._audio()
+        for match in re.finditer(r"\S+", self.text):
+            yield {"type": "WordBoundary", "offset": match.start() * 10000,
+                   "duration": len(match.group(0)) * 10000, "text": match.group(0)}
+        for start in range(0, len(audio), self.chunk_size):
+            yield {"type": "audio", "data": audio[start:start + self.chunk_size]}
+
+
+def local_frequency_word_list(limit=50000):
+    """pyspellchecker에 포함된 단어 빈도 목록으로 어휘 빈도 데이터("단어 빈도" 형식)를 만듭니다."""
+    try:
+        from spellchecker import SpellChecker
+        frequencies = SpellChecker().word_frequency.dictionary
+        common = sorted(frequencies.items(), key=lambda item: item[1], reverse=True)[:limit]
+    except (ImportError, AttributeError):
+        common = []
+    return "\n".join(f"{word} {count}" for word, count in common)
+
+
+@contextlib.contextmanager
+def install_stubs(checker, latency_ms=0):
+    """
+    eng-check 모듈의 외부 엔진을 stub으로 바꾸고, 블록이 끝나면 원래대로 되돌립니다.
+
+    Parameters:
+    - checker: engcheck_loader.load_eng_check()로 불러온 모듈
+    - latency_ms: 외부 호출마다 추가할 가짜 네트워크 지연
+    """
+    frequency_text = local_frequency_word_list()
+    # stub 목록이 운영용 빈도 목록 파일을 덮어쓰지 않도록 임시 디렉터리에 저장되게 함
+    frequency_dir = tempfile.TemporaryDirectory(prefix="engcheck-frequency-")
+
+    def stub_post(url, *args, **kwargs):
+        time.sleep(latency_ms / 1000)
+        text = (kwargs.get('json') or {}).get('text', '')
+        matches = [
+            {'offset': start, 'length': end - start, 'message': message, 'replacements': [replacement]}
+            for start, end, replacement, message in find_stub_errors(text)
+        ]
+        return StubResponse(payload={'matches': matches})
+
+    def stub_get(url, *args, **kwargs):
+        time.sleep(latency_ms / 1000)
+        return StubResponse(text=frequency_text)
+
+    patches = [
+        (checker, 'SaplingClient', lambda api_key=None: StubSaplingClient(api_key, latency_ms)),
+        (checker, 'has_sapling', True),
+        (checker, 'GrammarBotClient', lambda: StubGrammarBotClient(latency_ms)),
+        (checker, 'has_grammarbot', True),
+        (requests, 'post', stub_post),
+        (requests, 'get', stub_get),
+        (checker.edge_tts, 'Communicate', lambda text, voice, **kwargs: StubCommunicate(text, voice, latency_ms)),
+        (checker, 'WORD_FREQUENCY_PATH', os.path.join(frequency_dir.name, "en_50k.txt")),
+    ]
+
+    originals = [(target, name, getattr(target, name, None)) for target, name, _ in patches]
+    previous_key = os.environ.get('SAPLING_API_KEY')
+    os.environ['SAPLING_API_KEY'] = 'benchmark-stub'
+    try:
+        for target, name, value in patches:
+            setattr(target, name, value)
+        checker.get_frequency_ranks.clear()
+        yield
+    finally:
+        for target, name, value in originals:
+            setattr(target, name, value)
+        # stub 목록으로 만든 캐시가 블록 밖에서 쓰이지 않도록 비움
+        checker.get_frequency_ranks.clear()
+        frequency_dir.cleanup()
+        if previous_key is None:
+            os.environ.pop('SAPLING_API_KEY', None)
+        else:
+            os.environ['SAPLING_API_KEY'] = previous_key
@@ -0,0 +1,156 @@
+"""
+긴 글을 문단/문장 묶음 단위로 나누어 병렬로 검사하는 모듈
+
+긴 글을 검사기 한 번의 호출로 보내면 전체가 하나의 직렬 요청이 되고, 중간에 실패하면
+결과 전체를 잃습니다. 이 모듈은 글을 문단과 문장 경계에서 나눈 조각(chunk)들을
+스레드 풀에서 동시에 검사하고, 각 오류의 위치를 원래 글 기준으로 되돌립니다.
+
+- 각 조각에는 앞뒤로 문장 몇 개를 문맥으로 덧붙여 검사합니다 (overlap).
+  문맥 부분에서 발견된 오류는 이웃 조각이 담당하므로 버려서 중복을 막습니다.
+- 조각 하나가 실패해도 한 번 다시 시도하고, 그래도 실패하면 그 조각만 빠집니다.
+"""
+import contextvars
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import span
+from profiling import profile_worker
+
+DEFAULT_CHUNK_CHARS = int(os.environ.get("ENGCHECK_CHUNK_CHARS", "1500"))
+DEFAULT_OVERLAP_SENTENCES = int(os.environ.get("ENGCHECK_CHUNK_OVERLAP", "1"))
+DEFAULT_CHUNK_WORKERS = int(os.environ.get("ENGCHECK_CHUNK_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+PARAGRAPH_PATTERN = re.compile(r'\n\s*\n')
+SENTENCE_PATTERN = re.compile(r'[^.!?\n]*(?:[.!?]+|\n|$)')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+# 프로세스 전체에서 공유하는 검사용 스레드 풀 (세션이 많아도 동시 검사 수가 늘지 않도록)
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=DEFAULT_CHUNK_WORKERS, thread_name_prefix="chunk-check")
+        return _executor
+
+
+def sentence_spans(text):
+    """
+    글을 문장 단위 (시작, 끝, 새 문단의 첫 문장 여부) 목록으로 나눕니다. 공백만 있는 부분은 건너뜁니다.
+    """
+    spans = []
+    previous_end = 0
+    for match in SENTENCE_PATTERN.finditer(text):
+        sentence = match.group(0)
+        stripped = sentence.strip()
+        if not stripped:
+            continue
+        start = match.start() + len(sentence) - len(sentence.lstrip())
+        new_paragraph = bool(spans) and PARAGRAPH_PATTERN.search(text, previous_end, start) is not None
+        spans.append((start, start + len(stripped), new_paragraph))
+        previous_end = start + len(stripped)
+    return spans
+
+
+def split_text_chunks(text, max_chars=DEFAULT_CHUNK_CHARS, overlap=DEFAULT_OVERLAP_SENTENCES):
+    """
+    글을 검사할 조각 목록으로 나눕니다.
+
+    문장을 차례로 모아 max_chars를 넘기 직전에 자르며, 조각이 절반 이상 찼으면
+    문단이 바뀌는 곳에서 먼저 자릅니다.
+
+    Parameters:
+    - text: 원본 텍스트
+    - max_chars: 조각 하나의 담당 부분(core) 최대 길이 (문장 하나가 더 길면 그 문장만 담당)
+    - overlap: 앞뒤로 문맥으로 덧붙일 문장 수
+
+    Returns:
+    - (조각 시작, 조각 끝, 담당 시작, 담당 끝) 목록. 담당 구간들은 글 전체를 빈틈없이 덮습니다
+    """
+    spans = sentence_spans(text)
+    if not spans:
+        return [(0, len(text), 0, len(text))]
+
+    groups = []
+    first = 0
+    for i in range(1, len(spans) + 1):
+        if i == len(spans):
+            groups.append((first, i - 1))
+            break
+        length = spans[i][1] - spans[first][0]
+        current = spans[i - 1][1] - spans[first][0]
+        if length > max_chars or (spans[i][2] and current >= max_chars // 2):
+            groups.append((first, i - 1))
+            first = i
+
+    chunks = []
+    for index, (first, last) in enumerate(groups):
+        # 담당 구간은 다음 묶음 시작 직전까지로 잡아 사이의 공백도 빠짐없이 포함
+        core_start = 0 if index == 0 else spans[first][0]
+        core_end = len(text) if index == len(groups) - 1 else spans[groups[index + 1][0]][0]
+        chunk_start = spans[max(0, first - overlap)][0] if index > 0 else 0
+        chunk_end = spans[min(len(spans) - 1, last + overlap)][1] if index < len(groups) - 1 else len(text)
+        chunks.append((chunk_start, chunk_end, core_start, core_end))
+    return chunks
+
+
+def rebase_errors(text, errors, chunk_start, core_start, core_end):
+    """
+    조각 기준 오류 위치를 원래 글 기준으로 옮기고, 담당 구간 밖에서 시작하는 오류는 버립니다.
+    문맥(context)은 원래 글에서 다시 잘라 조각 경계에서 잘리지 않게 합니다.
+    """
+    rebased = []
+    for error in errors:
+        offset = error['offset'] + chunk_start
+        if not core_start <= offset < core_end:
+            continue
+        length = error.get('length', error.get('errorLength', 0))
+        error = dict(error, offset=offset)
+        if 'context' in error:
+            error['context'] = text[max(0, offset - 20):min(len(text), offset + length + 20)]
+        rebased.append(error)
+    return rebased
+
+
+def check_in_chunks(text, check_chunk, name="chunk", max_chars=DEFAULT_CHUNK_CHARS,
+                    overlap=DEFAULT_OVERLAP_SENTENCES, executor=None):
+    """
+    글을 조각으로 나누어 병렬로 검사하고 오류 목록을 원래 글 기준으로 합쳐 반환합니다.
+
+    Parameters:
+    - text: 원본 텍스트
+    - check_chunk: 조각 텍스트를 받아 그 조각 기준 오류 목록(offset 포함)을 반환하는 함수
+    - name: 지표에 기록할 검사기 이름
+    - max_chars, overlap: split_text_chunks 참고
+    - executor: 사용할 스레드 풀 (기본: 공유 풀)
+
+    Returns:
+    - 위치 순으로 정렬된 오류 목록
+    """
+    chunks = split_text_chunks(text, max_chars, overlap)
+    if len(chunks) == 1:
+        return check_chunk(text)
+
+    def run(chunk):
+        chunk_start, chunk_end, core_start, core_end = chunk
+        chunk_text = text[chunk_start:chunk_end]
+        for attempt in range(2):
+            try:
+                with profile_worker(), span(f"chunk:{name}"):
+                    errors = check_chunk(chunk_text)
+                return rebase_errors(text, errors, chunk_start, core_start, core_end)
+            except Exception as e:
+                print(f"{name} 조각 검사 오류 ({chunk_start}-{chunk_end}, 시도 {attempt + 1}): {e}")
+        return []
+
+    executor = executor or get_executor()
+    # 조각별로 현재 context를 복사해 넘겨야 작업 스레드의 단계 기록도 요청의 trace에 모임
+    futures = [executor.submit(contextvars.copy_context().run, run, chunk) for chunk in chunks]
+    errors = []
+    for future in futures:
+        errors.extend(future.result())
+    return sorted(errors, key=lambda error: error['offset'])
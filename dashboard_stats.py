@@ -0,0 +1,209 @@
+"""
+교사 대시보드용 사전 집계 통계
+
+분석이 저장될 때마다 학생별 점수 추이, 오류 유형별 개수, 어휘 수준 분포를 누적해 두므로
+대시보드는 전체 제출 기록을 다시 훑지 않고 학생 수에 비례하는 크기의 테이블만 읽습니다.
+집계는 history_store의 제출 기록과 같은 트랜잭션에서 갱신됩니다.
+집계 테이블보다 먼저 저장된 기록은 테이블을 처음 만들 때 한 번 backfill로 더합니다.
+"""
+import json
+from collections import Counter
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS student_summary (
+    student TEXT PRIMARY KEY,
+    submissions INTEGER NOT NULL,
+    total_errors INTEGER NOT NULL,
+    score_sum REAL NOT NULL,
+    last_score REAL NOT NULL,
+    last_timestamp TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS student_daily_scores (
+    student TEXT NOT NULL,
+    day TEXT NOT NULL,
+    score_sum REAL NOT NULL,
+    submissions INTEGER NOT NULL,
+    PRIMARY KEY (student, day)
+);
+CREATE INDEX IF NOT EXISTS idx_student_daily_scores_day ON student_daily_scores (day);
+CREATE TABLE IF NOT EXISTS error_category_counts (
+    student TEXT NOT NULL,
+    category TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (student, category)
+);
+CREATE TABLE IF NOT EXISTS vocab_level_totals (
+    student TEXT PRIMARY KEY,
+    basic_sum REAL NOT NULL,
+    intermediate_sum REAL NOT NULL,
+    advanced_sum REAL NOT NULL,
+    samples INTEGER NOT NULL
+);
+"""
+
+# 오류 유형 분류 규칙 (앞에서부터 먼저 일치하는 유형을 사용)
+# 규칙 ID/출처는 대문자로 비교하고, 한국어 메시지는 그대로 비교합니다.
+ERROR_CATEGORY_KEYWORDS = [
+    ("철자", ('SPELL', 'MORFOLOGIK', 'TYPO', '철자')),
+    ("관사", ('A_VS_AN', 'ARTICLE', 'DETERMINER', "'an'", '관사')),
+    ("전치사", ('PREPOSITION', 'PREP', '전치사', "'on'", "'in'")),
+    ("시제", ('TENSE', 'PAST', '과거형', '시제')),
+    ("주어-동사 일치", ('AGREEMENT', 'AGR', '3인칭', '주어에 맞는')),
+    ("단수/복수", ('PLURAL', 'SINGULAR', 'NOUN_NUMBER', '단수형', '복수형')),
+    ("구두점", ('COMMA', 'PUNCT', 'WHITESPACE', 'UPPERCASE', '구두점')),
+    ("문장 구조", ('MISSING', 'INCOMPLETE', 'FRAGMENT', 'GRAMFORMER', '누락', '불완전', '주어가 필요', 'be 동사')),
+]
+DEFAULT_ERROR_CATEGORY = "기타"
+
+# 대시보드 점수 추이에 표시할 최근 일수
+DASHBOARD_DAYS = 60
+
+
+def categorize_error(error):
+    """check_grammar 오류 딕셔너리를 오류 유형 이름으로 분류합니다."""
+    identifiers = f"{error.get('rule', '')} {error.get('source', '')}".upper()
+    message = error.get('message', '')
+    for category, keywords in ERROR_CATEGORY_KEYWORDS:
+        if any(keyword in identifiers or keyword in message for keyword in keywords):
+            return category
+    return DEFAULT_ERROR_CATEGORY
+
+
+def compute_writing_score(word_count, error_count):
+    """
+    분석 결과로 10점 만점의 자동 점수를 계산합니다.
+    단어 10개당 오류 1개이면 5점, 오류가 없으면 10점입니다.
+    """
+    error_rate = error_count / max(1, word_count)
+    return round(max(0.0, 10.0 - error_rate * 50), 1)
+
+
+def summarize_analysis(stats, grammar_errors, vocab_level):
+    """
+    분석 결과 하나를 대시보드 집계에 더할 요약으로 변환합니다.
+
+    Parameters:
+    - stats: analyze_text 결과
+    - grammar_errors: check_grammar 결과
+    - vocab_level: evaluate_vocabulary_level 결과
+
+    Returns:
+    - 점수, 오류 유형별 개수, 어휘 수준 비율을 담은 딕셔너리
+    """
+    grammar_errors = grammar_errors or []
+    return {
+        'score': compute_writing_score(stats.get('word_count', 0), len(grammar_errors)),
+        'error_count': len(grammar_errors),
+        'categories': dict(Counter(categorize_error(error) for error in grammar_errors)),
+        'vocab_level': vocab_level or {},
+    }
+
+
+def apply_summary(conn, student, timestamp, summary):
+    """요약 하나를 집계 테이블에 누적합니다. 호출하는 쪽의 트랜잭션 안에서 실행됩니다."""
+    score = summary['score']
+    day = timestamp[:10]
+
+    conn.execute(
+        "INSERT INTO student_summary (student, submissions, total_errors, score_sum, last_score, last_timestamp) "
+        "VALUES (?, 1, ?, ?, ?, ?) "
+        "ON CONFLICT(student) DO UPDATE SET "
+        "submissions = submissions + 1, "
+        "total_errors = total_errors + excluded.total_errors, "
+        "score_sum = score_sum + excluded.score_sum, "
+        "last_score = CASE WHEN excluded.last_timestamp >= last_timestamp THEN excluded.last_score ELSE last_score END, "
+        "last_timestamp = MAX(last_timestamp, excluded.last_timestamp)",
+        (student, summary['error_count'], score, score, timestamp)
+    )
+    conn.execute(
+        "INSERT INTO student_daily_scores (student, day, score_sum, submissions) VALUES (?, ?, ?, 1) "
+        "ON CONFLICT(student, day) DO UPDATE SET "
+        "score_sum = score_sum + excluded.score_sum, submissions = submissions + 1",
+        (student, day, score)
+    )
+    conn.executemany(
+        "INSERT INTO error_category_counts (student, category, count) VALUES (?, ?, ?) "
+        "ON CONFLICT(student, category) DO UPDATE SET count = count + excluded.count",
+        [(student, category, count) for category, count in summary['categories'].items()]
+    )
+
+    vocab_level = summary['vocab_level']
+    if vocab_level:
+        conn.execute(
+            "INSERT INTO vocab_level_totals (student, basic_sum, intermediate_sum, advanced_sum, samples) "
+            "VALUES (?, ?, ?, ?, 1) "
+            "ON CONFLICT(student) DO UPDATE SET "
+            "basic_sum = basic_sum + excluded.basic_sum, "
+            "intermediate_sum = intermediate_sum + excluded.intermediate_sum, "
+            "advanced_sum = advanced_sum + excluded.advanced_sum, "
+            "samples = samples + 1",
+            (student, vocab_level.get('basic', 0), vocab_level.get('intermediate', 0),
+             vocab_level.get('advanced', 0))
+        )
+
+
+def backfill(conn):
+    """
+    집계 테이블을 처음 만들 때 그 전에 저장된 분석 기록을 오래된 순서로 집계에 더합니다.
+    호출하는 쪽의 트랜잭션 안에서 실행됩니다.
+    분석 결과(analysis 열)가 없는 예전 기록은 본문 단어 수와 오류 수로 점수와 오류 수만 더합니다.
+
+    Returns:
+    - 집계에 더한 기록 수
+    """
+    rows = conn.execute(
+        "SELECT student, timestamp, text, error_count, analysis FROM submissions "
+        "WHERE error_count IS NOT NULL ORDER BY timestamp, id"
+    )
+    count = 0
+    for student, timestamp, text, error_count, analysis in rows:
+        if analysis:
+            bundle = json.loads(analysis)
+            summary = summarize_analysis(bundle.get('stats') or {}, bundle.get('grammar_errors'),
+                                         bundle.get('vocab_level'))
+        else:
+            summary = {
+                'score': compute_writing_score(len(text.split()), error_count),
+                'error_count': error_count,
+                'categories': {},
+                'vocab_level': {},
+            }
+        apply_summary(conn, student, timestamp, summary)
+        count += 1
+    return count
+
+
+def load_dashboard(conn, days=DASHBOARD_DAYS):
+    """
+    대시보드에 필요한 집계를 읽어옵니다. 제출 기록 테이블은 읽지 않습니다.
+
+    Returns:
+    - students: 학생별 제출 수, 평균/최근 점수, 총 오류 수
+    - daily_scores: 최근 days일의 학생별 일 평균 점수
+    - error_categories: 오류 유형별 전체 개수
+    - vocab_levels: 학생별 평균 어휘 수준 비율
+    """
+    students = [dict(row) for row in conn.execute(
+        "SELECT student, submissions, total_errors, last_score, last_timestamp, "
+        "ROUND(score_sum / submissions, 1) AS avg_score "
+        "FROM student_summary ORDER BY student"
+    )]
+    daily_scores = [dict(row) for row in conn.execute(
+        "SELECT student, day, ROUND(score_sum / submissions, 1) AS score FROM student_daily_scores "
+        "WHERE day >= date('now', 'localtime', ?) ORDER BY day",
+        (f"-{days} days",)
+    )]
+    error_categories = [dict(row) for row in conn.execute(
+        "SELECT category, SUM(count) AS count FROM error_category_counts "
+        "GROUP BY category ORDER BY count DESC"
+    )]
+    vocab_levels = [dict(row) for row in conn.execute(
+        "SELECT student, basic_sum / samples AS basic, intermediate_sum / samples AS intermediate, "
+        "advanced_sum / samples AS advanced FROM vocab_level_totals ORDER BY student"
+    )]
+    return {
+        'students': students,
+        'daily_scores': daily_scores,
+        'error_categories': error_categories,
+        'vocab_levels': vocab_levels,
+    }
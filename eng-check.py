@@ -39,9 +39,9 @@ from datetime import datetime
 from textblob import TextBlob
 import asyncio
 import edge_tts
-import tempfile
 import os
 import base64
+import tempfile
 import requests
 
 # 자체 제작한 custom_suggestions 모듈 import
@@ -64,6 +64,73 @@ except ImportError:
             # 축소된 버전
         }
 
+# 단계별 시간 측정 및 지표 모듈 import
+from instrumentation import (span, timed, trace, snapshot, record_cache, record_engine_start,
+                             record_api_failure, start_metrics_server, increment, observe, METRIC_HELP)
+
+# 측정 기반 엔진 실행 계획 모듈 import
+from engine_cascade import CascadePlanner
+
+# 분석 한 건 프로파일링 모듈 import
+import contextlib
+from profiling import profile_run, profile_worker
+
+# 문법 검사 엔진 병렬 실행용
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+# LanguageTool 서버 풀 모듈 import
+from languagetool_pool import LanguageToolPool, LocalLanguageTool, remote_servers_from_env
+
+# 긴 글 조각 병렬 검사 모듈 import
+from chunked_check import check_in_chunks, sentence_spans, DEFAULT_CHUNK_CHARS as LANGUAGETOOL_CHUNK_CHARS
+
+# 문장 단위 교정 결과 메모 모듈 import
+from sentence_memo import (SentenceMemo, package_version, uniform_whitespace, join_sentences, split_errors,
+                           merge_sentence_errors)
+
+# 구문 분석 기반 문법 규칙 모듈 import
+from parse_rules import load_parser, check_parse_rules
+
+# 선언형 문법 규칙 엔진 import
+from rule_engine import load_rule_set
+
+# 어휘 프로파일 모듈 import
+from vocab_profile import FrequencyRanks, BAND_LABELS, profile_tokens, profile_batch, is_frequency_text
+
+# 어휘 다양성 지표 모듈 import
+from lexical_metrics import lexical_metrics
+
+WORD_FREQUENCY_URL = "https://raw.githubusercontent.com/hermitdave/FrequencyWords/master/content/2018/en/en_50k.txt"
+WORD_FREQUENCY_PATH = os.environ.get(
+    'ENGCHECK_WORD_FREQUENCY_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "en_50k.txt")
+)
+
+# 작문 기록 저장소 모듈 import
+from history_store import HistoryStore, DEFAULT_HISTORY_DB_PATH
+from dashboard_stats import summarize_analysis
+
+# 제출 작문 유사도 색인 모듈 import
+from similarity_index import SimilarityIndex, DEFAULT_SIMILARITY_DB_PATH, PREVIEW_CHARS
+
+# 첨삭 결과 내보내기 모듈 import
+from feedback_export import export_feedback
+
+# 세션 메모리/임시 파일 관리 모듈 import
+from resource_manager import TempFileRegistry, SessionLRU, SESSION_AUDIO_LIMIT, current_session_id
+
+# 분석/재작성/음성 합성 작업 대기열 모듈 import
+import time
+from job_queue import JobQueue, JobCancelled, ACTIVE_STATUSES
+
+EXPORT_MIME_TYPES = {
+    'xlsx': "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    'csv': "text/csv"
+}
+
 # LanguageTool API 임포트 시도
 try:
     import language_tool_python
@@ -99,15 +166,69 @@ except (ImportError, ModuleNotFoundError):
     # 실제 클래스가 없을 때 사용할 더미 클래스 정의
     Gramformer = DummyGramformer
 
+# ONNX Runtime 교정 모델 모듈 import (ENGCHECK_GRAMFORMER_BACKEND=onnx이면 PyTorch 대신 사용)
+from onnx_corrector import OnnxGramformer, has_onnxruntime, onnx_model_available, GRAMFORMER_BACKEND
+use_onnx_gramformer = GRAMFORMER_BACKEND == "onnx" and has_onnxruntime and onnx_model_available()
+if GRAMFORMER_BACKEND == "onnx" and not use_onnx_gramformer:
+    print("ONNX 교정 모델을 사용할 수 없습니다 (onnxruntime/optimum 설치와 onnx_corrector.py --export 확인).")
+# gramformer 패키지 없이도 변환한 모델만으로 교정할 수 있음
+has_gramformer = has_gramformer or use_onnx_gramformer
+
+# 음성 합성 스트리밍 설정
+# TTS_STREAM_URL: 브라우저에서 접근할 수 있는 API 서버 주소 (예: http://localhost:8000).
+# 설정하면 음성 파일 생성 중에도 API 서버의 /tts/jobs/<작업 ID>/audio로 합성된 앞부분부터 재생
+TTS_STREAM_URL = os.environ.get("ENGCHECK_TTS_STREAM_URL", "").rstrip("/")
+TTS_PROGRESS_INTERVAL = 0.5
+TTS_FIRST_AUDIO = "engcheck_tts_first_audio_seconds"
+METRIC_HELP[TTS_FIRST_AUDIO] = "음성 합성을 시작해 첫 오디오 조각을 받기까지 걸린 시간"
+
+# 텍스트를 음성으로 변환하면서 오디오 조각을 바로 내보내는 함수
+async def stream_text_to_speech(text, voice="en-US-JennyNeural", word_boundaries=None):
+    """
+    edge_tts의 stream()으로 음성을 합성하면서 오디오 조각이 도착하는 대로 내보냅니다.
+    글 전체의 합성을 기다리지 않으므로 긴 글도 첫 소리가 바로 나옵니다.
+    
+    Parameters:
+    - text: 음성으로 변환할 텍스트
+    - voice: 음성 모델 (기본값: 'en-US-JennyNeural')
+    - word_boundaries: 목록을 주면 단어마다 {'text', 'start', 'duration'}(초)을 추가 (WordBoundary 이벤트)
+    
+    Yields:
+    - 오디오(mp3) bytes 조각
+    """
+    communicate = edge_tts.Communicate(text, voice)
+    started = time.perf_counter()
+    first_audio = True
+    try:
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                if first_audio:
+                    observe(TTS_FIRST_AUDIO, time.perf_counter() - started)
+                    first_audio = False
+                yield chunk["data"]
+            elif chunk["type"] == "WordBoundary" and word_boundaries is not None:
+                # edge-tts의 offset/duration 단위는 100나노초
+                word_boundaries.append({
+                    'text': chunk["text"],
+                    'start': chunk["offset"] / 10_000_000,
+                    'duration': chunk["duration"] / 10_000_000
+                })
+    except Exception:
+        record_api_failure("edge_tts")
+        raise
+
 # 텍스트를 음성으로 변환하는 함수
-async def text_to_speech(text, voice="en-US-JennyNeural", output_file=None):
+async def text_to_speech(text, voice="en-US-JennyNeural", output_file=None, word_boundaries=None, on_chunk=None):
     """
     텍스트를 음성으로 변환하고 파일로 저장합니다.
+    오디오 조각이 도착할 때마다 파일 끝에 이어 쓰므로 합성이 끝나기 전에도 앞부분을 읽어 재생할 수 있습니다.
     
     Parameters:
     - text: 음성으로 변환할 텍스트
     - voice: 음성 모델 (기본값: 'en-US-JennyNeural')
     - output_file: 출력 파일 경로 (None인 경우 임시 파일 생성)
+    - word_boundaries: 목록을 주면 단어별 시간 정보를 추가 (stream_text_to_speech 참고)
+    - on_chunk: 조각을 쓸 때마다 지금까지 쓴 바이트 수로 호출할 함수
     
     Returns:
     - 음성 파일 경로
@@ -115,19 +236,24 @@ async def text_to_speech(text, voice="en-US-JennyNeural", output_file=None):
     if not text:
         return None
     
-    # 출력 파일이 지정되지 않은 경우 임시 파일 생성
+    # 출력 파일이 지정되지 않은 경우 임시 파일 생성 (TTL이 지나면 자동 삭제)
     if output_file is None:
-        temp_dir = tempfile.gettempdir()
-        output_file = os.path.join(temp_dir, f"speech_{random.randint(1000, 9999)}.wav")
-    
-    # 텍스트를 음성으로 변환하고 파일로 저장
-    communicate = edge_tts.Communicate(text, voice)
-    await communicate.save(output_file)
+        output_file = get_temp_files().new_path("speech_", ".wav")
+    
+    # 텍스트를 음성으로 변환하면서 파일에 이어 쓰기
+    written = 0
+    with span("tts:edge_tts"), open(output_file, "wb") as f:
+        async for audio in stream_text_to_speech(text, voice, word_boundaries):
+            f.write(audio)
+            f.flush()
+            written += len(audio)
+            if on_chunk:
+                on_chunk(written)
     
     return output_file
 
 # 비동기 함수를 동기식으로 호출하는 래퍼 함수
-def sync_text_to_speech(text, voice="en-US-JennyNeural", output_file=None):
+def sync_text_to_speech(text, voice="en-US-JennyNeural", output_file=None, word_boundaries=None, on_chunk=None):
     """
     text_to_speech 함수를 동기식으로 호출하는 래퍼 함수
     
@@ -135,6 +261,7 @@ def sync_text_to_speech(text, voice="en-US-JennyNeural", output_file=None):
     - text: 음성으로 변환할 텍스트
     - voice: 음성 모델 (기본값: 'en-US-JennyNeural')
     - output_file: 출력 파일 경로 (None인 경우 임시 파일 생성)
+    - word_boundaries, on_chunk: text_to_speech 참고
     
     Returns:
     - 음성 파일 경로
@@ -143,11 +270,28 @@ def sync_text_to_speech(text, voice="en-US-JennyNeural", output_file=None):
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     try:
-        audio_path = loop.run_until_complete(text_to_speech(text, voice, output_file))
+        audio_path = loop.run_until_complete(text_to_speech(text, voice, output_file, word_boundaries, on_chunk))
         return audio_path
     finally:
+        # 합성을 중간에 멈춘 경우에도 edge-tts 연결을 닫음
+        loop.run_until_complete(loop.shutdown_asyncgens())
         loop.close()
 
+# 합성 중인 음성을 스트리밍으로 재생하는 HTML 오디오 요소
+def get_stream_player_html(job_id):
+    """
+    API 서버가 음성 합성 작업의 파일을 합성되는 대로 이어서 보내 주는 주소를 재생합니다.
+    TTS_STREAM_URL이 설정되지 않았으면 빈 문자열을 반환합니다.
+    """
+    if not TTS_STREAM_URL:
+        return ""
+    return f"""
+        <audio id="audio-stream-player" controls autoplay preload="auto"
+               src="{TTS_STREAM_URL}/tts/jobs/{job_id}/audio">
+            Your browser does not support the audio element.
+        </audio>
+    """
+
 # 음성 파일을 HTML 오디오 요소로 변환하는 함수
 def get_audio_player_html(audio_path, loop_count=5, autoplay=True):
     """
@@ -236,6 +380,7 @@ def get_compiled_patterns():
     }
 
 # 수정된 sent_tokenize 함수 (NLTK 의존성 제거)
+@timed("tokenizer:sentence")
 def custom_sent_tokenize(text):
     if not text:
         return []
@@ -248,6 +393,7 @@ def custom_sent_tokenize(text):
     return [s.strip() for s in sentences if s.strip()]
 
 # 수정된 word_tokenize 함수 (NLTK 의존성 제거)
+@timed("tokenizer:word")
 def custom_word_tokenize(text):
     if not text:
         return []
@@ -265,23 +411,90 @@ def custom_word_tokenize(text):
     
     return tokens
 
-# 세션 상태 초기화
-if 'history' not in st.session_state:
-    st.session_state.history = []
+# 작문 기록 저장소 초기화 함수
+@st.cache_resource
+def get_history_store():
+    """
+    작문 기록을 영구 저장하는 SQLite 저장소를 반환합니다.
+    새로고침이나 재접속 후에도 기록이 유지되며 모든 세션이 하나의 저장소를 공유합니다.
+    """
+    return HistoryStore(DEFAULT_HISTORY_DB_PATH)
+
+# 제출 작문 유사도 색인 초기화 함수
+@st.cache_resource
+def get_similarity_index():
+    """
+    베끼기/재작성 결과 붙여 넣기 확인용 MinHash-LSH 색인을 반환합니다.
+    제출 기록 데이터베이스와 같은 폴더에 저장되며 모든 세션이 공유합니다.
+    """
+    return SimilarityIndex(DEFAULT_SIMILARITY_DB_PATH)
+
+# 임시 파일 기록부 초기화 함수
+@st.cache_resource
+def get_temp_files():
+    """
+    음성/내보내기 임시 파일 기록부를 반환합니다.
+    TTL이 지났거나 세션이 끝난 파일은 백그라운드 스레드가 지웁니다.
+    """
+    return TempFileRegistry().start()
+
+# 현재 세션이 소유하는 임시 파일 생성 (세션이 끝나면 함께 삭제)
+def new_session_temp_file(prefix, suffix):
+    return get_temp_files().new_path(prefix, suffix, owner=current_session_id())
+
+# 세션의 음성 파일 캐시 (텍스트 해시 → {'path', 'playing'}), 최근 SESSION_AUDIO_LIMIT개만 유지
+def get_session_audio_cache():
+    def release_audio(key, entry):
+        if entry.get('path'):
+            get_temp_files().release(entry['path'], "evicted")
+    return SessionLRU(st.session_state, 'audio_tab1', SESSION_AUDIO_LIMIT, on_evict=release_audio)
+
+# 세션에서 마지막으로 만든 내보내기 파일만 남기고 이전 파일은 삭제
+def replace_export_file(export_path):
+    previous_path = st.session_state.get('export_path')
+    if previous_path and previous_path != export_path:
+        get_temp_files().release(previous_path)
+    # 마지막 파일도 세션이 끝나거나 TTL이 지나면 삭제
+    get_temp_files().register(export_path, owner=current_session_id())
+    st.session_state.export_path = export_path
+    return export_path
+
+# 로그인(st.login)을 쓸 수 있는지 (.streamlit/secrets.toml에 [auth] 설정이 있을 때)
+def auth_configured():
+    try:
+        return "auth" in st.secrets
+    except Exception:
+        return False
+
+# 현재 학생 식별자 (기록 저장용)
+def get_current_student():
+    """
+    작문 기록과 작업의 주인을 구분하는 식별자를 반환합니다.
+    로그인했으면 계정(이메일)을, 아니면 현재 브라우저 세션을 사용합니다. 화면에서 고칠 수 있는 값은
+    쓰지 않으므로 다른 학생의 이름을 입력해 그 학생의 기록을 볼 수 없고, 로그인하지 않은 기록은
+    그 세션에서만 보입니다.
+    """
+    if st.user.get('is_logged_in'):
+        return st.user.get('email') or st.user.get('sub')
+    session_id = current_session_id()
+    return f"익명-{session_id}" if session_id else "익명"
 
 # 현재 선택된 탭 추적 (student_page의 경우)
 if 'selected_tab' not in st.session_state:
     st.session_state.selected_tab = 0  # 기본 탭은 0(영작문 검사)
 
 # 맞춤법 검사기 초기화 함수
+@st.cache_resource
 def get_spell_checker():
     """
     사용 가능한 맞춤법 검사기를 로드합니다.
     여러 라이브러리를 시도하고 사용 가능한 첫 번째 검사기를 반환합니다.
+    사전을 불러오는 비용이 크므로 프로세스 전체에서 하나의 검사기를 공유합니다.
     """
     # PyEnchant 사용 시도
     if 'has_enchant' in globals() and has_enchant:
         try:
+            record_engine_start("enchant")
             return enchant.Dict("en_US")
         except Exception as e:
             print(f"PyEnchant 초기화 오류: {e}")
@@ -289,6 +502,7 @@ def get_spell_checker():
     # PySpellChecker 사용 시도
     if 'has_spellchecker' in globals() and has_spellchecker:
         try:
+            record_engine_start("spellchecker")
             return SpellChecker()
         except Exception as e:
             print(f"PySpellChecker 초기화 오류: {e}")
@@ -297,13 +511,28 @@ def get_spell_checker():
             return None
 
 # LanguageTool 검사기 초기화 함수
+@st.cache_resource
 def get_language_tool():
     """
     LanguageTool 검사기를 초기화하고 반환합니다.
+    JVM 서버를 매번 새로 띄우지 않도록 프로세스 전체에서 하나의 서버 풀을 공유하며,
+    검사 요청은 처리 중인 요청이 가장 적은 서버로 보내집니다.
+    ENGCHECK_LT_SERVERS가 설정되어 있으면 따로 실행 중인 풀을 사용하고 직접 띄우지 않습니다.
+    풀을 시작할 수 없으면 내장 서버 하나를 띄우는 기존 방식으로 돌아갑니다.
     """
+    remote_servers = remote_servers_from_env()
+    pool_size = 0 if remote_servers and not os.environ.get('ENGCHECK_LT_POOL_SIZE') else None
+    try:
+        pool = LanguageToolPool(pool_size, remote_servers)
+        if pool.size > 0 or remote_servers:
+            return pool.start()
+    except Exception as e:
+        print(f"LanguageTool 서버 풀 시작 오류: {e}")
+    
     try:
         import language_tool_python
-        return language_tool_python.LanguageTool('en-US')
+        record_engine_start("languagetool")
+        return LocalLanguageTool(language_tool_python.LanguageTool('en-US'))
     except Exception as e:
         st.error(f"LanguageTool 초기화 오류: {str(e)}")
     return None
@@ -316,6 +545,7 @@ def get_grammar_bot():
     if has_grammarbot:
         try:
             # GrammarBot 클라이언트 생성
+            record_engine_start("grammarbot")
             return GrammarBotClient()
         except Exception as e:
             print(f"GrammarBot 초기화 오류: {e}")
@@ -323,94 +553,74 @@ def get_grammar_bot():
     return None
 
 # Gramformer 초기화 함수
+@st.cache_resource
 def get_gramformer():
     """
     Gramformer 문법 교정 모델을 초기화하고 반환합니다.
+    모델 로드 비용이 크므로 프로세스 전체에서 하나의 인스턴스를 공유합니다.
     """
     if has_gramformer:
         try:
             # Gramformer 모델 로드 (문법 교정용)
+            record_engine_start("gramformer")
+            if use_onnx_gramformer:
+                # 변환한 ONNX 모델 (같은 correct() 계약, 문장 여러 개를 한 번에 교정 가능)
+                return OnnxGramformer()
             return Gramformer(models=1, use_gpu=False)  # CPU 모드
         except Exception as e:
             print(f"Gramformer 초기화 오류: {e}")
     
     return None
 
-# 한국인이 자주 범하는 영어 오류 패턴 정의
-def get_korean_english_error_patterns():
+# 문장 단위 교정 결과 메모 초기화 함수
+@st.cache_resource
+def get_sentence_memo(engine):
     """
-    한국인이 영어를 배울 때 자주 범하는 오류 패턴을 반환합니다.
+    엔진별 문장 메모를 반환합니다. 키에 엔진 패키지 버전이 들어가므로
+    Gramformer나 language_tool_python을 업그레이드하거나 ONNX 모델로 바꾸면 이전 결과는 쓰이지 않습니다.
     """
-    return [
-        # 관사 오류
-        (r'\b([aeiou]\w+)\b', 'an \1', r'\ba ([aeiou]\w+)\b', "모음으로 시작하는 단어 앞에는 'a' 대신 'an'을 사용해야 합니다"),
-        (r'\ban ([^aeiou\W]\w+)\b', 'a \1', r'\ban ([^aeiou\W]\w+)\b', "자음으로 시작하는 단어 앞에는 'an' 대신 'a'를 사용해야 합니다"),
-        
-        # 단수/복수 오류
-        (r'\b(one|a|an|each|every|this) (\w+s)\b', '\1 \2', r'\b(one|a|an|each|every|this) (\w+s)\b', "'one', 'a', 'an', 'each', 'every', 'this' 뒤에는 단수형을 사용해야 합니다"),
-        (r'\b(many|several|few|these|those|two|three|four|five) (\w+)(?<!s)\b', '\1 \2s', r'\b(many|several|few|these|those|two|three|four|five) (\w+)(?<!s)\b', "'many', 'several', 'few', 'these', 'those', 숫자 뒤에는 복수형을 사용해야 합니다"),
-        
-        # 소유격 오류
-        (r'\b(\w+)s\'s\b', "\1s'", r'\b(\w+)s\'s\b', "복수형 소유격은 's가 아닌 '만 붙여야 합니다"),
-        
-        # 전치사 오류
-        (r'\bin (\w+ )?(weekend|morning|evening|night|spring|summer|fall|autumn|winter)\b', 'on \1\2', r'\bin (\w+ )?(weekend|morning|evening|night|spring|summer|fall|autumn|winter)\b', "날짜나 시간대는 'in' 대신 'on'을 사용해야 합니다"),
-        (r'\bon (January|February|March|April|May|June|July|August|September|October|November|December|next month|last month|this month)\b', 'in \1', r'\bon (January|February|March|April|May|June|July|August|September|October|November|December|next month|last month|this month)\b', "월 이름에는 'on' 대신 'in'을 사용해야 합니다"),
-        (r'\bon (yesterday|today|tomorrow)\b', 'by \1', r'\bon (yesterday|today|tomorrow)\b', "'on' 대신 'by'를 사용해야 합니다"),
-        
-        # 시제 오류
-        (r'\b(yesterday|last week|last month|last year) I (go|come|do|have|are|is|eat|drink|sleep|wake|see|drive)\b', '\1 I \2ed', r'\b(yesterday|last week|last month|last year) I (go|come|do|have|are|is|eat|drink|sleep|wake|see|drive)\b', "과거를 나타내는 표현 뒤에는 과거형 동사를 사용해야 합니다"),
-        (r'\b(ago) I (go|come|do|have|are|is|eat|drink|sleep|wake|see|drive)\b', '\1 I \2ed', r'\b(ago) I (go|come|do|have|are|is|eat|drink|sleep|wake|see|drive)\b', "'ago' 뒤에는 과거형 동사를 사용해야 합니다"),
-        
-        # 누락된 주어
-        (r'^\s*([A-Z]\w*\s+){0,3}(is|am|are|was|were|have|has|had|do|does|did|can|could|will|would|shall|should|may|might|must)\b', 'Subject \1\2', r'^\s*([A-Z]\w*\s+){0,3}(is|am|are|was|were|have|has|had|do|does|did|can|could|will|would|shall|should|may|might|must)\b', "문장에 주어가 필요합니다"),
-        
-        # 중복 단어
-        (r'\b(\w+)\s+\1\b', '\1', r'\b(\w+)\s+\1\b', "중복된 단어가 있습니다"),
-        
-        # be 동사 누락
-        (r'\bI|He|She|It|They|We|You (\w+ing)\b', 'I am|He is|She is|It is|They are|We are|You are \1', r'\bI|He|She|It|They|We|You (\w+ing)\b', "진행형에서 be 동사가 필요합니다"),
-        
-        # 주어-동사 일치 오류
-        (r'\bhe|she|it (are|were|have)\b', 'he|she|it is|was|has', r'\bhe|she|it (are|were|have)\b', "3인칭 단수 주어에는 3인칭 단수 동사가 필요합니다"),
-        (r'\bI|we|you|they (is|was|has)\b', 'I|we|you|they am|are|were|have', r'\bI|we|you|they (is|was|has)\b', "해당 주어에 맞는 동사가 필요합니다"),
-        
-        # 조동사 후 동사원형 누락
-        (r'\b(can|could|will|would|shall|should|may|might|must) (am|is|are|was|were|have|has|had)\b', '\1 be|have', r'\b(can|could|will|would|shall|should|may|might|must) (am|is|are|was|were|have|has|had)\b', "조동사 뒤에는 동사 원형을 사용해야 합니다")
-    ]
+    if engine == "gramformer":
+        gf = get_gramformer()
+        if isinstance(gf, OnnxGramformer):
+            return SentenceMemo(engine, f"gramformer-{gf.version}")
+        return SentenceMemo(engine, f"gramformer-{package_version('gramformer')}")
+    # 문맥 규칙(LANGUAGETOOL_CONTEXT_RULES)을 빼고 검사한 결과만 메모하므로 그 전에 저장한 결과와 키를 구분
+    return SentenceMemo(engine, f"language_tool_python-{package_version('language_tool_python')}-sentence-rules",
+                        normalize=uniform_whitespace)
+
+# 문법 규칙 파일 불러오기 함수 (rules/ 디렉터리의 JSON 규칙을 한 번만 컴파일)
+@st.cache_resource
+def get_rule_set(name):
+    return load_rule_set(f"{name}.json")
 
 # 한국인이 자주 범하는 영어 오류를 체크하는 함수
 def check_korean_english_errors(text):
     """
-    한국인이 자주 범하는 영어 오류를 체크합니다.
+    한국인이 자주 범하는 영어 오류를 체크합니다 (rules/korean_learner.json).
+    구문 분석기를 쓸 수 없으면 관사, 시제, 주어-동사 일치 등의 대체(fallback) 규칙도 함께 검사합니다.
     """
-    errors = []
-    patterns = get_korean_english_error_patterns()
-    
-    # 각 오류 패턴을 검사
-    for pattern in patterns:
-        if len(pattern) == 4:  # (검색 패턴, 교정 제안, 오류 패턴, 설명)
-            search_pattern, correction, error_pattern, description = pattern
-            matches = re.finditer(error_pattern, text, re.IGNORECASE)
-            
-            for match in matches:
-                # 오류 정보 수집
-                start = match.start()
-                end = match.end()
-                error_text = match.group(0)
-                
-                # 교정 제안 생성 (단순히 제안만 함)
-                suggestion = re.sub(search_pattern, correction, error_text, flags=re.IGNORECASE)
-                
-                errors.append({
-                    "offset": start,
-                    "errorLength": len(error_text),
-                    "message": f"한국인 학습자 일반 오류: {description}",
-                    "replacements": [suggestion],
-                    "source": "KoreanErrRule"
-                })
-    
-    return errors
+    return get_rule_set("korean_learner").check(text, include_fallback=get_spacy_parser() is None)
+
+# spaCy 구문 분석기 초기화 함수
+@st.cache_resource
+def get_spacy_parser():
+    """
+    구문 분석 규칙에 사용할 spaCy 모델을 불러옵니다. 모델이 없으면 None을 반환하며,
+    이 경우 구조적 규칙은 규칙 파일의 대체(fallback) 정규식 규칙으로 검사합니다.
+    """
+    try:
+        return load_parser()
+    except Exception as e:
+        print(f"spaCy 모델을 불러올 수 없어 정규식 규칙을 사용합니다: {e}")
+        return None
+
+# 구문 분석 기반 문법 검사 함수
+def check_grammar_with_parse_rules(text):
+    """주어-동사 일치, 관사, 시제, be 동사/주어 누락을 구문 분석 결과로 검사합니다."""
+    nlp = get_spacy_parser()
+    if nlp is None:
+        return []
+    return check_parse_rules(nlp, text, sentence_spans(text))
 
 # GrammarBot API를 사용한 문법 검사 함수
 def check_grammar_with_grammarbot(text):
@@ -422,7 +632,8 @@ def check_grammar_with_grammarbot(text):
     
     if client and text.strip():
         try:
-            result = client.check(text)
+            with span("api:grammarbot"):
+                result = client.check(text)
             
             for match in result.matches:
                 # 오류 정보 추출
@@ -444,38 +655,189 @@ def check_grammar_with_grammarbot(text):
                     "source": f"GrammarBot:{rule}"
                 })
         except Exception as e:
+            record_api_failure("grammarbot")
             print(f"GrammarBot API 호출 중 오류: {e}")
     
     return errors
 
+# Gramformer를 사용한 문장 목록 교정 함수
+def correct_sentences_with_gramformer(sentences):
+    """
+    Gramformer를 사용하여 문장 목록을 교정합니다.
+    여러 글의 문장을 모아 한 번에 교정할 때도 사용합니다.
+    
+    Parameters:
+    - sentences: 교정할 문장 목록
+    
+    Returns:
+    - 입력과 같은 순서의 교정된 문장 목록
+    """
+    gf = get_gramformer()
+    if not gf:
+        return list(sentences)
+    
+    def correct_missing(missing):
+        if isinstance(gf, OnnxGramformer):
+            # ONNX 모델은 문장 여러 개를 묶어 한 번에 생성
+            return [candidates[0] if candidates else sentence
+                    for sentence, candidates in zip(missing, gf.correct_batch(missing))]
+        corrected_sentences = []
+        for sentence in missing:
+            corrected = gf.correct(sentence, max_candidates=1)
+            # Gramformer는 후보를 set으로 반환하므로 첫 번째 후보를 꺼냄
+            if corrected:
+                corrected_sentences.append(next(iter(corrected)))
+            else:
+                corrected_sentences.append(sentence)
+        return corrected_sentences
+    
+    # 다른 학생의 글에서 이미 교정한 문장은 모델을 다시 실행하지 않음
+    return get_sentence_memo("gramformer").lookup(list(sentences), correct_missing)
+
 # Gramformer를 사용한 문법 교정 함수
 def correct_grammar_with_gramformer(text):
     """
     Gramformer를 사용하여 문법을 교정합니다.
     """
-    gf = get_gramformer()
     corrected_text = text
     
-    if gf and text.strip():
+    if text.strip():
         try:
-            # 문장 단위로 교정
+            # 문장 단위로 교정한 뒤 다시 합침
             sentences = custom_sent_tokenize(text)
-            corrected_sentences = []
-            
-            for sentence in sentences:
-                corrected = gf.correct(sentence, max_candidates=1)
-                if corrected:
-                    corrected_sentences.append(corrected[0])
-                else:
-                    corrected_sentences.append(sentence)
-            
-            # 교정된 문장들을 다시 합침
-            corrected_text = ' '.join(corrected_sentences)
+            corrected_text = ' '.join(correct_sentences_with_gramformer(sentences))
         except Exception as e:
             print(f"Gramformer 모델 사용 중 오류: {e}")
     
     return corrected_text
 
+# Gramformer 교정 결과를 오류 목록으로 변환하는 함수
+def gramformer_errors_from_correction(text, corrected_text):
+    """전체 문장 교정 결과를 check_grammar 형식의 오류 목록으로 변환합니다."""
+    if not corrected_text or corrected_text == text:
+        return []
+    
+    return [{
+        'message': "문법 교정 제안",
+        'offset': 0,
+        'length': len(text),
+        'replacements': [corrected_text],
+        'rule': 'GRAMFORMER_CORRECTION',
+        'context': text
+    }]
+
+# LanguageTool 검사 결과를 오류 목록으로 변환하는 함수
+def languagetool_errors_from_matches(text, matches, base_offset=0):
+    """
+    LanguageTool 검사 결과(Match 목록)를 check_grammar 형식의 오류 목록으로 변환합니다.
+    
+    Parameters:
+    - text: 오프셋 기준이 되는 텍스트
+    - matches: LanguageTool Match 객체 목록
+    - base_offset: 여러 텍스트를 이어 붙여 검사한 경우 이 텍스트의 시작 위치
+    
+    Returns:
+    - 오류 정보 딕셔너리 목록
+    """
+    errors = []
+    for error in matches:
+        offset = error.offset - base_offset
+        errors.append({
+            'message': error.message,
+            'offset': offset,
+            'length': error.errorLength,
+            'replacements': error.replacements,
+            'rule': error.ruleId,
+            'context': text[max(0, offset - 20):min(len(text), offset + error.errorLength + 20)]
+        })
+    return errors
+
+# 앞뒤 문장이나 문단에 따라 결과가 달라지는 LanguageTool 규칙
+# 문장 메모에는 이 규칙들을 빼고 검사한 결과만 저장하고, 이 규칙들은 글 전체로 한 번 검사합니다.
+# (메모용으로 이어 붙인 문장은 서로 관계가 없으므로 여기서 나온 결과는 다른 글로 옮겨지면 안 됨)
+LANGUAGETOOL_CONTEXT_RULES = (
+    'UPPERCASE_SENTENCE_START',            # 문장 시작 대문자 (어디서 문장이 나뉘는지에 따라 다름)
+    'ENGLISH_WORD_REPEAT_BEGINNING_RULE',  # 이어진 문장이 같은 단어로 시작
+    'PARAGRAPH_REPEAT_BEGINNING_RULE',     # 이어진 문단이 같은 단어로 시작
+    'PUNCTUATION_PARAGRAPH_END',           # 문단 끝 문장 부호
+    'EN_UNPAIRED_BRACKETS',                # 여러 문장에 걸친 괄호 짝
+    'EN_UNPAIRED_QUOTES',                  # 여러 문장에 걸친 따옴표 짝
+    'SENTENCE_WHITESPACE',                 # 문장 사이 공백
+    'STYLE_REPEATED_WORD_RULE_EN',         # 가까운 문장에서 같은 단어 반복
+    'TOO_LONG_PARAGRAPH',                  # 문단 길이
+)
+
+# LanguageTool을 사용한 문장 목록 검사 함수
+def check_sentences_with_languagetool(sentences):
+    """
+    문장마다 LanguageTool 오류 목록(문장 기준 위치, context 제외)을 반환합니다.
+    메모에 없는 문장만 중복 없이 이어 붙여 검사하며, 길면 조각으로 나누어 병렬로 검사합니다.
+    이어 붙인 문장은 서로 관계가 없으므로 문맥 규칙(LANGUAGETOOL_CONTEXT_RULES)은 검사하지 않습니다
+    (글 전체 기준 결과는 check_context_with_languagetool 사용).
+    
+    Parameters:
+    - sentences: 검사할 문장 목록
+    
+    Returns:
+    - 입력과 같은 순서의 문장별 오류 목록
+    """
+    tool = get_language_tool()
+    if tool is None:
+        return [[] for _ in sentences]
+    
+    def check_chunk(chunk_text):
+        errors = languagetool_errors_from_matches(
+            chunk_text, tool.check(chunk_text, disabled=LANGUAGETOOL_CONTEXT_RULES))
+        # 규칙을 끄지 못한 서버에서 나온 결과도 메모에 들어가지 않도록 한 번 더 거름
+        return [error for error in errors if error['rule'] not in LANGUAGETOOL_CONTEXT_RULES]
+    
+    def check_missing(missing):
+        joined, starts = join_sentences(missing)
+        if len(joined) <= LANGUAGETOOL_CHUNK_CHARS:
+            errors = check_chunk(joined)
+        else:
+            errors = check_in_chunks(joined, check_chunk, name="languagetool", max_chars=LANGUAGETOOL_CHUNK_CHARS)
+        return split_errors(errors, starts, missing)
+    
+    return get_sentence_memo("languagetool").lookup(list(sentences), check_missing)
+
+# LanguageTool 문맥 규칙 검사 함수
+def check_context_with_languagetool(text):
+    """
+    문맥 규칙(LANGUAGETOOL_CONTEXT_RULES)만 글 전체를 기준으로 검사합니다.
+    결과는 그 글에서만 의미가 있으므로 메모하지 않습니다.
+    """
+    tool = get_language_tool()
+    if tool is None or not text.strip():
+        return []
+    
+    def check_chunk(chunk_text):
+        return languagetool_errors_from_matches(
+            chunk_text, tool.check(chunk_text, enabled_only=LANGUAGETOOL_CONTEXT_RULES))
+    
+    if len(text) <= LANGUAGETOOL_CHUNK_CHARS:
+        return check_chunk(text)
+    return check_in_chunks(text, check_chunk, name="languagetool_context", max_chars=LANGUAGETOOL_CHUNK_CHARS)
+
+# LanguageTool 문장별 결과와 문맥 규칙 결과를 합치는 함수
+def merge_languagetool_errors(text, spans, per_sentence):
+    """
+    문장별 오류 목록을 원래 글 기준으로 옮기고, 글 전체로 검사한 문맥 규칙 오류를 더해 위치 순으로 반환합니다.
+    """
+    errors = merge_sentence_errors(text, spans, per_sentence) + check_context_with_languagetool(text)
+    return sorted(errors, key=lambda error: error['offset'])
+
+# LanguageTool을 사용한 문법 검사 함수
+def check_grammar_with_languagetool(text):
+    """
+    LanguageTool을 사용하여 문법을 검사합니다.
+    문장 단위로 검사 결과를 메모해 두므로 이전에 검사한 문장은 다시 검사하지 않고,
+    앞뒤 문장에 따라 달라지는 규칙만 글 전체로 한 번 검사합니다.
+    """
+    spans = sentence_spans(text)
+    per_sentence = check_sentences_with_languagetool([text[start:end] for start, end, _ in spans])
+    return merge_languagetool_errors(text, spans, per_sentence)
+
 # GrammarCheck.io API를 사용한 문법 검사 함수
 def check_grammar_with_grammarcheck_api(text):
     """
@@ -502,7 +864,8 @@ def check_grammar_with_grammarcheck_api(text):
         }
         
         # API 요청 보내기
-        response = requests.post(api_url, json=payload, headers=headers)
+        with span("api:grammarcheck_io"):
+            response = requests.post(api_url, json=payload, headers=headers)
         
         # 응답 처리
         if response.status_code == 200:
@@ -526,118 +889,401 @@ def check_grammar_with_grammarcheck_api(text):
                         "source": "GrammarCheck.io"
                     })
         else:
+            record_api_failure("grammarcheck_io")
             print(f"GrammarCheck.io API 요청 실패: {response.status_code}")
     except Exception as e:
+        record_api_failure("grammarcheck_io")
         print(f"GrammarCheck.io API 사용 중 오류: {e}")
     
     return errors
 
-# 문법 검사 함수 개선
-def check_grammar(text):
-    """여러 엔진을 사용하여 문법을 체크합니다."""
-    if not text.strip():
+# 시간 예산이 있을 때 편집 거리 2 후보 계산(긴 단어는 한 번에 1초 가까이 걸림)을 시작하는 데 필요한 남은 시간(초)
+SPELLING_DISTANCE2_RESERVE = float(os.environ.get("ENGCHECK_SPELLING_DISTANCE2_RESERVE", "1.5"))
+
+# 철자 교정 후보 찾기
+def spelling_candidates(spell, word, deadline=None):
+    """
+    사전에 없는 단어의 교정 후보를 반환합니다.
+    deadline이 있으면 먼저 편집 거리 1 후보를 찾고(빠름), 후보가 없을 때 남은 시간이
+    SPELLING_DISTANCE2_RESERVE 이상이면 편집 거리 2까지 찾습니다. 마감이 지났으면 빈 목록을 반환합니다.
+    """
+    if deadline is None or not hasattr(spell, 'edit_distance_1'):
+        # 후보가 없으면 None이 반환되므로 빈 목록으로 처리
+        return spell.candidates(word) or []
+    remaining = deadline - time.perf_counter()
+    if remaining <= 0:
         return []
+    close = spell.known(spell.edit_distance_1(word))
+    if close or remaining < SPELLING_DISTANCE2_RESERVE:
+        return close
+    return spell.candidates(word) or []
+
+# SpellChecker를 사용한 철자 검사 함수
+def check_spelling(text, deadline=None):
+    """
+    SpellChecker로 철자를 검사하고 사용자 정의 제안을 우선 적용합니다.
     
-    all_errors = []
-    
-    # 한국어 특화 오류 패턴 체크
-    korean_english_errors = check_korean_english_errors(text)
-    all_errors.extend(korean_english_errors)
+    Parameters:
+    - text: 검사할 텍스트
+    - deadline: time.perf_counter() 기준 마감 시각 (분석 프로파일의 시간 예산용).
+      남은 시간에 맞춰 교정 후보 계산을 줄이고, 지나면 사전에 없는 단어만 표시합니다 (spelling_candidates 참고)
+    """
+    errors = []
+    spell = get_spell_checker()
+    words = custom_word_tokenize(text)
+    misspelled = spell.unknown(words)
+    custom_suggestions = get_custom_suggestions()
     
-    # 패턴 기반 추가 검사 (자주 발생하는 오류)
-    pattern_errors = check_additional_patterns(text)
-    all_errors.extend(pattern_errors)
+    for word in misspelled:
+        # 커스텀 제안 확인
+        if word.lower() in custom_suggestions:
+            suggestions = custom_suggestions[word.lower()]
+        else:
+            suggestions = spelling_candidates(spell, word, deadline)
+        
+        # 단어 위치 찾기
+        word_start = text.find(word)
+        if word_start == -1:
+            continue
+        
+        errors.append({
+            'message': f"철자 오류: '{word}'",
+            'offset': word_start,
+            'length': len(word),
+            'replacements': list(suggestions),
+            'rule': 'SPELLING',
+            'context': text[max(0, word_start - 20):min(len(text), word_start + len(word) + 20)]
+        })
     
-    # TextBlob 문법 체크 사용
+    return errors
+
+# 문법 검사 엔진 설정
+# 빠른 엔진(정규식 규칙, 구문 분석 규칙, 철자)은 바로 실행하고 느린 엔진(모델, 외부 API)은 병렬로 실행
+FAST_GRAMMAR_ENGINES = ('korean_rules', 'parse_rules', 'additional_patterns', 'spelling')
+# 오류를 합칠 때의 엔진 순서 (같은 위치의 중복 오류는 앞 엔진의 것을 사용)
+GRAMMAR_ENGINE_ORDER = ('korean_rules', 'parse_rules', 'additional_patterns', 'textblob', 'languagetool',
+                        'grammarbot', 'spelling', 'sapling', 'gramformer')
+# GrammarBot은 이 엔진들이 아무 오류도 찾지 못했을 때만 실행하는 대체 엔진
+GRAMMARBOT_AFTER = ('korean_rules', 'parse_rules', 'additional_patterns', 'textblob', 'languagetool')
+
+# 재작성 결과 읽기 음성 목록
+REWRITE_VOICES = {
+    "Jenny (여성, 미국)": "en-US-JennyNeural",
+    "Guy (남성, 미국)": "en-US-GuyNeural",
+    "Aria (여성, 영국)": "en-GB-SoniaNeural"
+}
+# 재작성이 끝나면 선택된 음성으로 미리 합성할지 여부 (ENGCHECK_SPEECH_PREFETCH=0이면 끔)
+SPEECH_PREFETCH = os.environ.get("ENGCHECK_SPEECH_PREFETCH", "1") != "0"
+SPEECH_PREFETCH_RESULTS = "engcheck_speech_prefetch_total"
+METRIC_HELP[SPEECH_PREFETCH_RESULTS] = ("재작성 결과 음성 미리 합성 "
+                                        "(outcome=scheduled|skipped_busy|ready|waiting|cancelled)")
+
+# 분석 프로파일: 실행할 엔진, 대체 엔진 실행 조건, 시간 예산(초)
+# - fast: 규칙과 철자 검사만 (수업 중 실시간 확인용)
+# - balanced: TextBlob과 LanguageTool 추가
+# - thorough: Sapling, Gramformer, GrammarBot까지 모두 실행 (야간 일괄 채점용)
+# fallbacks는 {엔진: 조건 엔진 목록}으로, 조건 엔진이 모두 끝나고 아무 오류도 찾지 못했을 때만 실행합니다.
+# skip_low_yield가 True이면 측정한 효용이 낮은 느린 엔진을 건너뜁니다 (engine_cascade 참고).
+# 예산을 넘긴 엔진은 결과에서 제외합니다 (이미 실행 중인 엔진은 끝까지 실행되지만 기다리지 않음).
+ANALYSIS_PROFILES = {
+    'fast': {
+        'engines': FAST_GRAMMAR_ENGINES,
+        'fallbacks': {},
+        'skip_low_yield': True,
+        'budget': float(os.environ.get("ENGCHECK_FAST_BUDGET", "0.8")),
+    },
+    'balanced': {
+        'engines': FAST_GRAMMAR_ENGINES + ('textblob', 'languagetool'),
+        'fallbacks': {},
+        'skip_low_yield': True,
+        'budget': float(os.environ.get("ENGCHECK_BALANCED_BUDGET", "5")),
+    },
+    'thorough': {
+        'engines': GRAMMAR_ENGINE_ORDER,
+        'fallbacks': {'grammarbot': GRAMMARBOT_AFTER},
+        'skip_low_yield': False,
+        'budget': float(os.environ.get("ENGCHECK_THOROUGH_BUDGET", "120")),
+    },
+}
+ANALYSIS_PROFILE_LABELS = {
+    'fast': "빠르게 (규칙·철자)",
+    'balanced': "보통 (+LanguageTool)",
+    'thorough': "꼼꼼하게 (+Gramformer·외부 API)",
+}
+DEFAULT_ANALYSIS_PROFILE = os.environ.get("ENGCHECK_ANALYSIS_PROFILE", "thorough")
+
+# 조건 엔진이 아무 오류도 찾지 못하면 건너뛰는 엔진 (TextBlob은 철자 교정만 하므로 SpellChecker와 겹침)
+CASCADE_PRECONDITIONS = {
+    'textblob': ('spelling', "철자 검사에서 사전에 없는 단어를 찾지 못해 TextBlob 철자 교정을 생략"),
+}
+
+ENGINES_OVER_BUDGET = "engcheck_engines_over_budget_total"
+METRIC_HELP[ENGINES_OVER_BUDGET] = "분석 프로파일의 시간 예산을 넘겨 결과에서 제외한 엔진 수"
+GRAMMAR_ENGINE_LABELS = {
+    'korean_rules': "한국인 학습자 규칙",
+    'parse_rules': "구문 분석 규칙",
+    'additional_patterns': "추가 패턴 규칙",
+    'textblob': "TextBlob 문법 검사",
+    'languagetool': "LanguageTool",
+    'grammarbot': "GrammarBot",
+    'spelling': "철자 검사",
+    'sapling': "Sapling 문법 검사",
+    'gramformer': "Gramformer",
+}
+GRAMMAR_ENGINE_WORKERS = int(os.environ.get("ENGCHECK_ENGINE_WORKERS", "4"))
+
+# 느린 문법 검사 엔진을 병렬로 실행하는 스레드 풀
+# (LanguageTool 조각 검사용 풀과 따로 두어 엔진 작업이 조각 작업을 기다리며 풀을 막지 않게 함)
+@st.cache_resource
+def get_engine_executor():
+    return ThreadPoolExecutor(max_workers=GRAMMAR_ENGINE_WORKERS, thread_name_prefix="grammar-engine")
+
+# 엔진 실행 계획 초기화 함수
+@st.cache_resource
+def get_cascade_planner():
+    """
+    엔진별 지연 시간/효용 통계와 실행 결정 기록을 담은 실행 계획을 반환합니다 (프로세스 전체 공유).
+    """
+    return CascadePlanner(CASCADE_PRECONDITIONS)
+
+# 분석 프로파일 설정 조회 (이름이 없으면 기본 프로파일)
+def get_analysis_profile(name=None):
+    name = name or DEFAULT_ANALYSIS_PROFILE
+    if name not in ANALYSIS_PROFILES:
+        raise ValueError(f"분석 프로파일은 {', '.join(ANALYSIS_PROFILES)} 중 하나여야 합니다: {name}")
+    return dict(ANALYSIS_PROFILES[name], name=name)
+
+# 사용할 문법 검사 엔진 목록
+def grammar_engines(engine_results=None, analysis_profile=None):
+    """
+    실행할 엔진 이름 → 검사 함수(text → 오류 목록) 딕셔너리를 반환합니다.
+    engine_results에 미리 계산된 결과가 있는 엔진은 그 결과를 그대로 반환하는 함수를 사용합니다.
+    analysis_profile을 주면 그 프로파일에 들어 있는 엔진만 반환합니다.
+    """
+    engine_results = engine_results or {}
+    engines = {
+        'korean_rules': check_korean_english_errors,
+        'parse_rules': check_grammar_with_parse_rules,
+        'additional_patterns': check_additional_patterns,
+        'spelling': check_spelling,
+    }
     if has_textblob:
-        try:
-            textblob_errors = check_grammar_with_textblob(text)
-            all_errors.extend(textblob_errors)
-        except Exception as e:
-            st.error(f"TextBlob 문법 검사 오류: {str(e)}")
-    
-    # LanguageTool 검사
+        engines['textblob'] = check_grammar_with_textblob
     if has_languagetool:
-        try:
-            tool = get_language_tool()
-            languagetool_errors = tool.check(text)
-            
-            for error in languagetool_errors:
-                all_errors.append({
-                    'message': error.message,
-                    'offset': error.offset,
-                    'length': error.errorLength,
-                    'replacements': error.replacements,
-                    'rule': error.ruleId,
-                    'context': text[max(0, error.offset - 20):min(len(text), error.offset + error.errorLength + 20)]
-                })
-        except Exception as e:
-            st.error(f"LanguageTool 오류: {str(e)}")
+        engines['languagetool'] = check_grammar_with_languagetool
+    if has_grammarbot:
+        engines['grammarbot'] = check_grammar_with_grammarbot
+    if has_sapling:
+        engines['sapling'] = check_grammar_with_sapling
+    if has_gramformer:
+        engines['gramformer'] = lambda text: gramformer_errors_from_correction(text, correct_grammar_with_gramformer(text))
+    for name, errors in engine_results.items():
+        if name in engines:
+            engines[name] = lambda text, errors=errors: list(errors)
+    if analysis_profile is not None:
+        allowed = get_analysis_profile(analysis_profile)['engines']
+        engines = {name: engine for name, engine in engines.items() if name in allowed}
+    return engines
+
+# 엔진이 끝나는 순서대로 결과를 내보내는 함수
+def iter_grammar_engines(text, engine_results=None, analysis_profile=None):
+    """
+    빠른 엔진을 먼저 차례로 실행하고, 느린 엔진은 병렬로 실행해 끝나는 대로 결과를 내보냅니다.
+    분석 프로파일의 시간 예산이 지나면 아직 끝나지 않은 엔진은 기다리지 않고 실패 메시지와 함께 빈 결과를 내보냅니다.
+    
+    Parameters:
+    - text: 검사할 텍스트
+    - engine_results: check_grammar 참고
+    - analysis_profile: 분석 프로파일 이름 ('fast', 'balanced', 'thorough', None이면 기본 프로파일)
     
-    # GrammarBot 검사
-    if has_grammarbot and not all_errors:
+    Returns:
+    - (엔진 이름, 오류 목록, 실패 메시지 또는 None) 반복자
+    """
+    profile = get_analysis_profile(analysis_profile)
+    engines = grammar_engines(engine_results, profile['name'])
+    precomputed = set(engine_results or {})
+    deadline = time.perf_counter() + profile['budget']
+    if 'spelling' in engines and 'spelling' not in precomputed:
+        # 철자 검사는 작업 스레드가 아니라 바로 실행되어 wait() 시간 제한이 적용되지 않으므로 단어마다 예산을 확인
+        engines['spelling'] = lambda text: check_spelling(text, deadline)
+    planner = get_cascade_planner()
+    # 작업 스레드에서도 캐시된 엔진과 st 함수를 현재 세션 기준으로 쓰도록 스크립트 context를 넘김
+    script_ctx = get_script_run_ctx(suppress_warning=True)
+    
+    def run(name):
+        if script_ctx is not None:
+            add_script_run_ctx(threading.current_thread(), script_ctx)
+        started = time.perf_counter()
         try:
-            grammarbot_errors = check_grammar_with_grammarbot(text)
-            all_errors.extend(grammarbot_errors)
+            # 프로파일링 중인 분석이면 작업 스레드에서 실행한 엔진도 같은 기록에 넣음
+            with profile_worker(), span(f"checker:{name}"):
+                return name, engines[name](text), None
         except Exception as e:
-            st.error(f"GrammarBot 오류: {str(e)}")
+            return name, [], f"{GRAMMAR_ENGINE_LABELS[name]} 오류: {str(e)}"
+        finally:
+            if name not in precomputed:
+                planner.record_latency(name, time.perf_counter() - started)
+    
+    def over_budget(name):
+        increment(ENGINES_OVER_BUDGET, engine=name, profile=profile['name'])
+        return name, [], f"{GRAMMAR_ENGINE_LABELS[name]}: 시간 예산({profile['budget']:g}초)을 넘어 결과에서 제외했습니다"
+    
+    found = {}
+    ran = {}
+    decisions = []
+    
+    def should_run(name):
+        # 이미 계산된 결과는 비용이 없으므로 항상 사용
+        if name in precomputed:
+            return True
+        decision = planner.plan(name, found, profile['skip_low_yield'])
+        decisions.append(decision)
+        return decision['decision'] != "skip"
     
-    # 철자 검사 (SpellChecker)
     try:
-        spell = get_spell_checker()
-        words = custom_word_tokenize(text)
-        misspelled = spell.unknown(words)
-        
-        for word in misspelled:
-            # 커스텀 제안 확인
-            custom_suggestions = get_custom_suggestions()
-            if word.lower() in custom_suggestions:
-                suggestions = custom_suggestions[word.lower()]
-            else:
-                suggestions = spell.candidates(word)
+        for name in FAST_GRAMMAR_ENGINES:
+            if name in engines:
+                # 빠른 엔진은 중간에 멈출 수 없으므로 시작하기 전에 예산을 확인
+                result = run(name) if time.perf_counter() < deadline else over_budget(name)
+                found[name] = len(result[1])
+                if not result[2]:
+                    ran[name] = result[1]
+                yield result
+        
+        executor = get_engine_executor()
+        pending = {}
+        
+        def submit(name):
+            if should_run(name):
+                # 엔진별로 현재 context를 복사해 넘겨야 작업 스레드의 단계 기록도 요청의 trace에 모임
+                pending[executor.submit(contextvars.copy_context().run, run, name)] = name
+                return None
+            found[name] = 0
+            return name, [], None
+        
+        fallbacks = {name: [after for after in conditions if after in engines]
+                     for name, conditions in profile['fallbacks'].items() if name in engines}
+        for name in engines:
+            if name not in FAST_GRAMMAR_ENGINES and name not in fallbacks:
+                skipped = submit(name)
+                if skipped:
+                    yield skipped
+        while pending or fallbacks:
+            # 조건 엔진이 모두 끝난 대체 엔진은 조건 엔진이 아무 오류도 찾지 못했을 때만 실행
+            for name, conditions in list(fallbacks.items()):
+                if all(after in found for after in conditions):
+                    del fallbacks[name]
+                    if not any(found[after] for after in conditions):
+                        skipped = submit(name)
+                        if skipped:
+                            yield skipped
+            if not pending:
+                break
             
-            # 단어 위치 찾기
-            word_start = text.find(word)
-            if word_start == -1:
-                continue
-            
-            all_errors.append({
-                'message': f"철자 오류: '{word}'",
-                'offset': word_start,
-                'length': len(word),
-                'replacements': list(suggestions),
-                'rule': 'SPELLING',
-                'context': text[max(0, word_start - 20):min(len(text), word_start + len(word) + 20)]
-            })
-    except Exception as e:
-        st.error(f"철자 검사 오류: {str(e)}")
+            done, _ = wait(pending, timeout=max(0.0, deadline - time.perf_counter()), return_when=FIRST_COMPLETED)
+            if not done:
+                # 예산 초과: 시작하지 않은 엔진은 취소하고 실행 중인 엔진은 기다리지 않음
+                for future, name in pending.items():
+                    future.cancel()
+                    yield over_budget(name)
+                for name in fallbacks:
+                    yield over_budget(name)
+                return
+            for future in done:
+                del pending[future]
+                result = future.result()
+                found[result[0]] = len(result[1])
+                if not result[2]:
+                    ran[result[0]] = result[1]
+                yield result
+    finally:
+        # 실제로 실행한 엔진의 오류 중 중복 제거 후 남은 수로 효용 통계를 갱신하고 결정을 기록
+        planner.record_outcome({name: errors for name, errors in ran.items() if name not in precomputed},
+                               merge_engine_results(ran))
+        planner.log_run(decisions, profile=profile['name'], text_length=len(text))
+
+# 엔진별 결과를 정해진 순서로 합치는 함수
+def merge_engine_results(results):
+    ordered = [error for name in GRAMMAR_ENGINE_ORDER for error in results.get(name, [])]
+    return merge_grammar_errors(ordered)
+
+# 종합 문법 검사 함수
+def check_grammar(text, engine_results=None, analysis_profile=None):
+    """
+    여러 엔진을 사용하여 문법을 체크합니다.
     
-    # Sapling API 검사 추가
-    if has_sapling:
-        try:
-            sapling_errors = check_grammar_with_sapling(text)
-            all_errors.extend(sapling_errors)
-        except Exception as e:
-            st.error(f"Sapling 문법 검사 오류: {str(e)}")
+    Parameters:
+    - text: 검사할 텍스트
+    - engine_results: 엔진 이름('languagetool', 'gramformer')별로 미리 계산된 오류 목록.
+      API 서버처럼 여러 요청을 묶어 검사한 경우 해당 엔진을 다시 실행하지 않고 이 결과를 사용합니다.
+    - analysis_profile: 분석 프로파일 이름 (ANALYSIS_PROFILES 참고, None이면 기본 프로파일)
     
-    # Gramformer 검사 추가 (전체 문장 교정)
-    if has_gramformer:
-        try:
-            corrected_text = correct_grammar_with_gramformer(text)
-            if corrected_text and corrected_text != text:
-                all_errors.append({
-                    'message': "문법 교정 제안",
-                    'offset': 0,
-                    'length': len(text),
-                    'replacements': [corrected_text],
-                    'rule': 'GRAMFORMER_CORRECTION',
-                    'context': text
-                })
-        except Exception as e:
-            st.error(f"Gramformer 오류: {str(e)}")
+    Returns:
+    - 오프셋 기준으로 정렬되고 중복이 제거된 오류 목록
+    """
+    if not text.strip():
+        return []
+    
+    results = {}
+    for name, errors, failure in iter_grammar_engines(text, engine_results, analysis_profile):
+        results[name] = errors
+        if failure:
+            st.error(failure)
     
+    with span("checker:merge"):
+        return merge_engine_results(results)
+
+# 엔진이 끝날 때마다 중간 결과를 알려주는 문법 검사 함수
+def check_grammar_with_progress(text, on_progress=None, analysis_profile=None):
+    """
+    빠른 엔진 결과를 먼저 알리고, 느린 엔진 결과는 끝나는 대로 합쳐 on_progress로 알립니다.
+    최종 결과는 check_grammar와 같습니다. st 함수를 쓰지 않으므로 작업 스레드에서도 실행할 수 있습니다.
+    
+    Parameters:
+    - text: 검사할 텍스트
+    - on_progress: (지금까지 합친 오류 목록, 아직 실행 중인 엔진 이름 목록)을 받는 함수
+    - analysis_profile: 분석 프로파일 이름
+    
+    Returns:
+    - (check_grammar와 같은 형식의 오류 목록, 실패 메시지 목록)
+    """
+    if not text.strip():
+        return [], []
+    
+    results = {}
+    failures = []
+    profile = get_analysis_profile(analysis_profile)
+    # 대체 엔진은 조건에 따라 실행되지 않을 수 있으므로 대기 목록에서 제외
+    waiting = set(grammar_engines(analysis_profile=profile['name'])) - set(profile['fallbacks'])
+    for name, errors, failure in iter_grammar_engines(text, analysis_profile=profile['name']):
+        results[name] = errors
+        waiting.discard(name)
+        if failure:
+            failures.append(failure)
+        if on_progress:
+            on_progress(merge_engine_results(results), sorted(waiting))
+    
+    with span("checker:merge"):
+        return merge_engine_results(results), failures
+
+# 문법 검사 중간 결과 미리보기 표시 함수
+def render_grammar_preview(text, errors, waiting, stats=None):
+    highlighted_text, error_details = display_grammar_errors(text, errors)
+    if stats:
+        st.caption(f"단어 {stats['word_count']}개 · 문장 {stats['sentence_count']}개")
+    status = f"오류 {len(errors)}개 발견"
+    if waiting:
+        status += f" · 검사 중: {', '.join(GRAMMAR_ENGINE_LABELS[engine] for engine in waiting)}"
+    st.caption(status)
+    st.markdown(highlighted_text, unsafe_allow_html=True)
+    for error in error_details:
+        st.markdown(f"- **{error['text']}**: {error['message']}")
+
+# 여러 엔진의 오류를 합치는 함수
+def merge_grammar_errors(all_errors):
+    """오류를 오프셋 기준으로 정렬하고 같은 위치의 중복 오류를 제거합니다."""
     # 결과를 정렬: 오프셋 기준
-    all_errors.sort(key=lambda x: x['offset'])
+    all_errors = sorted(all_errors, key=lambda x: x['offset'])
     
     # 중복 제거: 같은 위치에 있는 오류 중 가장 유용한 것만 유지
     filtered_errors = []
@@ -658,94 +1304,8 @@ def check_grammar(text):
     
 # 추가 패턴 검사 함수 추가
 def check_additional_patterns(text):
-    """한국인 학습자가 자주 범하는 오류 패턴을 검사합니다."""
-    errors = []
-    
-    # 문장들로 분리
-    sentences = custom_sent_tokenize(text)
-    current_pos = 0
-    
-    for sentence in sentences:
-        # 전치사 누락 패턴: "impeachment the" -> "impeachment of the"
-        pattern_impeachment = r'\bimpeachment\s+the\b'
-        matches = re.finditer(pattern_impeachment, sentence, re.IGNORECASE)
-        for match in matches:
-            start_in_sentence = match.start()
-            length = match.end() - match.start()
-            start_in_text = text.find(sentence, current_pos) + start_in_sentence
-            
-            if start_in_text >= 0:
-                        errors.append({
-                    'message': "전치사 누락: 'impeachment the' → 'impeachment of the'",
-                    'offset': start_in_text,
-                    'length': length,
-                    'replacements': ['impeachment of the'],
-                    'rule': 'MISSING_PREPOSITION',
-                    'context': sentence
-                })
-        
-        # 불완전 문장 패턴: "has serious" 다음에 명사가 없거나 불충분한 경우
-        pattern_incomplete = r'has\s+serious(?:\s+(?!consequences|implications|impact|effects|issues|problems)\w+)?(?:\s*[,.;]|\s+(?:and|but|or)|\s*$)'
-        matches = re.finditer(pattern_incomplete, sentence, re.IGNORECASE)
-        for match in matches:
-            start_in_sentence = match.start()
-            length = match.end() - match.start()
-            start_in_text = text.find(sentence, current_pos) + start_in_sentence
-            
-            if start_in_text >= 0:
-                                errors.append({
-                    'message': "불완전 문장: 명사가 필요합니다. 'has serious' → 'has serious consequences'",
-                    'offset': start_in_text,
-                    'length': length,
-                    'replacements': ['has serious consequences', 'has serious implications', 'has serious effects'],
-                    'rule': 'INCOMPLETE_SENTENCE',
-                    'context': sentence
-                })
-        
-        # 기타 전치사 누락 패턴들
-        # "related to" 다음에 "the"가 오는 경우 체크
-        pattern_related = r'\brelated\s+the\b'
-        matches = re.finditer(pattern_related, sentence, re.IGNORECASE)
-        for match in matches:
-            start_in_sentence = match.start()
-            length = match.end() - match.start()
-            start_in_text = text.find(sentence, current_pos) + start_in_sentence
-            
-            if start_in_text >= 0:
-                                    errors.append({
-                    'message': "전치사 누락: 'related the' → 'related to the'",
-                    'offset': start_in_text,
-                    'length': length,
-                    'replacements': ['related to the'],
-                    'rule': 'MISSING_PREPOSITION',
-                    'context': sentence
-                })
-                
-        # 대응하는 to-be 동사가 없는 경우
-        pattern_missing_verb = r'(the\s+\w+(?:\s+\w+){0,3})\s+(?:very|so|quite|extremely)\s+(\w+)(?:\s+(?:and|but|or)\s+(?:very|so|quite|extremely)\s+(\w+))?(?:\s*[,.]|\s+(?:that|which|who)|\s*$)'
-        matches = re.finditer(pattern_missing_verb, sentence, re.IGNORECASE)
-        for match in matches:
-            start_in_sentence = match.start()
-            length = match.end() - match.start()
-            start_in_text = text.find(sentence, current_pos) + start_in_sentence
-            
-            subject = match.group(1)
-            adjective = match.group(2)
-            
-            if start_in_text >= 0:
-                errors.append({
-                    'message': f"동사 누락: '{subject} {adjective}' → '{subject} is {adjective}'",
-                    'offset': start_in_text,
-                    'length': length,
-                    'replacements': [f"{subject} is {adjective}"],
-                    'rule': 'MISSING_VERB',
-                    'context': sentence
-                })
-        
-        # 현재 위치 업데이트
-        current_pos += len(sentence)
-    
-    return errors
+    """한국인 학습자가 자주 범하는 오류 패턴을 검사합니다 (rules/additional_patterns.json)."""
+    return get_rule_set("additional_patterns").check(text)
 
 # 문법 오류 시각화 및 표시를 위한 함수
 def display_grammar_errors(text, errors):
@@ -802,6 +1362,7 @@ def display_grammar_errors(text, errors):
     return highlighted_text, error_details
 
 # 텍스트 통계 분석 함수
+@timed("vocab:analyze_text")
 def analyze_text(text):
     if not text.strip():
         return {
@@ -831,6 +1392,7 @@ def analyze_text(text):
     }
 
 # 어휘 분석 함수
+@timed("vocab:analyze_vocabulary")
 def analyze_vocabulary(text):
     if not text.strip():
         return {
@@ -852,15 +1414,26 @@ def analyze_vocabulary(text):
         'word_freq': dict(word_freq)
     }
 
-# 어휘 다양성 점수 계산
-def calculate_lexical_diversity(text):
-    words = custom_word_tokenize(text.lower())
-    words = [word for word in words if re.match(r'\w+', word)]
+# 어휘 다양성 지표 계산
+@timed("vocab:lexical_diversity")
+def measure_lexical_diversity(text, tokens=None):
+    """
+    MATTR, MTLD, HD-D, Yule's K를 토큰을 한 번 훑어 계산합니다.
     
-    if len(words) == 0:
-        return 0
+    Parameters:
+    - text: 분석할 텍스트
+    - tokens: 이미 만든 vocabulary_tokens 결과 (주면 다시 토큰화하지 않음)
     
-    return len(set(words)) / len(words)
+    Returns:
+    - lexical_metrics 모듈의 지표 딕셔너리
+    """
+    if tokens is None:
+        tokens = vocabulary_tokens(text)
+    return lexical_metrics(tokens)
+
+# 어휘 다양성 점수 계산 (글 길이에 덜 민감한 MATTR)
+def calculate_lexical_diversity(text):
+    return measure_lexical_diversity(text)['mattr']
 
 # 단어 빈도 시각화
 def plot_word_frequency(word_freq):
@@ -1094,66 +1667,444 @@ def rewrite_text(text, level="similar"):
         return ""
     
     # 레벨에 따라 적절한 재작성 함수 호출
-    if level == "similar":
-        return rewrite_similar_level(text)
-    elif level == "improved":
-        return rewrite_improved_level(text)
-    elif level == "advanced":
-        if has_transformers:
-            return advanced_rewrite_text(text, level)
+    with span(f"rewrite:{level}"):
+        if level == "similar":
+            return rewrite_similar_level(text)
+        elif level == "improved":
+            return rewrite_improved_level(text)
+        elif level == "advanced":
+            if has_transformers:
+                return advanced_rewrite_text(text, level)
+            else:
+                return rewrite_advanced_level(text)
         else:
-            return rewrite_advanced_level(text)
-    else:
-        return text  # 기본값은 원본 텍스트 반환
+            return text  # 기본값은 원본 텍스트 반환
 
-# 학생 페이지
-def evaluate_vocabulary_level(text):
-    # 온라인 데이터셋에서 어휘 로드
-    vocabulary_sets = default_vocabulary_sets()
+# 단어 빈도 목록 저장 함수
+def save_frequency_list(text):
+    """
+    단어 빈도 목록을 같은 디렉터리의 임시 파일에 쓴 뒤 WORD_FREQUENCY_PATH로 바꿔치기합니다.
+
+    Parameters:
+    - text: 저장할 빈도 목록 텍스트
+    """
+    directory = os.path.dirname(WORD_FREQUENCY_PATH)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=".en_50k_", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temp_path, WORD_FREQUENCY_PATH)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+# 단어 빈도 순위 표 로드 함수
+@st.cache_resource(ttl=3600)
+def get_frequency_ranks():
+    """
+    단어 빈도 목록을 "단어 → 순위" 표로 만들어 반환합니다.
+    목록은 처음 한 번만 내려받아 WORD_FREQUENCY_PATH에 저장해 두고 이후에는 파일에서 읽습니다.
+    형식이 맞지 않는 목록은 저장하지 않으며, 저장은 임시 파일을 쓴 뒤 바꿔치기해 반쯤 쓰인 파일이 남지 않게 합니다.
+    내려받을 수 없으면 내장 기본 단어 셋으로 만든 표를 사용합니다 (1시간 뒤 다시 시도).
+    """
+    if os.path.exists(WORD_FREQUENCY_PATH):
+        with open(WORD_FREQUENCY_PATH, encoding="utf-8") as f:
+            text = f.read()
+        if is_frequency_text(text):
+            return FrequencyRanks.from_frequency_text(text)
+        print(f"단어 빈도 목록 파일 형식 오류, 다시 내려받습니다: {WORD_FREQUENCY_PATH}")
     
-    # 온라인 데이터셋 로드 시도
     try:
         import requests
         
         # 영어 단어 빈도 데이터 다운로드
-        word_freq_url = "https://raw.githubusercontent.com/hermitdave/FrequencyWords/master/content/2018/en/en_50k.txt"
-        response = requests.get(word_freq_url)
-        if response.status_code == 200:
-            # 단어 빈도 데이터 파싱 (형식: "단어 빈도")
-            lines = response.text.splitlines()
-            words = [line.split()[0] for line in lines if ' ' in line]
-            
-            # 빈도에 따라 단어 분류
-            total_words = len(words)
-            basic_cutoff = int(total_words * 0.2)  # 상위 20%
-            intermediate_cutoff = int(total_words * 0.5)  # 상위 20~50%
-            
-            basic_words = set(words[:basic_cutoff])
-            intermediate_words = set(words[basic_cutoff:intermediate_cutoff])
-            advanced_words = set(words[intermediate_cutoff:])
-            
-            vocabulary_sets = {'basic': basic_words, 'intermediate': intermediate_words, 'advanced': advanced_words}
+        with span("api:word_frequency_list"):
+            response = requests.get(WORD_FREQUENCY_URL, timeout=30)
+        if response.status_code == 200 and is_frequency_text(response.text):
+            save_frequency_list(response.text)
+            return FrequencyRanks.from_frequency_text(response.text)
+        record_api_failure("word_frequency_list")
     except Exception as e:
-        pass
+        record_api_failure("word_frequency_list")
+        print(f"단어 빈도 목록 다운로드 오류: {e}")
     
-    words = custom_word_tokenize(text.lower())
-    words = [word for word in words if re.match(r'\w+', word)]
+    return FrequencyRanks.from_level_sets(default_vocabulary_sets())
+
+# 어휘 분석용 토큰 (소문자 단어만)
+def vocabulary_tokens(text):
+    return [word for word in custom_word_tokenize(text.lower()) if re.match(r'\w+', word)]
+
+# 어휘 프로파일 함수
+@timed("vocab:profile_vocabulary")
+def profile_vocabulary(text, tokens=None):
+    """
+    단어 빈도 순위로 글의 어휘 프로파일을 계산합니다.
     
-    word_set = set(words)
+    Returns:
+    - 빈도 구간별 토큰 수, 평균/중앙 순위, 희귀어 비율, 학술 어휘 비율, 어휘 세련도,
+      어휘 수준 비율(levels) 딕셔너리 (vocab_profile 모듈 참고)
+    """
+    if tokens is None:
+        tokens = vocabulary_tokens(text)
+    return profile_tokens(tokens, get_frequency_ranks(), get_academic_word_list())
+
+# 여러 글의 어휘 프로파일을 한 번에 계산하는 함수
+def profile_vocabulary_batch(texts):
+    """글 목록의 어휘 프로파일을 행렬로 계산합니다 (vocab_profile.profile_batch 결과)."""
+    return profile_batch([vocabulary_tokens(text) for text in texts], get_frequency_ranks(),
+                         get_academic_word_list())
+
+# 어휘 수준 평가 함수
+@timed("vocab:evaluate_vocabulary_level")
+def evaluate_vocabulary_level(text):
+    """고유 단어 중 기초/중급/고급 어휘 비율을 반환합니다."""
+    return profile_vocabulary(text)['levels']
+
+# 어휘 다양성 세부 지표 표시 함수
+def show_lexical_metrics(metrics):
+    col1, col2, col3 = st.columns(3)
+    col1.metric("MTLD", f"{metrics['mtld']:.1f}", help="다양성이 유지되는 구간의 평균 길이 (클수록 다양함)")
+    col2.metric("HD-D", f"{metrics['hdd']:.2f}", help="42단어를 무작위로 뽑았을 때 기대되는 고유 단어 비율")
+    col3.metric("Yule's K", f"{metrics['yules_k']:.1f}", help="같은 단어의 반복 정도 (작을수록 다양함)")
+
+# 어휘 프로파일 표시 함수
+def show_vocabulary_profile(vocab_profile):
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("평균 빈도 순위", f"{vocab_profile['mean_rank']:.0f}",
+                help=f"중앙값 {vocab_profile['median_rank']:.0f}. 숫자가 클수록 덜 흔한 단어를 사용했습니다.")
+    col2.metric("희귀어 비율", f"{vocab_profile['rare_ratio']:.0%}", help="빈도 순위 5,000위 밖 단어의 비율")
+    col3.metric("어휘 세련도", f"{vocab_profile['sophistication']:.0%}", help="빈도 순위 2,000위 밖 단어의 비율")
+    col4.metric("학술 어휘 비율", f"{vocab_profile['awl_coverage']:.0%}", help="학술 단어 목록(AWL)에 속한 단어의 비율")
+    
+    band_df = pd.DataFrame({
+        '빈도 구간': BAND_LABELS,
+        '단어 수': [vocab_profile['band_counts'][label] for label in BAND_LABELS]
+    })
+    fig = px.bar(band_df, x='빈도 구간', y='단어 수', title='빈도 구간별 단어 분포')
+    st.plotly_chart(fig, use_container_width=True)
+
+# 비슷한 이전 제출물 표시 함수
+def show_similar_essays(similar_essays):
+    st.warning(f"비슷한 이전 제출물이 {len(similar_essays)}개 있습니다. 베끼기나 재작성 결과 붙여 넣기 여부를 확인해 보세요.")
+    for match in similar_essays:
+        with st.expander(f"{match['student']} · {match['timestamp']} · {match['kind']} "
+                         f"(유사도 {match['similarity']:.0%})"):
+            st.write(match['preview'] + ("..." if len(match['preview']) >= PREVIEW_CHARS else ""))
+
+# 전체 분석 함수 (작업 스레드에서 실행)
+def run_full_analysis(text, role="student", student=None, profile=False, on_progress=None, analysis_profile=None,
+                      check_cancelled=None, author=None):
+    """
+    "전체 분석하기"의 모든 단계를 실행하고 결과를 반환합니다.
+    st 함수를 쓰지 않으므로 작업 대기열의 작업 스레드에서 실행됩니다.
     
-    basic_count = len(word_set.intersection(vocabulary_sets['basic']))
-    intermediate_count = len(word_set.intersection(vocabulary_sets['intermediate']))
-    advanced_count = len(word_set.intersection(vocabulary_sets['advanced']))
+    Parameters:
+    - text: 분석할 텍스트
+    - role: 'student'이면 기록 저장소와 유사도 색인에 저장, 'teacher'이면 비슷한 이전 제출물을 찾음
+    - student: 기록에 남길 학생 이름
+    - profile: True이면 cProfile 결과를 함께 반환
+    - on_progress: (중간 오류 목록, 실행 중인 엔진 목록, 텍스트 통계)를 받는 함수
+    - analysis_profile: 문법 검사 분석 프로파일 이름 (ANALYSIS_PROFILES 참고)
+    - check_cancelled: 단계 사이마다 호출하는 함수 (작업이 취소되었으면 JobCancelled를 던짐)
+    - author: role이 'teacher'일 때 이 글을 쓴 학생 (비슷한 이전 제출물에서 그 학생의 글은 제외)
     
-    total = basic_count + intermediate_count + advanced_count
-    if total == 0:
-        return {'basic': 0, 'intermediate': 0, 'advanced': 0}
+    Returns:
+    - analysis_results 딕셔너리와 trace(단계별 시간), profile(프로파일 결과), engine_failures(엔진 실패 메시지)
+    """
+    analysis_profile = get_analysis_profile(analysis_profile)['name']
+    checkpoint = check_cancelled or (lambda: None)
+    with trace() as spans, profile_if_requested(profile, f"analysis_{role}", text, analysis_profile) as report, \
+            span(f"analysis:{role}"):
+        # 텍스트 통계 분석
+        stats = analyze_text(text)
+        checkpoint()
+        
+        # 문법 오류 검사 (엔진이 끝날 때마다 중간 결과를 알림)
+        report_progress = None
+        if on_progress:
+            report_progress = lambda errors, waiting: on_progress(errors, waiting, stats)
+        try:
+            grammar_errors, failures = check_grammar_with_progress(text, report_progress, analysis_profile)
+        except JobCancelled:
+            raise
+        except Exception as e:
+            grammar_errors, failures = [], [f"문법 검사 중 오류가 발생했습니다: {e}"]
+        checkpoint()
+        
+        # 어휘 분석
+        vocab_analysis = analyze_vocabulary(text)
+        
+        # 어휘 다양성 지표와 어휘 수준 평가는 같은 토큰 목록을 공유
+        vocab_tokens = vocabulary_tokens(text)
+        lexical = measure_lexical_diversity(text, vocab_tokens)
+        diversity_score = lexical['mattr']
+        
+        # 어휘 수준 평가 (빈도 순위 프로파일)
+        vocab_profile = profile_vocabulary(text, vocab_tokens)
+        vocab_level = vocab_profile['levels']
+        # 취소된 분석은 기록과 유사도 색인에 남기지 않음
+        checkpoint()
+        
+        results = {
+            'stats': stats,
+            'grammar_errors': grammar_errors,
+            'vocab_analysis': vocab_analysis,
+            'diversity_score': diversity_score,
+            'lexical_metrics': lexical,
+            'vocab_level': vocab_level,
+            'vocab_profile': vocab_profile,
+            'original_text': text  # 원본 텍스트도 저장
+        }
+        
+        if role == "teacher":
+            # 비슷한 이전 제출물 (글쓴이를 고른 경우 그 학생의 글 제외)
+            with span("similarity:query"):
+                results['similar_essays'] = get_similarity_index().query(vocab_tokens, exclude_student=author)
+        else:
+            # 기록에 저장
+            get_history_store().append(
+                student=student,
+                text=text,
+                action="분석",
+                error_count=len(grammar_errors),
+                summary=summarize_analysis(stats, grammar_errors, vocab_level),
+                analysis={
+                    'grammar_errors': grammar_errors,
+                    'stats': stats,
+                    'vocab_level': vocab_level,
+                    'diversity_score': diversity_score
+                }
+            )
+            
+            # 유사도 색인에 추가하면서 다른 학생의 이전 글과 비교 (찾은 글은 교사 대시보드에 표시)
+            with span("similarity:add"):
+                get_similarity_index().add_and_query(student, text, vocab_tokens)
+    
+    results['trace'] = spans
+    results['profile'] = report
+    results['engine_failures'] = failures
+    return results
+
+# 분석 작업 처리 함수
+def run_analysis_job(payload, job):
+    def report_progress(errors, waiting, stats):
+        job.progress({'grammar_errors': errors, 'waiting': waiting, 'stats': stats})
+        # 취소 버튼을 누르면 남은 엔진을 기다리지 않고 멈춤
+        job.check_cancelled()
+    return run_full_analysis(payload['text'], payload['role'], job.student, payload.get('profile', False),
+                             report_progress, payload.get('analysis_profile'), job.check_cancelled,
+                             payload.get('author'))
+
+# 재작성 작업 처리 함수
+def run_rewrite_job(payload, job):
+    text, level = payload['text'], payload['level']
+    job.check_cancelled()
+    with profile_if_requested(payload.get('profile', False), f"rewrite_{level}", text) as report:
+        rewritten_text = rewrite_text(text, level)
+    # 취소된 재작성은 기록과 유사도 색인에 남기지 않음
+    job.check_cancelled()
+    
+    # 기록에 추가
+    get_history_store().append(student=job.student, text=text, action=f"재작성 ({payload['level_label']})")
+    
+    # 재작성 결과도 색인해 두어 결과를 그대로 제출한 글을 찾을 수 있게 함
+    with span("similarity:add"):
+        get_similarity_index().add(job.student, rewritten_text, vocabulary_tokens(rewritten_text), kind="재작성 결과")
+    return {'rewritten_text': rewritten_text, 'level': level, 'profile': report}
+
+# 음성 합성 작업 처리 함수
+def run_tts_job(payload, job):
+    # 요청한 세션이 소유하는 임시 파일 (세션이 끝나거나 TTL이 지나면 삭제)
+    output_file = get_temp_files().new_path(payload['prefix'], ".wav", owner=payload.get('session_id'))
+    word_boundaries = []
+    last_report = [0.0]
+    
+    # 합성 중인 파일 경로와 진행 상황을 기록 (API 서버가 이 파일을 이어서 스트리밍함)
+    def report_chunk(written):
+        now = time.time()
+        if now - last_report[0] < TTS_PROGRESS_INTERVAL:
+            return
+        last_report[0] = now
+        job.progress({'path': output_file, 'bytes': written, 'words': len(word_boundaries)})
+        # 텍스트가 바뀌어 취소된 합성은 끝까지 기다리지 않고 바로 멈춤
+        job.check_cancelled()
+    
+    job.progress({'path': output_file, 'bytes': 0, 'words': 0})
+    try:
+        path = sync_text_to_speech(payload['text'], payload['voice'], output_file, word_boundaries, report_chunk)
+        job.check_cancelled()
+    except JobCancelled:
+        get_temp_files().release(output_file, "cancelled")
+        raise
+    return {'path': path, 'word_boundaries': word_boundaries}
+
+# 진행 중인 작업 상태를 다시 확인하는 간격(초)
+# 문법 검사 중간 결과가 엔진이 끝나는 대로 보이도록 짧게 둠 (한 번 확인은 작업 DB 조회 한 번)
+JOB_POLL_INTERVAL = float(os.environ.get("ENGCHECK_JOB_POLL_INTERVAL", "0.1"))
+
+# 작업 대기열 초기화 함수
+@st.cache_resource
+def get_job_queue():
+    """
+    분석/재작성/음성 합성 작업 대기열을 반환합니다.
+    같은 작업 데이터베이스를 쓰는 모든 서버 프로세스를 합쳐 ENGCHECK_JOB_WORKERS개까지만 동시에 실행합니다.
+    """
+    queue = JobQueue()
+    queue.register('analysis', run_analysis_job)
+    queue.register('rewrite', run_rewrite_job)
+    queue.register('tts', run_tts_job)
+    return queue.start()
+
+# 작업을 제출하고 작업 ID를 세션에 기록하는 함수
+def submit_job(job_key, kind, payload):
+    job_id = get_job_queue().submit(kind, payload, student=get_current_student())
+    st.session_state[job_key] = job_id
+    return job_id
+
+# 재작성 결과를 미리 음성으로 합성하는 함수
+def prefetch_speech(text, voice):
+    """
+    재작성이 끝나면 학생이 "음성 파일 생성"을 누르기 전에 선택된 음성으로 미리 합성을 시작합니다.
+    추측으로 하는 작업이 실제 요청을 밀어내지 않도록 작업 대기열에 기다리는 작업이 없고
+    실행 자리가 남아 있을 때만 제출하며, 세션마다 하나만 유지합니다 (이전 것은 취소).
     
-    return {
-        'basic': basic_count / max(1, total),
-        'intermediate': intermediate_count / max(1, total),
-        'advanced': advanced_count / max(1, total)
-    }
+    Parameters:
+    - text: 재작성된 텍스트
+    - voice: 현재 선택된 음성 모델
+    """
+    cancel_speech_prefetch()
+    if not SPEECH_PREFETCH or not text.strip():
+        return
+    queue = get_job_queue()
+    counts = queue.counts()
+    if counts.get('queued', 0) or counts.get('running', 0) >= queue.max_running:
+        increment(SPEECH_PREFETCH_RESULTS, outcome="skipped_busy")
+        return
+    job_id = queue.submit('tts', {
+        'text': text,
+        'voice': voice,
+        'prefix': "speech_",
+        'session_id': current_session_id(),
+        'speculative': True
+    }, student=get_current_student())
+    st.session_state.speech_prefetch = {'job_id': job_id, 'text': text, 'voice': voice}
+    increment(SPEECH_PREFETCH_RESULTS, outcome="scheduled")
+
+# 미리 합성을 취소하는 함수 (재작성 결과나 음성이 바뀐 경우)
+def cancel_speech_prefetch():
+    prefetch = st.session_state.pop('speech_prefetch', None)
+    if prefetch is None:
+        return
+    queue = get_job_queue()
+    job = queue.get(prefetch['job_id'])
+    if job is not None and job['status'] in ACTIVE_STATUSES:
+        queue.cancel(job['id'])
+    elif job is not None and job['status'] == 'done':
+        get_temp_files().release(job['result']['path'], "cancelled")
+    increment(SPEECH_PREFETCH_RESULTS, outcome="cancelled")
+
+# 화면에 보이는 텍스트/음성과 다른 미리 합성을 취소하는 함수
+def discard_stale_speech_prefetch(text, voice):
+    prefetch = st.session_state.get('speech_prefetch')
+    if prefetch is not None and (prefetch['text'], prefetch['voice']) != (text, voice):
+        cancel_speech_prefetch()
+
+# 미리 합성한 음성 작업을 넘겨받는 함수
+def claim_speech_prefetch(text, voice):
+    """
+    text/voice로 미리 합성한 작업이 있으면 넘겨받습니다.
+    
+    Returns:
+    - 끝났거나 진행 중인 작업 (끝났으면 result에 파일 경로), 쓸 수 있는 작업이 없으면 None
+    """
+    discard_stale_speech_prefetch(text, voice)
+    prefetch = st.session_state.pop('speech_prefetch', None)
+    if prefetch is None:
+        return None
+    job = get_job_queue().get(prefetch['job_id'])
+    if job is None or (job['status'] == 'done' and not os.path.exists(job['result']['path'])):
+        return None
+    if job['status'] == 'done':
+        increment(SPEECH_PREFETCH_RESULTS, outcome="ready")
+        return job
+    if job['status'] in ACTIVE_STATUSES:
+        increment(SPEECH_PREFETCH_RESULTS, outcome="waiting")
+        return job
+    return None
+
+# 작업 상태 확인 조각 (JOB_POLL_INTERVAL마다 이 부분만 다시 실행)
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def poll_job(job_key, on_done, label, show_progress=None):
+    """
+    세션에 기록된 작업의 대기 순서/진행 상황을 표시하고, 끝나면 on_done(결과)를 호출한 뒤 화면 전체를 다시 그립니다.
+    
+    Parameters:
+    - job_key: 작업 ID를 저장한 세션 상태 키
+    - on_done: 작업 결과를 받아 세션 상태에 저장하는 함수
+    - label: 상태 메시지에 쓸 작업 이름
+    - show_progress: 실행 중인 작업 정보를 받아 중간 결과를 그리는 함수
+    """
+    job_id = st.session_state.get(job_key)
+    job = get_job_queue().get(job_id) if job_id else None
+    if job is None or job['status'] not in ACTIVE_STATUSES:
+        st.session_state.pop(job_key, None)
+        if job is not None and job['status'] == 'done':
+            on_done(job['result'])
+        elif job is not None and job['status'] == 'failed':
+            st.session_state[f"{job_key}_error"] = f"{label} 중 오류가 발생했습니다: {job['error']}"
+        st.rerun(scope="app")
+    
+    status_col, cancel_col = st.columns([4, 1])
+    with status_col:
+        if job['status'] == 'queued':
+            st.info(f"{label} 대기 중입니다 (대기 순서 {job['position']}번).")
+        else:
+            st.info(f"{label} 중입니다... ({time.time() - job['started']:.0f}초)")
+    with cancel_col:
+        if st.button("취소", key=f"cancel_{job_key}", use_container_width=True):
+            get_job_queue().cancel(job_id)
+    if job['status'] == 'running' and job['progress'] and show_progress:
+        show_progress(job)
+
+# 진행 중인 작업 표시 (작업이 있을 때만 주기적으로 확인)
+def show_job_status(job_key, on_done, label, show_progress=None):
+    if st.session_state.get(job_key):
+        poll_job(job_key, on_done, label, show_progress)
+    if f"{job_key}_error" in st.session_state:
+        st.error(st.session_state.pop(f"{job_key}_error"))
+
+# 분석 프로파일 선택 버튼
+def select_analysis_profile(key):
+    names = list(ANALYSIS_PROFILES)
+    return st.radio(
+        "분석 모드",
+        options=names,
+        index=names.index(DEFAULT_ANALYSIS_PROFILE),
+        format_func=ANALYSIS_PROFILE_LABELS.get,
+        horizontal=True,
+        key=key,
+        help="빠르게: 수업 중 바로 확인 (1초 이내), 꼼꼼하게: 모든 검사 엔진 실행 (오래 걸릴 수 있음)"
+    )
+
+# 분석 작업의 문법 검사 중간 결과 표시
+def show_analysis_progress(job):
+    progress = job['progress']
+    render_grammar_preview(job['payload']['text'], progress['grammar_errors'], progress['waiting'], progress['stats'])
+
+# 분석 작업 결과를 세션 상태에 저장하는 함수
+def store_analysis_results(results_key):
+    def on_done(results):
+        st.session_state.last_trace = results.pop('trace')
+        report = results.pop('profile')
+        if report:
+            st.session_state.last_profile = report
+        for failure in results.pop('engine_failures'):
+            st.toast(failure, icon="⚠️")
+        st.session_state[results_key] = results
+        st.toast("분석이 완료되었습니다! 아래 탭에서 결과를 확인하세요.")
+    return on_done
 
 # 학생 페이지
 def show_student_page():
@@ -1164,6 +2115,16 @@ def show_student_page():
         st.session_state.user_type = None
         st.rerun()
     
+    # 작문 기록은 로그인한 계정별로, 로그인하지 않았으면 이 세션에서만 저장
+    if st.user.get('is_logged_in'):
+        st.caption(f"{st.user.get('name') or st.user.get('email')} 계정으로 작문 기록이 저장됩니다.")
+    elif auth_configured():
+        st.caption("로그인하지 않으면 작문 기록은 이 세션에서만 볼 수 있습니다.")
+        if st.button("로그인하고 기록 저장", key="student_login"):
+            st.login()
+    else:
+        st.caption("작문 기록은 이 세션에서만 볼 수 있습니다.")
+    
     # 탭 인덱스를 세션 상태에서 가져옴
     tab_index = st.session_state.selected_tab
     
@@ -1190,53 +2151,51 @@ def show_student_page():
             
             # 사용자 입력 텍스트의 해시값 계산 (변경 시 자동 갱신용)
             if user_text:
-                text_hash = hash(user_text)
-                audio_key = f"audio_tab1_{text_hash}"
-                
-                # 세션 상태에 음성 파일 경로가 없으면 초기화
-                if audio_key not in st.session_state:
-                    st.session_state[audio_key] = None
-                
-                # 토글 상태 관리
-                if f"{audio_key}_playing" not in st.session_state:
-                    st.session_state[f"{audio_key}_playing"] = False
+                audio_cache = get_session_audio_cache()
+                audio_key = hash(user_text)
+                audio_entry = audio_cache.get(audio_key)
+                # TTL이 지나 파일이 정리되었으면 다시 생성
+                if audio_entry is not None and not os.path.exists(audio_entry['path']):
+                    audio_entry = None
                 
                 # 토글 버튼 생성
-                if st.session_state[audio_key] is None:
+                if audio_entry is None:
                     if st.button("📢 영작문 듣기", key=f"generate_audio_tab1", use_container_width=True):
                         if user_text.strip():  # 텍스트가 있는 경우에만 실행
-                            with st.spinner("음성 파일을 생성 중입니다..."):
-                                try:
-                                # 음성 파일 생성
-                                    voice_model = "en-US-JennyNeural"  # 기본 Jenny 음성 사용
-                                
-                                # 임시 파일 경로 생성
-                                    temp_dir = tempfile.gettempdir()
-                                    audio_file_path = os.path.join(temp_dir, f"speech_tab1_{datetime.now().strftime('%Y%m%d_%H%M%S')}.wav")
-                                
-                                # 동기식 래퍼 함수를 사용하여 음성 파일 생성
-                                    audio_path = sync_text_to_speech(user_text, voice_model, audio_file_path)
-                                
-                                # 세션 상태에 오디오 파일 경로 저장
-                                    st.session_state[audio_key] = audio_path
-                                    st.session_state[f"{audio_key}_playing"] = True
-                                    st.rerun()
-                                except Exception as e:
-                                    st.error(f"음성 생성 중 오류가 발생했습니다: {str(e)}")
+                            # 기본 Jenny 음성으로 작업 대기열에서 음성 파일 생성
+                            job_id = submit_job('audio_tab1_job_id', 'tts', {
+                                'text': user_text,
+                                'voice': "en-US-JennyNeural",
+                                'prefix': "speech_tab1_",
+                                'session_id': current_session_id()
+                            })
+                            st.session_state.audio_tab1_job_key = audio_key
+                            # 합성이 끝나기 전에 도착한 앞부분부터 재생
+                            st.markdown(get_stream_player_html(job_id), unsafe_allow_html=True)
                         else:
                           st.warning("텍스트를 먼저 입력해주세요.")
                 else:
                     # 토글 버튼 로직
-                    button_label = "⏹️ 음성 정지" if st.session_state[f"{audio_key}_playing"] else "▶️ 음성 재생"
+                    button_label = "⏹️ 음성 정지" if audio_entry['playing'] else "▶️ 음성 재생"
                     if st.button(button_label, key=f"toggle_audio_tab1", use_container_width=True):
                         # 토글 상태 변경
-                        st.session_state[f"{audio_key}_playing"] = not st.session_state[f"{audio_key}_playing"]
+                        audio_entry['playing'] = not audio_entry['playing']
                         st.rerun()
                     
                     # 오디오 플레이어 표시 (현재 페이지 위치에 표시)
-                    if st.session_state[f"{audio_key}_playing"]:
-                        audio_html = get_audio_player_html(st.session_state[audio_key], loop_count=5)
+                    if audio_entry['playing']:
+                        audio_html = get_audio_player_html(audio_entry['path'], loop_count=5)
                         st.markdown(audio_html, unsafe_allow_html=True)
+                
+                def finish_audio(result):
+                    # 세션 음성 캐시에 오디오 파일 경로 저장 (요청할 때의 텍스트 기준)
+                    # 합성 중에 스트리밍으로 이미 재생했으면 처음부터 다시 자동 재생하지 않음
+                    audio_cache.put(st.session_state.pop('audio_tab1_job_key', audio_key),
+                                    {'path': result['path'], 'playing': not TTS_STREAM_URL})
+                
+                show_job_status('audio_tab1_job_id', finish_audio, "음성 파일 생성")
+        
+        analysis_profile = select_analysis_profile("analysis_profile")
         
         # 분석 버튼 행
         col1, col2 = st.columns([3, 1])
@@ -1244,54 +2203,33 @@ def show_student_page():
         # 모든 분석을 한 번에 실행하는 버튼
         with col1:
             if st.button("전체 분석하기", use_container_width=True, key="analyze_button"):
-                    if not user_text:
-                        st.warning("텍스트를 입력해주세요.")
-                    else:
-                    # 텍스트 통계 분석
-                        stats = analyze_text(user_text)
-                    
-                        # 문법 오류 검사
-                    try:
-                        grammar_errors = check_grammar(user_text)
-                    except Exception as e:
-                        st.error(f"문법 검사 중 오류가 발생했습니다: {e}")
-                        grammar_errors = []
-                        
-                    # 어휘 분석
-                    vocab_analysis = analyze_vocabulary(user_text)
-                    
-                    # 어휘 다양성 점수
-                    diversity_score = calculate_lexical_diversity(user_text)
-                    
-                    # 어휘 수준 평가
-                    vocab_level = evaluate_vocabulary_level(user_text)
-                    
-                    # 세션 상태에 결과 저장
-                    if 'analysis_results' not in st.session_state:
-                        st.session_state.analysis_results = {}
-                    
-                    st.session_state.analysis_results = {
-                        'stats': stats,
-                        'grammar_errors': grammar_errors,
-                        'vocab_analysis': vocab_analysis,
-                        'diversity_score': diversity_score,
-                        'vocab_level': vocab_level,
-                        'original_text': user_text  # 원본 텍스트도 저장
-                    }
-                    
-                    # 기록에 저장
-                    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    st.session_state.history.append({
-                        'timestamp': timestamp,
+                if not user_text:
+                    st.warning("텍스트를 입력해주세요.")
+                else:
+                    # 분석은 작업 대기열에서 실행 (다른 페이지로 이동했다 돌아와도 주소의 작업 ID로 이어서 확인)
+                    job_id = submit_job('analysis_job_id', 'analysis', {
                         'text': user_text,
-                        'error_count': len(grammar_errors) if grammar_errors else 0
+                        'role': "student",
+                        'profile': profile_requested(),
+                        'analysis_profile': analysis_profile
                     })
-                    
-                    st.success("분석이 완료되었습니다! 아래 탭에서 결과를 확인하세요.")
-                    
-                    # 분석이 완료되었음을 표시하는 플래그
-                    st.session_state.analysis_completed = True
-                    st.rerun()  # 재실행하여 버튼 표시 업데이트
+                    st.query_params["analysis_job"] = job_id
+            
+            resumed_job_id = st.query_params.get("analysis_job")
+            if resumed_job_id and 'analysis_job_id' not in st.session_state:
+                resumed_job = get_job_queue().get(resumed_job_id)
+                if resumed_job is not None and resumed_job['status'] in ACTIVE_STATUSES + ('done',):
+                    st.session_state.analysis_job_id = resumed_job_id
+                else:
+                    del st.query_params["analysis_job"]
+            
+            def finish_analysis(results):
+                store_analysis_results('analysis_results')(results)
+                # 분석이 완료되었음을 표시하는 플래그
+                st.session_state.analysis_completed = True
+                st.query_params.pop("analysis_job", None)
+            
+            show_job_status('analysis_job_id', finish_analysis, "분석", show_analysis_progress)
         
         # 재작성 추천 버튼 추가
         with col2:
@@ -1349,9 +2287,9 @@ def show_student_page():
                 st.write(f"총 {len(grammar_errors)}개의 문법/맞춤법 오류가 발견되었습니다.")
                 
                 # 음성 다운로드 버튼 표시
-                audio_key = f"audio_tab1_{hash(st.session_state.analysis_results['original_text'])}" if 'original_text' in st.session_state.analysis_results else None
-                if audio_key and audio_key in st.session_state and st.session_state[audio_key]:
-                    audio_path = st.session_state[audio_key]
+                audio_entry = get_session_audio_cache().get(hash(st.session_state.analysis_results['original_text'])) if 'original_text' in st.session_state.analysis_results else None
+                if audio_entry:
+                    audio_path = audio_entry['path']
                     if os.path.exists(audio_path):
                         with st.expander("음성 파일 다운로드"):
                             with open(audio_path, "rb") as f:
@@ -1371,7 +2309,10 @@ def show_student_page():
                 # 어휘 다양성 점수 처리
                 if 'diversity_score' in st.session_state.analysis_results:
                     diversity_score = st.session_state.analysis_results.get('diversity_score', 0)
-                    st.metric("어휘 다양성 점수", f"{diversity_score:.2f}")
+                    st.metric("어휘 다양성 점수 (MATTR)", f"{diversity_score:.2f}",
+                              help="50단어 창을 옮기며 구한 고유 단어 비율의 평균입니다. 글 길이에 덜 민감합니다.")
+                    if st.session_state.analysis_results.get('lexical_metrics'):
+                        show_lexical_metrics(st.session_state.analysis_results['lexical_metrics'])
                 else:
                     st.metric("어휘 다양성 점수", "0.00")
                 
@@ -1398,6 +2339,10 @@ def show_student_page():
                         fig = px.pie(level_df, values='비율', names='수준', 
                         title='어휘 수준 분포')
                         st.plotly_chart(fig, use_container_width=True)
+                        
+                        # 빈도 순위 기반 어휘 프로파일
+                        if st.session_state.analysis_results.get('vocab_profile'):
+                            show_vocabulary_profile(st.session_state.analysis_results['vocab_profile'])
                     else:
                         st.info("어휘 수준 평가를 위한 데이터가 충분하지 않습니다.")
                 else:
@@ -1474,24 +2419,29 @@ def show_student_page():
                     st.warning("텍스트를 입력해주세요.")
                 else:
                     level = level_map.get(level_option, "similar")
+                    # 새 결과로 바뀌므로 이전 결과로 미리 합성하던 음성은 취소
+                    cancel_speech_prefetch()
                     
-                    # 재작성 처리
-                    with st.spinner("텍스트를 재작성 중입니다..."):
-                        rewritten_text = rewrite_text(rewrite_text_input, level)
-                        
-                        # 재작성된 텍스트를 세션 상태에 저장
-                        if 'rewritten_text' not in st.session_state:
-                         st.session_state.rewritten_text = {}
-                        
-                        st.session_state.rewritten_text[level] = rewritten_text
-                        
-                        # 기록에 추가
-                        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        st.session_state.history.append({
-                    'timestamp': timestamp,
-                    'text': rewrite_text_input,
-                    'action': f"재작성 ({level_option})"
-                        })
+                    # 재작성은 작업 대기열에서 실행
+                    submit_job('rewrite_job_id', 'rewrite', {
+                        'text': rewrite_text_input,
+                        'level': level,
+                        'level_label': level_option,
+                        'profile': profile_requested()
+                    })
+            
+            def finish_rewrite(result):
+                # 재작성된 텍스트를 세션 상태에 저장
+                if 'rewritten_text' not in st.session_state:
+                    st.session_state.rewritten_text = {}
+                st.session_state.rewritten_text[result['level']] = result['rewritten_text']
+                if result['profile']:
+                    st.session_state.last_profile = result['profile']
+                # 대부분 바로 "음성 파일 생성"을 누르므로 선택된 음성으로 미리 합성 시작
+                voice_label = st.session_state.get('voice_selection', next(iter(REWRITE_VOICES)))
+                prefetch_speech(result['rewritten_text'], REWRITE_VOICES[voice_label])
+            
+            show_job_status('rewrite_job_id', finish_rewrite, "재작성")
         
         with right_col:
             st.subheader("재작성 결과")
@@ -1505,16 +2455,13 @@ def show_student_page():
                     
                     # 음성 옵션 추가
                     st.subheader("본문 읽기 옵션")
-                    voice_options = {
-                        "Jenny (여성, 미국)": "en-US-JennyNeural",
-                        "Guy (남성, 미국)": "en-US-GuyNeural",
-                        "Aria (여성, 영국)": "en-GB-SoniaNeural"
-                    }
                     selected_voice = st.selectbox(
                         "음성 선택",
-                        options=list(voice_options.keys()),
+                        options=list(REWRITE_VOICES.keys()),
                         key="voice_selection"
                     )
+                    # 수준이나 음성을 바꾸면 미리 합성하던 음성은 쓰이지 않으므로 취소
+                    discard_stale_speech_prefetch(rewritten, REWRITE_VOICES[selected_voice])
                     
                     # 재작성 텍스트 다운로드 및 음성 변환 버튼
                     col1, col2 = st.columns(2)
@@ -1536,25 +2483,37 @@ def show_student_page():
                     with col2:
                         # 음성 파일 다운로드 버튼
                         if rewritten:
+                            def finish_speech(result):
+                                # 이전 음성 파일은 삭제하고 세션 상태에 새 오디오 파일 경로 저장
+                                if st.session_state.get('audio_path'):
+                                    get_temp_files().release(st.session_state.audio_path)
+                                st.session_state.audio_path = result['path']
+                                # 합성 중에 스트리밍으로 이미 재생했으면 처음부터 다시 자동 재생하지 않음
+                                st.session_state.audio_playing = not st.session_state.pop('speech_streamed', False)
+                                st.toast("음성 파일이 생성되었습니다!")
+                            
                             if st.button("음성 파일 생성", key="generate_speech"):
-                                with st.spinner("음성 파일을 생성 중입니다..."):
-                                    try:
-                                        # 선택된 음성 모델 가져오기
-                                        voice_model = voice_options[selected_voice]
-                                        
-                                        # 임시 파일 경로 생성
-                                        temp_dir = tempfile.gettempdir()
-                                        audio_file_path = os.path.join(temp_dir, f"speech_{datetime.now().strftime('%Y%m%d_%H%M%S')}.wav")
-                                        
-                                        # 동기식 래퍼 함수를 사용하여 음성 파일 생성
-                                        audio_path = sync_text_to_speech(rewritten, voice_model, audio_file_path)
-                                        
-                                        # 세션 상태에 오디오 파일 경로 저장
-                                        st.session_state.audio_path = audio_path
-                                        st.success("음성 파일이 생성되었습니다!")
-                                        st.rerun()  # 재실행하여 오디오 플레이어 표시
-                                    except Exception as e:
-                                        st.error(f"음성 생성 중 오류가 발생했습니다: {str(e)}")
+                                # 재작성 직후 미리 합성한 음성이 있으면 그대로 쓰거나 이어서 기다림
+                                prefetched = claim_speech_prefetch(rewritten, REWRITE_VOICES[selected_voice])
+                                if prefetched is not None and prefetched['status'] == 'done':
+                                    finish_speech(prefetched['result'])
+                                elif prefetched is not None:
+                                    st.session_state.speech_job_id = prefetched['id']
+                                else:
+                                    # 선택된 음성 모델로 작업 대기열에서 음성 파일 생성
+                                    submit_job('speech_job_id', 'tts', {
+                                        'text': rewritten,
+                                        'voice': REWRITE_VOICES[selected_voice],
+                                        'prefix': "speech_",
+                                        'session_id': current_session_id()
+                                    })
+                                # 합성이 끝나기 전에 도착한 앞부분부터 재생
+                                if st.session_state.get('speech_job_id') and TTS_STREAM_URL:
+                                    st.markdown(get_stream_player_html(st.session_state.speech_job_id),
+                                                unsafe_allow_html=True)
+                                    st.session_state.speech_streamed = True
+                            
+                            show_job_status('speech_job_id', finish_speech, "음성 파일 생성")
                     
                     # 오디오 플레이어 표시
                     if 'audio_path' in st.session_state and os.path.exists(st.session_state.audio_path):
@@ -1615,15 +2574,27 @@ def show_student_page():
     # 내 작문 기록 탭
     with tabs[2]:
         st.subheader("내 작문 기록")
-        if not st.session_state.history:
+        history_store = get_history_store()
+        student = get_current_student()
+        total_count = history_store.count(student)
+        
+        if total_count == 0:
             st.info("아직 기록이 없습니다.")
         else:
-            history_df = pd.DataFrame(st.session_state.history)
-            st.dataframe(history_df)
+            # 전체 기록 대신 현재 페이지만 조회
+            page_size = 20
+            page_count = (total_count + page_size - 1) // page_size
+            page = st.number_input("페이지", min_value=1, max_value=page_count, value=1, step=1,
+                                   key="history_page") - 1
+            st.caption(f"총 {total_count}개 기록 중 {page * page_size + 1}~{min(total_count, (page + 1) * page_size)}번째 (최신순)")
+            
+            history_df = pd.DataFrame(history_store.page(student, page=page, page_size=page_size))
+            st.dataframe(history_df.drop(columns=['id', 'student']))
             
-            # 오류 수 추이 차트
-            if len(history_df) > 1 and 'error_count' in history_df.columns:
-                fig = px.line(history_df, x='timestamp', y='error_count', 
+            # 오류 수 추이 차트 (최근 분석 기록만 조회)
+            error_series = history_store.error_count_series(student)
+            if len(error_series) > 1:
+                fig = px.line(pd.DataFrame(error_series), x='timestamp', y='error_count', 
                     title='문법 오류 수 추이',
                     labels={'timestamp': '날짜', 'error_count': '오류 수'})
                 st.plotly_chart(fig, use_container_width=True)
@@ -1645,48 +2616,30 @@ def show_teacher_page():
         st.subheader("영작문 입력 및 첨삭")
         
         user_text = st.text_area("학생의 영어 작문을 입력하세요", height=200, key="teacher_text")
+        author = st.selectbox("작성한 학생", [None] + get_similarity_index().students(), key="teacher_author",
+                              format_func=lambda student: "선택 안 함" if student is None else student,
+                              help="고르면 비슷한 이전 제출물에서 그 학생 자신의 글은 제외합니다.")
+        analysis_profile = select_analysis_profile("teacher_analysis_profile")
         
         col1, col2 = st.columns([3, 1])
         
         # 모든 분석을 한 번에 실행하는 버튼
         with col1:
             if st.button("전체 분석하기", key="teacher_analyze_all", use_container_width=True):
-                    if not user_text:
-                        st.warning("텍스트를 입력해주세요.")
-                    else:
-                        # 문법 오류 검사
-                        try:
-                            grammar_errors = check_grammar(user_text)
-                        except Exception as e:
-                            st.error(f"문법 검사 중 오류가 발생했습니다: {e}")
-                    grammar_errors = []
-                    
-                    # 어휘 분석
-                    vocab_analysis = analyze_vocabulary(user_text)
-                    
-                    # 어휘 다양성 점수
-                    diversity_score = calculate_lexical_diversity(user_text)
-                    
-                    # 어휘 수준 평가
-                    vocab_level = evaluate_vocabulary_level(user_text)
-                    
-                    # 텍스트 통계 분석
-                    stats = analyze_text(user_text)
-                    
-                    # 세션 상태에 결과 저장
-                    if 'teacher_analysis_results' not in st.session_state:
-                        st.session_state.teacher_analysis_results = {}
-                    
-                    st.session_state.teacher_analysis_results = {
-                        'stats': stats,
-                        'grammar_errors': grammar_errors,
-                        'vocab_analysis': vocab_analysis,
-                        'diversity_score': diversity_score,
-                        'vocab_level': vocab_level,
-                        'original_text': user_text  # 원본 텍스트도 저장
-                    }
-                    
-                    st.success("분석이 완료되었습니다! 아래 탭에서 결과를 확인하세요.")
+                if not user_text:
+                    st.warning("텍스트를 입력해주세요.")
+                else:
+                    # 분석은 작업 대기열에서 실행하고 이 자리에서 진행 상황을 확인
+                    submit_job('teacher_analysis_job_id', 'analysis', {
+                        'text': user_text,
+                        'role': "teacher",
+                        'author': author,
+                        'profile': profile_requested(),
+                        'analysis_profile': analysis_profile
+                    })
+            
+            show_job_status('teacher_analysis_job_id', store_analysis_results('teacher_analysis_results'), "분석",
+                            show_analysis_progress)
         
         # 재작성 추천 버튼 추가
         with col2:
@@ -1711,6 +2664,10 @@ def show_teacher_page():
                     st.success("고급 수준으로 재작성된 텍스트가 첨삭 노트에 추가되었습니다.")
                     st.balloons()  # 시각적 효과 추가
         
+        # 비슷한 이전 제출물 표시
+        if st.session_state.get('teacher_analysis_results', {}).get('similar_essays'):
+            show_similar_essays(st.session_state.teacher_analysis_results['similar_essays'])
+        
         # 결과 표시를 위한 탭
         result_tab1, result_tab2, result_tab3 = st.tabs(["문법 검사", "어휘 분석", "텍스트 통계"])
         
@@ -1745,9 +2702,9 @@ def show_teacher_page():
                 st.write(f"총 {len(grammar_errors)}개의 문법/맞춤법 오류가 발견되었습니다.")
                 
                 # 음성 다운로드 버튼 표시
-                audio_key = f"audio_tab1_{hash(st.session_state.teacher_analysis_results['original_text'])}" if 'original_text' in st.session_state.teacher_analysis_results else None
-                if audio_key and audio_key in st.session_state and st.session_state[audio_key]:
-                    audio_path = st.session_state[audio_key]
+                audio_entry = get_session_audio_cache().get(hash(st.session_state.teacher_analysis_results['original_text'])) if 'original_text' in st.session_state.teacher_analysis_results else None
+                if audio_entry:
+                    audio_path = audio_entry['path']
                     if os.path.exists(audio_path):
                         with st.expander("음성 파일 다운로드"):
                             with open(audio_path, "rb") as f:
@@ -1767,7 +2724,10 @@ def show_teacher_page():
                 # 어휘 다양성 점수 처리
                 if 'diversity_score' in st.session_state.teacher_analysis_results:
                     diversity_score = st.session_state.teacher_analysis_results.get('diversity_score', 0)
-                    st.metric("어휘 다양성 점수", f"{diversity_score:.2f}")
+                    st.metric("어휘 다양성 점수 (MATTR)", f"{diversity_score:.2f}",
+                              help="50단어 창을 옮기며 구한 고유 단어 비율의 평균입니다. 글 길이에 덜 민감합니다.")
+                    if st.session_state.teacher_analysis_results.get('lexical_metrics'):
+                        show_lexical_metrics(st.session_state.teacher_analysis_results['lexical_metrics'])
                 else:
                     st.metric("어휘 다양성 점수", "0.00")
                 
@@ -1794,6 +2754,10 @@ def show_teacher_page():
                         fig = px.pie(level_df, values='비율', names='수준', 
                             title='어휘 수준 분포')
                         st.plotly_chart(fig, use_container_width=True)
+                        
+                        # 빈도 순위 기반 어휘 프로파일
+                        if st.session_state.teacher_analysis_results.get('vocab_profile'):
+                            show_vocabulary_profile(st.session_state.teacher_analysis_results['vocab_profile'])
                     else:
                         st.info("어휘 수준 평가를 위한 데이터가 충분하지 않습니다.")
                 else:
@@ -1847,106 +2811,216 @@ def show_teacher_page():
             if not user_text:
                 st.warning("텍스트를 입력해주세요.")
             else:
-                # 문법 오류 검사
-                grammar_errors = check_grammar(user_text)
-                
-                # 저장할 데이터 생성
-                error_data = []
-                for error in grammar_errors:
-                    error_data.append({
-                        "오류": user_text[error['offset']:error['offset'] + error.get('length', error.get('errorLength', 0))],
-                        "오류 내용": error['message'],
-                        "수정 제안": str(error['replacements']),
-                        "위치": f"{error['offset']}:{error['offset'] + error.get('length', error.get('errorLength', 0))}"
-                    })
-                
-                # 어휘 분석
-                vocab_analysis = analyze_vocabulary(user_text)
-                
-                # 통계 분석
-                stats = analyze_text(user_text)
+                # 같은 텍스트를 이미 분석했으면 그 결과를 그대로 사용
+                analysis_results = st.session_state.get('teacher_analysis_results', {})
+                record_cache("teacher_analysis", analysis_results.get('original_text') == user_text)
+                if analysis_results.get('original_text') != user_text:
+                    analysis_results = {
+                        'original_text': user_text,
+                        'grammar_errors': check_grammar(user_text),
+                        'stats': analyze_text(user_text)
+                    }
                 
-                # 여러 시트가 있는 Excel 파일 생성
-                excel_buffer = io.BytesIO()
-                with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-                    # 원본 텍스트 시트
-                    pd.DataFrame({"원본 텍스트": [user_text]}).to_excel(writer, sheet_name="원본 텍스트", index=False)
-                    
-                    # 오류 데이터 시트
-                    pd.DataFrame(error_data).to_excel(writer, sheet_name="문법 오류", index=False)
-                    
-                    # 통계 시트
-                    stats_df = pd.DataFrame({
-                        "항목": ["단어 수", "문장 수", "평균 단어 길이", "평균 문장 길이", "어휘 크기"],
-                        "값": [stats['word_count'], stats['sentence_count'], stats['avg_word_length'], 
-                     stats['avg_sentence_length'], stats['vocabulary_size']]
-                    })
-                    stats_df.to_excel(writer, sheet_name="통계", index=False)
-                    
-                    # 평가 점수 시트
-                    score_df = pd.DataFrame({
-                        "평가 항목": ["문법", "어휘", "내용", "종합 점수"],
-                        "점수": [grammar_score, vocab_score, content_score, total_score]
-                    })
-                    score_df.to_excel(writer, sheet_name="평가 점수", index=False)
-                    
-                    # 피드백 시트
-                    pd.DataFrame({"첨삭 피드백": [feedback]}).to_excel(writer, sheet_name="피드백", index=False)
+                bundle = {
+                    'label': "학생",
+                    'text': user_text,
+                    'grammar_errors': analysis_results['grammar_errors'],
+                    'stats': analysis_results['stats'],
+                    'scores': {"문법": grammar_score, "어휘": vocab_score, "내용": content_score, "종합 점수": total_score},
+                    'feedback': feedback
+                }
                 
-                # 다운로드 버튼
-                excel_buffer.seek(0)
+                # 임시 파일에 바로 기록한 뒤 경로로 전달
+                export_path = replace_export_file(export_feedback([bundle], fmt='xlsx'))
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                st.download_button(
-                    label="Excel 다운로드",
-                    data=excel_buffer,
-                    file_name=f"첨삭결과_{timestamp}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                )
+                with open(export_path, "rb") as f:
+                    st.download_button(
+                        label="Excel 다운로드",
+                        data=f,
+                        file_name=f"첨삭결과_{timestamp}.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    )
     
     # 학습 대시보드 탭
     with tabs[1]:
         st.subheader("학습 대시보드")
         
-        # 샘플 학생 데이터 (실제로는 DB에서 가져와야 함)
-        sample_data = {
-            "날짜": ["2023-01-01", "2023-01-08", "2023-01-15", "2023-01-22", "2023-01-29"],
-            "학생_A": [7, 6, 8, 7, 9],
-            "학생_B": [5, 6, 6, 7, 6],
-            "학생_C": [8, 8, 7, 9, 9],
-            "학생_D": [4, 5, 6, 6, 7]
-        }
-        
-        scores_df = pd.DataFrame(sample_data)
+        # 분석할 때마다 누적된 집계만 읽음 (학생 수에 비례)
+        dashboard = get_history_store().dashboard()
         
-        # 학생별 점수 추이
-        fig = px.line(scores_df, x="날짜", y=["학생_A", "학생_B", "학생_C", "학생_D"],
-                     title="학생별 영작문 점수 추이",
-                     labels={"value": "점수", "variable": "학생"})
-        st.plotly_chart(fig, use_container_width=True)
-        
-        # 최근 점수 분포
-        latest_scores = scores_df.iloc[-1, 1:].values
-        students = scores_df.columns[1:]
+        if not dashboard['students']:
+            st.info("아직 분석된 제출 기록이 없습니다.")
+        else:
+            # 학급 전체 첨삭 결과 내보내기 (저장된 분석 결과를 다시 계산하지 않음)
+            export_col1, export_col2 = st.columns([1, 3])
+            with export_col1:
+                export_format = st.radio("내보내기 형식", options=["xlsx", "csv"], horizontal=True, key="class_export_format")
+            with export_col2:
+                if st.button("학급 첨삭 결과 내보내기", key="class_export"):
+                    with st.spinner("첨삭 결과 파일을 만드는 중입니다..."):
+                        history_store = get_history_store()
+                        export_path = replace_export_file(
+                            export_feedback(history_store.iter_analyses, fmt=export_format, prefix="학급첨삭결과_")
+                        )
+                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                    with open(export_path, "rb") as f:
+                        st.download_button(
+                            label="파일 다운로드",
+                            data=f,
+                            file_name=f"학급첨삭결과_{timestamp}.{export_format}",
+                            mime=EXPORT_MIME_TYPES[export_format],
+                        )
         
-        fig = px.bar(x=students, y=latest_scores, 
-                    title="최근 영작문 점수 분포",
-                    labels={"x": "학생", "y": "점수"})
-        st.plotly_chart(fig, use_container_width=True)
+            # 학생별 점수 추이 (일 평균)
+            daily_df = pd.DataFrame(dashboard['daily_scores'])
+            if not daily_df.empty:
+                fig = px.line(daily_df, x="day", y="score", color="student", markers=True,
+                             title="학생별 영작문 점수 추이",
+                             labels={"day": "날짜", "score": "점수", "student": "학생"})
+                st.plotly_chart(fig, use_container_width=True)
         
-        # 평균 오류 유형 (샘플 데이터)
-        error_types = {
-            "오류 유형": ["문장 구조", "시제", "관사", "전치사", "대명사", "철자", "구두점"],
-            "빈도": [45, 30, 25, 20, 15, 10, 5]
-        }
+            # 최근 점수 분포
+            students_df = pd.DataFrame(dashboard['students'])
+            fig = px.bar(students_df, x="student", y="last_score", 
+                        title="최근 영작문 점수 분포",
+                        labels={"student": "학생", "last_score": "점수"})
+            st.plotly_chart(fig, use_container_width=True)
+        
+            # 오류 유형 분포
+            error_df = pd.DataFrame(dashboard['error_categories'])
+            if not error_df.empty:
+                fig = px.pie(error_df, values="count", names="category",
+                            title="오류 유형 분포",
+                            labels={"count": "빈도", "category": "오류 유형"})
+                st.plotly_chart(fig, use_container_width=True)
         
-        error_df = pd.DataFrame(error_types)
+            # 학생별 어휘 수준 분포
+            vocab_df = pd.DataFrame(dashboard['vocab_levels'])
+            if not vocab_df.empty:
+                vocab_df = vocab_df.rename(columns={'basic': '기초', 'intermediate': '중급', 'advanced': '고급'})
+                fig = px.bar(vocab_df, x="student", y=["기초", "중급", "고급"],
+                            title="학생별 어휘 수준 분포",
+                            labels={"student": "학생", "value": "비율", "variable": "수준"})
+                st.plotly_chart(fig, use_container_width=True)
         
-        fig = px.pie(error_df, values="빈도", names="오류 유형",
-                    title="평균 오류 유형 분포")
-        st.plotly_chart(fig, use_container_width=True)
+            # 학생별 요약 표
+            st.dataframe(students_df.rename(columns={
+                'student': '학생', 'submissions': '제출 수', 'total_errors': '총 오류 수',
+                'last_score': '최근 점수', 'last_timestamp': '최근 제출', 'avg_score': '평균 점수'
+            }), use_container_width=True)
+        
+        # 제출할 때 다른 학생의 이전 글과 비슷했던 제출물
+        similar_pairs = get_similarity_index().recent_matches()
+        if similar_pairs:
+            st.markdown("#### 비슷한 이전 제출물이 있는 제출")
+            st.dataframe(pd.DataFrame(similar_pairs)[
+                ['timestamp', 'student', 'match_student', 'match_kind', 'similarity', 'preview']
+            ].rename(columns={
+                'timestamp': '제출 시각', 'student': '학생', 'match_student': '비슷한 글의 학생',
+                'match_kind': '비슷한 글 종류', 'similarity': '유사도', 'preview': '제출 글'
+            }), use_container_width=True)
+
+# 분석 프로파일로 실행하는 검사 엔진 목록 (프로파일 태그용)
+def enabled_engines(analysis_profile=None):
+    """
+    analysis_profile(None이면 기본 프로파일)로 문법 검사를 할 때 실행하는 엔진 이름 목록을 반환합니다.
+    parse_rules는 spaCy 모델이 없으면 아무것도 검사하지 않으므로 뺍니다.
+    """
+    engines = grammar_engines(analysis_profile=get_analysis_profile(analysis_profile)['name'])
+    return [name for name in engines if name != 'parse_rules' or get_spacy_parser() is not None]
+
+# 주소에 ?profile=1이 있으면 작업 요청에 프로파일링 표시를 남김
+def profile_requested():
+    return st.query_params.get("profile") == "1"
+
+# 프로파일링을 요청한 작업 한 건을 프로파일링하는 블록을 반환 (작업 스레드에서 사용)
+# 문법 검사를 하지 않는 작업(재작성 등)은 analysis_profile을 주지 않아 엔진 태그가 비어 있음
+def profile_if_requested(enabled, label, text, analysis_profile=None):
+    if not enabled:
+        return contextlib.nullcontext()
+    if analysis_profile is None:
+        return profile_run(label, len(text))
+    return profile_run(label, len(text), enabled_engines(analysis_profile), analysis_profile=analysis_profile)
+
+# 지표 서버 시작 함수
+@st.cache_resource
+def get_metrics_server():
+    """
+    ENGCHECK_METRICS_PORT 환경 변수가 설정된 경우 Prometheus /metrics 서버를 한 번만 시작합니다.
+    """
+    port = os.environ.get('ENGCHECK_METRICS_PORT')
+    if not port:
+        return None
+    try:
+        return start_metrics_server(int(port))
+    except OSError as e:
+        print(f"지표 서버 시작 오류: {e}")
+        return None
+
+# 숨겨진 디버그 패널 (주소에 ?debug=1 또는 ?profile=1을 붙이면 표시)
+def show_debug_panel():
+    if st.query_params.get("debug") != "1" and st.query_params.get("profile") != "1":
+        return
+    
+    report = st.session_state.get('last_profile')
+    if report:
+        with st.sidebar.expander("디버그: 프로파일 결과", expanded=True):
+            tags = report['tags']
+            st.caption(f"{tags['label']} · {tags['text_length']}자 · {tags['elapsed_seconds']}초 · 엔진: {tags['engines']}")
+            st.dataframe(pd.DataFrame(report['top']).round(4), use_container_width=True)
+            for kind, label in (('folded', "Flame graph (folded)"), ('table', "상위 함수 표")):
+                with open(report['paths'][kind], "rb") as f:
+                    st.download_button(label, f, file_name=os.path.basename(report['paths'][kind]),
+                                       mime="text/plain", key=f"profile_download_{kind}")
+    
+    with st.sidebar.expander("디버그: 엔진 실행 계획"):
+        planner = get_cascade_planner()
+        engine_stats = planner.status()
+        if engine_stats:
+            st.dataframe(pd.DataFrame.from_dict(engine_stats, orient='index'), use_container_width=True)
+        recent = planner.recent()
+        if recent:
+            st.dataframe(pd.DataFrame([
+                {'시각': datetime.fromtimestamp(run['timestamp']).strftime('%H:%M:%S'), '모드': run['profile'],
+                 '엔진': decision['engine'], '결정': decision['decision'], '이유': decision['reason']}
+                for run in recent for decision in run['decisions']
+            ]), use_container_width=True)
+        else:
+            st.caption("아직 기록된 결정이 없습니다.")
+    
+    with st.sidebar.expander("디버그: 처리 단계별 시간", expanded=True):
+        spans = st.session_state.get('last_trace')
+        if spans:
+            trace_df = pd.DataFrame(spans)
+            trace_df['ms'] = (trace_df['seconds'] * 1000).round(1)
+            st.dataframe(trace_df[['stage', 'ms', 'ok']], use_container_width=True)
+        else:
+            st.caption("아직 기록된 분석이 없습니다.")
+        
+        counters, histograms = snapshot()
+        if counters:
+            st.markdown("**카운터**")
+            st.dataframe(pd.DataFrame([
+                {'지표': name, '레이블': ', '.join(f"{k}={v}" for k, v in labels), '값': value}
+                for (name, labels), value in counters.items()
+            ]), use_container_width=True)
+        temp_status = get_temp_files().status()
+        st.caption(f"임시 파일 {temp_status['files']}개 (세션 {temp_status['sessions']}개) · {temp_status['directory']}")
+        job_counts = get_job_queue().counts()
+        st.caption("작업 대기열: " + (", ".join(f"{status} {count}개" for status, count in sorted(job_counts.items())) or "비어 있음"))
+        if histograms:
+            st.markdown("**단계별 평균 시간 (프로세스 전체)**")
+            st.dataframe(pd.DataFrame([
+                {'단계': dict(labels).get('stage', name), '횟수': value['count'],
+                 '평균 ms': round(value['sum'] / max(1, value['count']) * 1000, 1)}
+                for (name, labels), value in histograms.items()
+            ]), use_container_width=True)
 
 # 메인 함수
 def main():
+    get_metrics_server()
+    show_debug_panel()
+    
     # 제목 및 소개
     # st.title("영작문 자동 첨삭 시스템")
     st.markdown("""
@@ -1956,40 +3030,6 @@ def main():
     # 직접 학생 페이지로 이동
     show_student_page()
 
-if __name__ == "__main__":
-    main()
-
-@st.cache_resource
-def load_vocabulary_datasets():
-    # 온라인 소스에서 데이터셋 다운로드 (실제 작동하는 URL로 수정)
-    word_freq_url = "https://raw.githubusercontent.com/hermitdave/FrequencyWords/master/content/2018/en/en_50k.txt"
-    
-    try:
-        import requests
-        
-        # 영어 단어 빈도 데이터 다운로드
-        response = requests.get(word_freq_url)
-        if response.status_code == 200:
-            # 단어 빈도 데이터 파싱 (형식: "단어 빈도")
-            lines = response.text.splitlines()
-            words = [line.split()[0] for line in lines if ' ' in line]
-            
-            # 빈도에 따라 단어 분류
-            total_words = len(words)
-            basic_cutoff = int(total_words * 0.2)  # 상위 20%
-            intermediate_cutoff = int(total_words * 0.5)  # 상위 20~50%
-            
-            basic_words = set(words[:basic_cutoff])
-            intermediate_words = set(words[basic_cutoff:intermediate_cutoff])
-            advanced_words = set(words[intermediate_cutoff:])
-            
-            return {'basic': basic_words, 'intermediate': intermediate_words, 'advanced': advanced_words}
-    except Exception as e:
-        st.warning(f"온라인 데이터셋 다운로드 중 오류가 발생했습니다: {e}")
-    
-    # 다운로드 실패시 내장 데이터셋 사용
-    return default_vocabulary_sets()
-
 def evaluate_advanced_vocabulary(text):
     words = custom_word_tokenize(text.lower())
     
@@ -2071,20 +3111,31 @@ def check_grammar_with_sapling(text):
         session_id = f"streamlit_session_{st.session_state.get('session_id', 'default')}"
         
         # 문법 오류 검사
-        edits = client.edits(text, session_id=session_id)
+        with span("api:sapling"):
+            response = client.edits(text, session_id=session_id)
+        
+        # API 응답은 {'edits': [...]} 형식이며, start/end는 sentence_start(문장 시작 위치) 기준
+        edits = response.get('edits', []) if isinstance(response, dict) else response
         
         # 결과 변환
         for edit in edits:
+            start = edit.get('sentence_start', 0) + edit['start']
+            end = edit.get('sentence_start', 0) + edit['end']
             errors.append({
-                'message': f"{edit.get('general_error_type', '문법 오류')}: '{text[edit['start']:edit['end']]}' → '{edit['replacement']}'",
-                'offset': edit['start'],
-                'length': edit['end'] - edit['start'],
+                'message': f"{edit.get('general_error_type', '문법 오류')}: '{text[start:end]}' → '{edit['replacement']}'",
+                'offset': start,
+                'length': end - start,
                 'replacements': [edit['replacement']],
                 'rule': edit.get('error_type', 'SAPLING_CORRECTION'),
-                'context': edit.get('sentence', text[max(0, edit['start'] - 20):min(len(text), edit['end'] + 20)])
+                'context': edit.get('sentence', text[max(0, start - 20):min(len(text), end + 20)])
             })
     
     except Exception as e:
+        record_api_failure("sapling")
         st.error(f"Sapling API 오류: {str(e)}")
     
     return errors
+
+# 모든 함수가 정의된 뒤에 페이지를 그리도록 파일 마지막에서 실행
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import importlib.util
+import os
+import sys
+import threading
+
+# eng-check.py는 하이픈이 들어간 Streamlit 스크립트라 일반 import로 불러올 수 없으므로
+# API 서버, 배치 도구 등에서 검사 함수를 재사용할 때 이 로더를 사용합니다.
+ENG_CHECK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "eng-check.py")
+ENG_CHECK_MODULE_NAME = "eng_check"
+
+_load_lock = threading.Lock()
+
+
+def load_eng_check():
+    """
+    eng-check.py를 모듈로 불러와 반환합니다. 한 프로세스에서 한 번만 실행됩니다.
+
+    `streamlit run` 밖에서 불러오므로 __name__이 "__main__"이 아니어서
+    페이지(main)는 그려지지 않고 함수와 설정만 로드됩니다.
+
+    Returns:
+    - eng-check.py 모듈 객체
+    """
+    with _load_lock:
+        module = sys.modules.get(ENG_CHECK_MODULE_NAME)
+        if module is not None:
+            return module
+
+        # Streamlit 없이 실행할 때 나오는 ScriptRunContext 경고를 줄임
+        os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+
+        spec = importlib.util.spec_from_file_location(ENG_CHECK_MODULE_NAME, ENG_CHECK_PATH)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[ENG_CHECK_MODULE_NAME] = module
+        try:
+            spec.loader.exec_module(module)
+        except Exception:
+            del sys.modules[ENG_CHECK_MODULE_NAME]
+            raise
+        return module
@@ -0,0 +1,163 @@
+"""
+엔진별로 측정한 비용(지연 시간)과 효용(중복 제거 후 남는 오류 수)으로 느린 검사 엔진의
+실행 여부를 정하는 계단식(cascade) 실행 계획
+
+검사 엔진끼리는 찾는 오류가 많이 겹칩니다. 예를 들어 TextBlob은 철자 교정만 하므로
+SpellChecker가 사전에 없는 단어를 하나도 찾지 못한 글에서는 새로 찾을 오류가 거의 없습니다.
+
+- 선행 조건(preconditions): {엔진: (조건 엔진, 이유)}. 조건 엔진이 오류를 하나도 찾지 못했으면
+  그 엔진은 건너뜁니다.
+- 측정 기반 규칙: 엔진마다 지연 시간과 "찾은 오류 중 중복 제거 후 남은 비율"(yield),
+  "실행 한 번당 남은 오류 수"(marginal)를 지수 가중 평균으로 기록합니다. 표본이 MIN_SAMPLES개
+  이상 쌓인 엔진 중 실행 비용이 MIN_COST_SECONDS 이상이고 marginal이 MIN_MARGINAL보다 작으면
+  건너뜁니다. 통계가 낡지 않도록 EXPLORE_RATE 비율로는 그래도 실행합니다(explore).
+- 결정 기록: 검사 한 번마다 엔진별 결정(run/skip/explore)과 이유, 당시 통계를 남겨
+  recent()로 최근 LOG_SIZE건을 확인할 수 있습니다 (디버그 패널, API /cascade).
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from instrumentation import METRIC_HELP, increment
+
+MIN_SAMPLES = int(os.environ.get("ENGCHECK_CASCADE_MIN_SAMPLES", "20"))
+MIN_MARGINAL = float(os.environ.get("ENGCHECK_CASCADE_MIN_MARGINAL", "0.05"))
+MIN_COST_SECONDS = float(os.environ.get("ENGCHECK_CASCADE_MIN_COST", "0.2"))
+EXPLORE_RATE = float(os.environ.get("ENGCHECK_CASCADE_EXPLORE_RATE", "0.1"))
+DECAY = 0.05
+LOG_SIZE = 200
+
+CASCADE_DECISIONS = "engcheck_cascade_decisions_total"
+METRIC_HELP[CASCADE_DECISIONS] = "엔진 실행 계획 결정 수 (decision=run|skip|explore)"
+
+
+class EngineStats:
+    """엔진 하나의 지수 가중 평균 통계"""
+
+    def __init__(self):
+        self.samples = 0
+        self.latency = None
+        self.found = 0.0
+        self.survived = 0.0
+        self.runs = 0.0
+
+    def record_latency(self, seconds):
+        self.latency = seconds if self.latency is None else self.latency + DECAY * (seconds - self.latency)
+
+    def record_outcome(self, found, survived):
+        self.samples += 1
+        self.found = self.found * (1 - DECAY) + found
+        self.survived = self.survived * (1 - DECAY) + survived
+        self.runs = self.runs * (1 - DECAY) + 1
+
+    def yield_rate(self):
+        """찾은 오류 중 중복 제거 후 남은 비율 (찾은 오류가 없으면 None)"""
+        return self.survived / self.found if self.found else None
+
+    def marginal(self):
+        """실행 한 번당 중복 제거 후 남은 오류 수"""
+        return self.survived / self.runs if self.runs else None
+
+    def as_dict(self):
+        return {
+            'samples': self.samples,
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'yield': round(self.yield_rate(), 3) if self.yield_rate() is not None else None,
+            'marginal': round(self.marginal(), 3) if self.marginal() is not None else None,
+        }
+
+
+class CascadePlanner:
+    """
+    엔진 실행 계획
+
+    Parameters:
+    - preconditions: {엔진: (조건 엔진, 이유)} 조건 엔진이 아무것도 찾지 못하면 건너뜀
+    - min_samples, min_marginal, min_cost, explore_rate: 측정 기반 규칙 설정 (모듈 설명 참고)
+    - rng: 0~1 난수 함수 (explore 결정용)
+    """
+
+    def __init__(self, preconditions=None, min_samples=MIN_SAMPLES, min_marginal=MIN_MARGINAL,
+                 min_cost=MIN_COST_SECONDS, explore_rate=EXPLORE_RATE, rng=random.random):
+        self.preconditions = preconditions or {}
+        self.min_samples = min_samples
+        self.min_marginal = min_marginal
+        self.min_cost = min_cost
+        self.explore_rate = explore_rate
+        self.rng = rng
+        self._stats = {}
+        self._log = deque(maxlen=LOG_SIZE)
+        self._lock = threading.Lock()
+
+    def _engine(self, name):
+        if name not in self._stats:
+            self._stats[name] = EngineStats()
+        return self._stats[name]
+
+    def plan(self, name, found, skip_low_yield=True):
+        """
+        엔진을 실행할지 정합니다.
+
+        Parameters:
+        - name: 엔진 이름
+        - found: 지금까지 끝난 엔진 이름 → 찾은 오류 수
+        - skip_low_yield: False이면 측정 기반 규칙은 쓰지 않고 선행 조건만 확인
+
+        Returns:
+        - 결정 딕셔너리 (engine, decision, reason, 당시 통계)
+        """
+        with self._lock:
+            stats = self._engine(name).as_dict()
+            marginal = self._engine(name).marginal()
+            latency = self._engine(name).latency
+
+        decision, reason = "run", "기본 실행"
+        if name in self.preconditions:
+            required, why = self.preconditions[name]
+            if required in found and not found[required]:
+                decision, reason = "skip", why
+        if (decision == "run" and skip_low_yield and stats['samples'] >= self.min_samples and latency is not None
+                and latency >= self.min_cost and marginal is not None and marginal < self.min_marginal):
+            if self.rng() < self.explore_rate:
+                decision, reason = "explore", "효용이 낮지만 통계를 갱신하려고 실행"
+            else:
+                decision = "skip"
+                reason = (f"실행당 새 오류 {marginal:.2f}개 < {self.min_marginal:g}개, "
+                          f"평균 {latency * 1000:.0f}ms")
+        increment(CASCADE_DECISIONS, engine=name, decision=decision)
+        return dict(stats, engine=name, decision=decision, reason=reason)
+
+    def record_latency(self, name, seconds):
+        with self._lock:
+            self._engine(name).record_latency(seconds)
+
+    def record_outcome(self, engine_errors, merged):
+        """
+        검사 한 번의 엔진별 결과로 효용 통계를 갱신합니다.
+
+        Parameters:
+        - engine_errors: 실제로 실행한 엔진 이름 → 오류 목록
+        - merged: 중복 제거까지 끝난 최종 오류 목록 (엔진 결과와 같은 오류 객체)
+        """
+        kept = {id(error) for error in merged}
+        with self._lock:
+            for name, errors in engine_errors.items():
+                self._engine(name).record_outcome(len(errors), sum(id(error) in kept for error in errors))
+
+    def log_run(self, decisions, **tags):
+        """검사 한 번의 결정 목록을 기록합니다."""
+        if decisions:
+            with self._lock:
+                self._log.append({'timestamp': time.time(), **tags, 'decisions': decisions})
+
+    def recent(self, limit=20):
+        """최근 결정 기록 (최신 순)"""
+        with self._lock:
+            return list(self._log)[-limit:][::-1]
+
+    def status(self):
+        """엔진별 현재 통계"""
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in self._stats.items()}
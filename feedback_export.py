@@ -0,0 +1,144 @@
+"""
+첨삭 결과를 Excel/CSV 파일로 내보내는 모듈
+
+분석 결과 묶음(analysis bundle)을 다시 계산하지 않고 그대로 받아, openpyxl의 write-only 모드나
+csv 모듈로 한 행씩 임시 파일에 바로 기록합니다. 학급 전체를 내보내도 워크북 전체를
+메모리에 올리지 않으며, 결과는 파일 경로로 전달됩니다.
+
+분석 결과 묶음 형식 (딕셔너리):
+- label: 학생 이름 등 글을 구분하는 이름
+- text: 원본 텍스트
+- grammar_errors: check_grammar 결과
+- stats: analyze_text 결과
+- timestamp: 제출 시각 (선택)
+- scores: {"문법": ..., "어휘": ..., "내용": ..., "종합 점수": ...} (선택)
+- feedback: 첨삭 피드백 (선택)
+"""
+import csv
+import os
+import tempfile
+
+try:
+    from openpyxl import Workbook
+    has_openpyxl = True
+except ImportError:
+    has_openpyxl = False
+
+EXPORT_FORMATS = ('xlsx', 'csv')
+
+STAT_ITEMS = [
+    ("단어 수", 'word_count'),
+    ("문장 수", 'sentence_count'),
+    ("평균 단어 길이", 'avg_word_length'),
+    ("평균 문장 길이", 'avg_sentence_length'),
+    ("어휘 크기", 'vocabulary_size'),
+]
+
+
+# 오류 하나를 내보내기 행 값으로 변환
+def error_row_values(text, error):
+    offset = error.get('offset', 0)
+    length = error.get('length', error.get('errorLength', 0))
+    return [
+        text[offset:offset + length],
+        error.get('message', ''),
+        str(list(error.get('replacements', []))),
+        f"{offset}:{offset + length}",
+    ]
+
+
+def write_feedback_workbook(path, bundles):
+    """
+    분석 결과 묶음들을 write-only 모드의 Excel 파일로 기록합니다.
+    시트별로 한 번씩 묶음을 순회하므로 bundles는 여러 번 순회할 수 있어야 합니다
+    (목록이거나 매번 새 반복자를 돌려주는 함수).
+
+    Parameters:
+    - path: 저장할 파일 경로
+    - bundles: 분석 결과 묶음 목록, 또는 호출할 때마다 새 반복자를 반환하는 함수
+    """
+    if not has_openpyxl:
+        raise RuntimeError("Excel 내보내기에는 openpyxl이 필요합니다")
+
+    iterate = bundles if callable(bundles) else (lambda: iter(bundles))
+
+    workbook = Workbook(write_only=True)
+
+    sheet = workbook.create_sheet("원본 텍스트")
+    sheet.append(["학생", "제출 시각", "원본 텍스트"])
+    for bundle in iterate():
+        sheet.append([bundle.get('label', ''), bundle.get('timestamp', ''), bundle['text']])
+
+    sheet = workbook.create_sheet("문법 오류")
+    sheet.append(["학생", "오류", "오류 내용", "수정 제안", "위치"])
+    for bundle in iterate():
+        for error in bundle.get('grammar_errors', []):
+            sheet.append([bundle.get('label', '')] + error_row_values(bundle['text'], error))
+
+    sheet = workbook.create_sheet("통계")
+    sheet.append(["학생"] + [name for name, _ in STAT_ITEMS])
+    for bundle in iterate():
+        stats = bundle.get('stats', {})
+        sheet.append([bundle.get('label', '')] + [stats.get(key, '') for _, key in STAT_ITEMS])
+
+    sheet = workbook.create_sheet("평가 점수")
+    sheet.append(["학생", "평가 항목", "점수"])
+    for bundle in iterate():
+        for item, score in (bundle.get('scores') or {}).items():
+            sheet.append([bundle.get('label', ''), item, score])
+
+    sheet = workbook.create_sheet("피드백")
+    sheet.append(["학생", "첨삭 피드백"])
+    for bundle in iterate():
+        if bundle.get('feedback'):
+            sheet.append([bundle.get('label', ''), bundle['feedback']])
+
+    workbook.save(path)
+
+
+def write_feedback_csv(path, bundles):
+    """
+    분석 결과 묶음들을 CSV 파일 하나로 기록합니다. 오류 하나당 한 행이며
+    학생 정보와 통계가 각 행에 함께 들어갑니다. bundles는 한 번만 순회합니다.
+    """
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(["학생", "제출 시각"] + [name for name, _ in STAT_ITEMS] +
+                        ["오류", "오류 내용", "수정 제안", "위치"])
+        for bundle in bundles:
+            stats = bundle.get('stats', {})
+            prefix = [bundle.get('label', ''), bundle.get('timestamp', '')] + \
+                     [stats.get(key, '') for _, key in STAT_ITEMS]
+            errors = bundle.get('grammar_errors', [])
+            if not errors:
+                writer.writerow(prefix + ['', '', '', ''])
+            for error in errors:
+                writer.writerow(prefix + error_row_values(bundle['text'], error))
+
+
+def export_feedback(bundles, fmt='xlsx', prefix="첨삭결과_"):
+    """
+    분석 결과 묶음을 임시 파일로 내보내고 파일 경로를 반환합니다.
+
+    Parameters:
+    - bundles: 분석 결과 묶음 목록 (xlsx는 호출할 때마다 새 반복자를 반환하는 함수도 가능)
+    - fmt: 'xlsx' 또는 'csv'
+    - prefix: 임시 파일 이름 접두사
+
+    Returns:
+    - 생성된 파일 경로 (사용 후 호출하는 쪽에서 삭제)
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"지원하지 않는 형식입니다: {fmt}")
+
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=f".{fmt}")
+    os.close(fd)
+    try:
+        if fmt == 'xlsx':
+            write_feedback_workbook(path, bundles)
+        else:
+            write_feedback_csv(path, bundles() if callable(bundles) else bundles)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
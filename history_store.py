@@ -0,0 +1,265 @@
+"""
+작문 제출 기록을 SQLite(WAL 모드)에 영구 저장하는 모듈
+
+- 기록은 추가만 가능하며(append-only) 수정/삭제하지 않습니다.
+- 쓰기는 버퍼에 모았다가 한 트랜잭션으로 묶어 저장합니다. 저장에 실패하면(예: database is locked)
+  기록을 버퍼 앞에 되돌려 두고 다음 저장 때 다시 시도합니다.
+- 읽기는 학생/시간/오류 수 인덱스를 사용하는 페이지 단위 쿼리로 처리합니다.
+- 분석 요약이 함께 들어오면 같은 트랜잭션에서 대시보드 집계(dashboard_stats)를 갱신합니다.
+  집계 테이블이 없던 데이터베이스는 처음 열 때 저장된 기록으로 집계를 한 번 채웁니다.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import dashboard_stats
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_DB_PATH = os.environ.get(
+    "ENGCHECK_HISTORY_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "history.db")
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    action TEXT NOT NULL,
+    text TEXT NOT NULL,
+    error_count INTEGER,
+    analysis TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_submissions_student_timestamp ON submissions (student, timestamp);
+CREATE INDEX IF NOT EXISTS idx_submissions_timestamp ON submissions (timestamp);
+CREATE INDEX IF NOT EXISTS idx_submissions_error_count ON submissions (error_count);
+"""
+
+HISTORY_COLUMNS = ('id', 'student', 'timestamp', 'action', 'text', 'error_count')
+
+
+class HistoryStore:
+    """
+    제출 기록 저장소
+
+    Parameters:
+    - path: SQLite 데이터베이스 파일 경로
+    - batch_size: 버퍼에 이만큼 쌓이면 즉시 저장
+    - flush_interval: 버퍼를 주기적으로 저장하는 간격(초)
+    """
+
+    def __init__(self, path=DEFAULT_HISTORY_DB_PATH, batch_size=50, flush_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._local = threading.local()
+        self._buffer = []
+        self._buffer_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._closed = threading.Event()
+
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+            # 이전 버전에서 만든 데이터베이스에는 분석 결과 열이 없으므로 추가
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(submissions)")}
+            if 'analysis' not in columns:
+                conn.execute("ALTER TABLE submissions ADD COLUMN analysis TEXT")
+        self._create_dashboard_tables()
+
+        # 남은 버퍼를 주기적으로 저장하는 백그라운드 스레드
+        self._flusher = threading.Thread(target=self._flush_periodically, name="history-flusher", daemon=True)
+        self._flusher.start()
+
+    # 대시보드 집계 테이블을 만들고, 처음 만들 때는 이미 저장된 기록으로 채움
+    def _create_dashboard_tables(self):
+        conn = self._connection()
+        # 여러 서버 프로세스가 동시에 시작해도 한 프로세스만 집계를 채우도록 쓰기 잠금을 먼저 잡음
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            created = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'student_summary'"
+            ).fetchone() is None
+            for statement in dashboard_stats.SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+            if created:
+                backfilled = dashboard_stats.backfill(conn)
+                if backfilled:
+                    logger.info("이전 제출 기록 %d건을 대시보드 집계에 더했습니다", backfilled)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    # 스레드별 연결 (sqlite3 연결은 스레드 간에 공유하지 않음)
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("제출 기록 저장 중 오류 (다음 주기에 다시 시도합니다)")
+
+    def append(self, student, text, action, error_count=None, timestamp=None, summary=None, analysis=None):
+        """
+        제출 기록을 추가합니다. 실제 저장은 버퍼가 차거나 주기적으로 한 번에 이루어집니다.
+
+        Parameters:
+        - student: 학생 이름
+        - text: 제출한 텍스트
+        - action: 수행한 작업 (예: "분석", "재작성 (고급 수준)")
+        - error_count: 발견된 오류 수 (분석이 아닌 경우 None)
+        - timestamp: 기록 시각 문자열 (None이면 현재 시각)
+        - summary: 대시보드 집계에 더할 분석 요약 (dashboard_stats.summarize_analysis 결과)
+        - analysis: 내보내기에 다시 쓸 분석 결과 (grammar_errors, stats 등). JSON으로 저장됩니다
+        """
+        record = (
+            student,
+            timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            action,
+            text,
+            error_count,
+            json.dumps(analysis, ensure_ascii=False, default=list) if analysis is not None else None,
+        )
+        with self._buffer_lock:
+            self._buffer.append((record, summary))
+            should_flush = len(self._buffer) >= self.batch_size
+        if should_flush:
+            try:
+                self.flush()
+            except Exception:
+                # 기록은 버퍼에 남아 있으므로 제출한 작업은 실패시키지 않고 주기적 저장에 맡김
+                logger.exception("제출 기록 저장 중 오류 (다음 주기에 다시 시도합니다)")
+
+    def flush(self):
+        """
+        버퍼에 쌓인 기록을 한 트랜잭션으로 저장합니다.
+        저장에 실패하면 기록을 버퍼 앞(그 사이 추가된 기록보다 앞)에 되돌린 뒤 예외를 그대로 전달합니다.
+        """
+        with self._buffer_lock:
+            records, self._buffer = self._buffer, []
+        if not records:
+            return
+
+        try:
+            with self._write_lock:
+                conn = self._connection()
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO submissions (student, timestamp, action, text, error_count, analysis) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        [record for record, _ in records]
+                    )
+                    for record, summary in records:
+                        if summary is not None:
+                            dashboard_stats.apply_summary(conn, record[0], record[1], summary)
+        except Exception:
+            # 트랜잭션이 롤백되었으므로 다시 저장해도 기록과 집계가 두 번 들어가지 않음
+            with self._buffer_lock:
+                self._buffer[:0] = records
+            raise
+
+    def _where(self, student):
+        if student is None:
+            return "", ()
+        return "WHERE student = ?", (student,)
+
+    def count(self, student=None):
+        """저장된 기록 수를 반환합니다."""
+        self.flush()
+        where, params = self._where(student)
+        row = self._connection().execute(f"SELECT COUNT(*) FROM submissions {where}", params).fetchone()
+        return row[0]
+
+    def page(self, student=None, page=0, page_size=20):
+        """
+        최신 기록부터 페이지 단위로 반환합니다.
+
+        Parameters:
+        - student: 학생 이름 (None이면 전체)
+        - page: 0부터 시작하는 페이지 번호
+        - page_size: 페이지당 기록 수
+
+        Returns:
+        - 기록 딕셔너리 목록
+        """
+        self.flush()
+        where, params = self._where(student)
+        rows = self._connection().execute(
+            f"SELECT {', '.join(HISTORY_COLUMNS)} FROM submissions {where} "
+            "ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?",
+            params + (page_size, page * page_size)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def error_count_series(self, student=None, limit=100):
+        """오류 수 추이 차트용으로 최근 분석 기록의 (시각, 오류 수)를 오래된 순서로 반환합니다."""
+        self.flush()
+        conditions = ["error_count IS NOT NULL"]
+        params = ()
+        if student is not None:
+            conditions.append("student = ?")
+            params = (student,)
+        rows = self._connection().execute(
+            f"SELECT timestamp, error_count FROM submissions WHERE {' AND '.join(conditions)} "
+            "ORDER BY timestamp DESC, id DESC LIMIT ?",
+            params + (limit,)
+        ).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def iter_analyses(self, student=None):
+        """
+        저장된 분석 결과를 오래된 순서로 하나씩 반환하는 생성자입니다.
+        커서를 그대로 순회하므로 기록이 많아도 한 번에 메모리에 올리지 않습니다.
+
+        Returns:
+        - 분석 결과 묶음(label, timestamp, text, grammar_errors, stats 등) 반복자
+        """
+        self.flush()
+        conditions = ["analysis IS NOT NULL"]
+        params = ()
+        if student is not None:
+            conditions.append("student = ?")
+            params = (student,)
+        # 순회 중에 같은 스레드에서 다른 쿼리가 실행돼도 영향이 없도록 별도 연결 사용
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            cursor = conn.execute(
+                f"SELECT student, timestamp, text, analysis FROM submissions WHERE {' AND '.join(conditions)} "
+                "ORDER BY timestamp, id",
+                params
+            )
+            for student_name, timestamp, text, analysis in cursor:
+                bundle = json.loads(analysis)
+                bundle.update({'label': student_name, 'timestamp': timestamp, 'text': text})
+                yield bundle
+        finally:
+            conn.close()
+
+    def dashboard(self, days=dashboard_stats.DASHBOARD_DAYS):
+        """교사 대시보드용 사전 집계 통계를 반환합니다."""
+        self.flush()
+        return dashboard_stats.load_dashboard(self._connection(), days)
+
+    def close(self):
+        """남은 기록을 저장하고 백그라운드 스레드를 멈춥니다."""
+        self._closed.set()
+        self.flush()
@@ -0,0 +1,207 @@
+"""
+처리 단계별 시간 측정과 엔진 상태 카운터
+
+- span(): 검사기, 토크나이저, 어휘 평가, 음성 합성, 외부 API 호출 등 한 단계의 실행 시간을
+  지연 시간 히스토그램에 기록하고, 실패하면 실패 카운터를 올립니다.
+- increment(): 캐시 적중/실패, 엔진 (재)시작, API 실패 등의 카운터를 올립니다.
+- trace(): 요청 하나(예: "전체 분석하기")에서 실행된 단계 목록을 모아 디버그 패널에 보여줍니다.
+- render_prometheus(): 모든 지표를 Prometheus 텍스트 형식으로 반환합니다.
+"""
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 지연 시간 히스토그램 구간 (초)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_DURATION = "engcheck_stage_duration_seconds"
+STAGE_FAILURES = "engcheck_stage_failures_total"
+CACHE_REQUESTS = "engcheck_cache_requests_total"
+ENGINE_STARTS = "engcheck_engine_starts_total"
+API_FAILURES = "engcheck_api_failures_total"
+
+METRIC_HELP = {
+    STAGE_DURATION: "처리 단계별 실행 시간",
+    STAGE_FAILURES: "예외로 끝난 처리 단계 수",
+    CACHE_REQUESTS: "캐시 조회 수 (result=hit|miss)",
+    ENGINE_STARTS: "검사 엔진/모델 초기화 횟수",
+    API_FAILURES: "외부 API 호출 실패 수",
+}
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_current_trace = contextvars.ContextVar("engcheck_trace", default=None)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def increment(name, value=1, **labels):
+    """카운터를 value만큼 올립니다."""
+    key = (name, _label_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, seconds, **labels):
+    """히스토그램에 측정값 하나를 기록합니다."""
+    key = (name, _label_key(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {'buckets': [0] * len(LATENCY_BUCKETS), 'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                histogram['buckets'][i] += 1
+        histogram['sum'] += seconds
+        histogram['count'] += 1
+
+
+def record_cache(cache, hit):
+    """캐시 조회 결과(적중/실패)를 기록합니다."""
+    increment(CACHE_REQUESTS, cache=cache, result="hit" if hit else "miss")
+
+
+def record_engine_start(engine):
+    """검사 엔진이나 모델을 새로 초기화했음을 기록합니다."""
+    increment(ENGINE_STARTS, engine=engine)
+
+
+def record_api_failure(api):
+    """외부 API 호출 실패를 기록합니다."""
+    increment(API_FAILURES, api=api)
+
+
+@contextlib.contextmanager
+def span(stage):
+    """
+    블록의 실행 시간을 stage 이름으로 기록합니다.
+    예외가 발생하면 실패 카운터를 올리고 예외를 그대로 다시 발생시킵니다.
+
+    stage 이름은 "종류:이름" 형식을 사용합니다 (예: "checker:languagetool", "api:sapling").
+    """
+    start = time.perf_counter()
+    ok = True
+    try:
+        yield
+    except BaseException:
+        ok = False
+        increment(STAGE_FAILURES, stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        observe(STAGE_DURATION, elapsed, stage=stage)
+        spans = _current_trace.get()
+        if spans is not None:
+            spans.append({'stage': stage, 'seconds': elapsed, 'ok': ok})
+
+
+def timed(stage):
+    """함수 실행 전체를 span으로 감싸는 데코레이터"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def trace():
+    """
+    블록 안에서 실행된 단계(span) 목록을 모읍니다. 중첩되면 바깥 trace에도 함께 기록됩니다.
+
+    사용 예:
+        with trace() as spans:
+            check_grammar(text)
+        # spans: [{'stage': ..., 'seconds': ..., 'ok': ...}, ...]
+    """
+    outer = _current_trace.get()
+    spans = [] if outer is None else outer
+    token = _current_trace.set(spans)
+    try:
+        yield spans
+    finally:
+        _current_trace.reset(token)
+
+
+def snapshot():
+    """현재 카운터와 히스토그램 값을 복사해 반환합니다 (디버그 패널용)."""
+    with _lock:
+        counters = {key: value for key, value in _counters.items()}
+        histograms = {key: {'sum': value['sum'], 'count': value['count']} for key, value in _histograms.items()}
+    return counters, histograms
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(label_items, extra=()):
+    items = list(label_items) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in items) + "}"
+
+
+def render_prometheus():
+    """모든 지표를 Prometheus 텍스트 노출 형식(0.0.4)으로 반환합니다."""
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, dict(value, buckets=list(value['buckets']))) for key, value in _histograms.items())
+
+    lines = []
+    written = set()
+
+    def header(name, metric_type):
+        if name not in written:
+            written.add(name)
+            lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+    for (name, labels), value in counters:
+        header(name, "counter")
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    for (name, labels), histogram in histograms:
+        header(name, "histogram")
+        for bound, count in zip(LATENCY_BUCKETS, histogram['buckets']):
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+        lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {histogram['count']}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """
+    /metrics 엔드포인트를 제공하는 HTTP 서버를 백그라운드 스레드로 시작합니다.
+    Streamlit 앱처럼 별도의 HTTP 라우팅이 없는 프로세스에서 사용합니다.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,344 @@
+"""
+분석/재작성/음성 합성 작업 대기열
+
+Streamlit 스크립트 스레드에서 긴 분석을 실행하면 그동안 해당 세션 화면이 멈추고,
+학생이 다른 페이지로 이동하면 작업도 사라집니다. 이 모듈은 작업을 SQLite 대기열에
+넣고 작업 스레드가 처리하게 하며, 화면은 작업 ID로 상태를 주기적으로 확인합니다.
+
+- submit(): 작업을 'queued' 상태로 저장하고 작업 ID를 반환합니다.
+- 작업 스레드는 대기열에서 가장 오래된 작업을 가져와(claim) 등록된 처리 함수로 실행하고
+  결과를 JSON으로 저장합니다 ('done' 또는 'failed').
+- 동시에 실행되는 작업 수는 같은 데이터베이스 파일을 쓰는 모든 프로세스를 합쳐
+  max_running개로 제한합니다. 작업을 가져올 때 실행 중인 작업 수를 같은 트랜잭션에서
+  확인하므로, 한꺼번에 많이 제출되면 CPU를 넘치게 쓰지 않고 대기열에서 기다립니다.
+- 실행 중인 작업은 heartbeat를 주기적으로 갱신합니다. 프로세스가 죽어 heartbeat가
+  STALE_SECONDS 동안 멈춘 작업은 다시 대기열로 돌리고, MAX_ATTEMPTS번 실패하면 'failed'로 끝냅니다.
+- cancel(): 대기 중인 작업은 바로 취소하고, 실행 중인 작업에는 취소를 요청합니다. 처리 함수는
+  진행 상황을 알릴 때와 단계 사이에 check_cancelled()를 불러 멈추며, 처리 함수가 끝난 뒤에
+  요청이 확인되어도 결과를 버리고 'cancelled'로 끝냅니다.
+- path=None이면 파일 대신 프로세스 내부 공유 메모리 데이터베이스를 사용합니다.
+
+작업 상태: queued → running → done | failed | cancelled
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+from instrumentation import METRIC_HELP, increment, observe
+
+DEFAULT_JOB_DB_PATH = os.environ.get(
+    "ENGCHECK_JOB_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "jobs.db")
+)
+DEFAULT_MAX_RUNNING = int(os.environ.get("ENGCHECK_JOB_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+HEARTBEAT_INTERVAL = 5.0
+STALE_SECONDS = 60.0
+MAX_ATTEMPTS = 2
+JOB_RETENTION_SECONDS = 7 * 24 * 3600
+
+JOBS_FINISHED = "engcheck_jobs_finished_total"
+JOB_WAIT = "engcheck_job_wait_seconds"
+METRIC_HELP[JOBS_FINISHED] = "끝난 작업 수 (status=done|failed|cancelled)"
+METRIC_HELP[JOB_WAIT] = "작업이 대기열에서 기다린 시간"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    student TEXT,
+    payload TEXT NOT NULL,
+    progress TEXT,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    started REAL,
+    heartbeat REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created);
+CREATE INDEX IF NOT EXISTS idx_jobs_student_created ON jobs (student, created);
+"""
+
+JOB_COLUMNS = ('id', 'kind', 'status', 'student', 'payload', 'progress', 'result', 'error',
+               'attempts', 'created', 'started', 'finished')
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+class JobCancelled(Exception):
+    """실행 중인 작업이 취소 요청을 받았을 때 처리 함수가 던지는 예외"""
+
+
+class JobContext:
+    """처리 함수에 넘겨주는 작업 정보 (진행 상황 저장, 취소 확인)"""
+
+    def __init__(self, queue, job_id, kind, student):
+        self.queue = queue
+        self.id = job_id
+        self.kind = kind
+        self.student = student
+
+    def progress(self, data):
+        """화면에 보여줄 중간 결과를 저장합니다."""
+        self.queue._update(self.id, progress=json.dumps(data, ensure_ascii=False, default=str), heartbeat=time.time())
+
+    def cancelled(self):
+        row = self.queue._connection().execute("SELECT cancel_requested FROM jobs WHERE id = ?", (self.id,)).fetchone()
+        return bool(row and row[0])
+
+    def check_cancelled(self):
+        if self.cancelled():
+            raise JobCancelled(self.id)
+
+
+class JobQueue:
+    """
+    작업 대기열
+
+    Parameters:
+    - path: SQLite 데이터베이스 파일 경로 (None이면 프로세스 내부 메모리 데이터베이스)
+    - max_running: 이 데이터베이스를 쓰는 모든 프로세스에서 동시에 실행할 최대 작업 수
+    - workers: 이 프로세스의 작업 스레드 수 (기본: max_running)
+    - poll_interval: 다른 프로세스가 넣은 작업을 확인하는 간격(초)
+    """
+
+    def __init__(self, path=DEFAULT_JOB_DB_PATH, max_running=DEFAULT_MAX_RUNNING, workers=None,
+                 poll_interval=1.0):
+        if path is None:
+            self.path = f"file:engcheck_jobs_{uuid.uuid4().hex}?mode=memory&cache=shared"
+            self._uri = True
+        else:
+            self.path = path
+            self._uri = False
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self.max_running = max_running
+        self.worker_count = workers or max_running
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.handlers = {}
+
+        self._local = threading.local()
+        self._wakeup = threading.Condition()
+        self._closed = threading.Event()
+        self._threads = []
+
+        # 메모리 데이터베이스는 연결이 하나라도 열려 있어야 유지되므로 이 연결을 계속 열어 둠
+        self._keeper = self._connect()
+        with self._keeper:
+            self._keeper.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, uri=self._uri, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        if not self._uri:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # 스레드별 연결 (sqlite3 연결은 스레드 간에 공유하지 않음)
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _update(self, job_id, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._connection().execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def register(self, kind, handler):
+        """
+        작업 종류별 처리 함수를 등록합니다.
+
+        Parameters:
+        - kind: 작업 종류 (예: 'analysis', 'rewrite', 'tts')
+        - handler: (payload, JobContext) → JSON으로 저장할 수 있는 결과를 반환하는 함수
+        """
+        self.handlers[kind] = handler
+        return self
+
+    def start(self):
+        """작업 스레드와 heartbeat 스레드를 시작합니다."""
+        if self._threads:
+            return self
+        for index in range(self.worker_count):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        heartbeat = threading.Thread(target=self._beat, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+        return self
+
+    def submit(self, kind, payload, student=None):
+        """
+        작업을 대기열에 넣고 작업 ID를 반환합니다.
+
+        Parameters:
+        - kind: 등록된 작업 종류
+        - payload: 처리 함수에 넘길 값 (JSON으로 저장)
+        - student: 작업을 요청한 학생 이름 (목록 조회용)
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"등록되지 않은 작업 종류입니다: {kind}")
+        job_id = uuid.uuid4().hex
+        self._connection().execute(
+            "INSERT INTO jobs (id, kind, status, student, payload, created) VALUES (?, ?, 'queued', ?, ?, ?)",
+            (job_id, kind, student, json.dumps(payload, ensure_ascii=False, default=str), time.time())
+        )
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id):
+        """
+        작업 상태를 반환합니다 (없으면 None).
+
+        Returns:
+        - id, kind, status, student, payload, progress, result, error, attempts, created, started, finished와
+          대기열 순서(position, 대기 중일 때만) 딕셔너리. payload/progress/result는 JSON을 풀어 둡니다
+        """
+        conn = self._connection()
+        row = conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        for name in ('payload', 'progress', 'result'):
+            if job[name] is not None:
+                job[name] = json.loads(job[name])
+        if job['status'] == 'queued':
+            job['position'] = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created <= ?", (job['created'],)
+            ).fetchone()[0]
+        return job
+
+    def list_jobs(self, student=None, limit=20):
+        """최근 작업 목록을 반환합니다 (결과 제외)."""
+        where, params = ("WHERE student = ?", (student,)) if student is not None else ("", ())
+        rows = self._connection().execute(
+            f"SELECT id, kind, status, student, created, finished FROM jobs {where} ORDER BY created DESC LIMIT ?",
+            params + (limit,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def cancel(self, job_id):
+        """대기 중인 작업은 바로 취소하고, 실행 중인 작업에는 취소를 요청합니다."""
+        conn = self._connection()
+        cursor = conn.execute(
+            "UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'",
+            (time.time(), job_id)
+        )
+        if not cursor.rowcount:
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+
+    def counts(self):
+        """상태별 작업 수를 반환합니다."""
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def _claim(self):
+        """실행 중인 작업 수가 한도 아래이면 가장 오래된 대기 작업을 가져옵니다."""
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # heartbeat가 멈춘 작업(죽은 프로세스의 작업)은 다시 대기열로, 여러 번 실패했으면 종료
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = '작업 프로세스가 응답하지 않습니다', finished = ? "
+                "WHERE status = 'running' AND heartbeat < ? AND attempts >= ?",
+                (now, now - STALE_SECONDS, MAX_ATTEMPTS)
+            )
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND heartbeat < ?",
+                (now - STALE_SECONDS,)
+            )
+            running = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'running'").fetchone()[0]
+            if running >= self.max_running:
+                conn.execute("COMMIT")
+                return None
+            row = conn.execute(
+                "SELECT id, kind, student, payload, created FROM jobs WHERE status = 'queued' "
+                "ORDER BY created LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, started = ?, heartbeat = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                (self.worker_id, now, now, row['id'])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        observe(JOB_WAIT, now - row['created'], kind=row['kind'])
+        return dict(row)
+
+    def _run(self, job):
+        handler = self.handlers.get(job['kind'])
+        context = JobContext(self, job['id'], job['kind'], job['student'])
+        try:
+            if handler is None:
+                raise ValueError(f"등록되지 않은 작업 종류입니다: {job['kind']}")
+            result = handler(json.loads(job['payload']), context)
+            # 마지막 확인 뒤에 취소를 요청받았으면 결과를 버리고 취소로 끝냄
+            context.check_cancelled()
+        except JobCancelled:
+            self._update(job['id'], status='cancelled', finished=time.time())
+            increment(JOBS_FINISHED, kind=job['kind'], status='cancelled')
+            return
+        except Exception as e:
+            traceback.print_exc()
+            self._update(job['id'], status='failed', error=str(e), finished=time.time())
+            increment(JOBS_FINISHED, kind=job['kind'], status='failed')
+            return
+        self._update(job['id'], status='done', finished=time.time(),
+                     result=json.dumps(result, ensure_ascii=False, default=str))
+        increment(JOBS_FINISHED, kind=job['kind'], status='done')
+
+    def _work(self):
+        while not self._closed.is_set():
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                print(f"작업 대기열 조회 오류: {e}")
+                job = None
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+                continue
+            try:
+                self._run(job)
+            finally:
+                # 작업이 끝나 자리가 났으므로 기다리는 다른 작업 스레드를 깨움
+                with self._wakeup:
+                    self._wakeup.notify()
+
+    def _beat(self):
+        while not self._closed.wait(HEARTBEAT_INTERVAL):
+            try:
+                conn = self._connection()
+                conn.execute("UPDATE jobs SET heartbeat = ? WHERE status = 'running' AND worker = ?",
+                             (time.time(), self.worker_id))
+                # 오래된 완료 작업 정리
+                conn.execute("DELETE FROM jobs WHERE status NOT IN ('queued', 'running') AND finished < ?",
+                             (time.time() - JOB_RETENTION_SECONDS,))
+            except sqlite3.Error as e:
+                print(f"작업 heartbeat 갱신 오류: {e}")
+
+    def close(self):
+        """작업 스레드를 멈춥니다 (실행 중인 작업은 끝까지 실행)."""
+        self._closed.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
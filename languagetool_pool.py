@@ -0,0 +1,360 @@
+"""
+LanguageTool HTTP 서버 풀
+
+language_tool_python.LanguageTool('en-US')는 인스턴스마다 자체 JVM 서버를 띄우므로
+세션과 프로세스가 늘어날수록 기가바이트 단위 JVM이 여러 개 생깁니다. 이 모듈은
+정해진 수(N)의 LanguageTool HTTP 서버를 한 번만 띄워 관리하고, 각 검사 요청을
+처리 중인 요청이 가장 적은 서버로 보냅니다
+(language_tool_python.LanguageTool(remote_server=...) 클라이언트 사용).
+
+- 풀 크기: ENGCHECK_LT_POOL_SIZE, 없으면 메모리 한도(ENGCHECK_LT_MEMORY_LIMIT_MB 또는 cgroup 한도)를
+  서버 하나의 메모리(ENGCHECK_LT_HEAP_MB + JVM 부가 메모리)로 나눠 계산
+- 외부 서버: ENGCHECK_LT_SERVERS="http://host:8081,http://host:8082"
+  (같은 머신의 로컬 서버가 건강하면 로컬 서버를 먼저 사용하고, 없을 때만 외부 서버 사용)
+- 주기적으로 /v2/languages로 상태를 확인하고 응답하지 않는 로컬 서버는 다시 띄움
+- check(text, enabled_only=..., disabled=...)로 요청마다 검사할 규칙을 고를 수 있음
+  (규칙 조합마다 클라이언트를 따로 만들어 두므로 다른 요청의 설정에 영향을 주지 않음)
+
+여러 프로세스(Streamlit, API 서버)가 하나의 풀을 함께 쓰려면 풀만 따로 실행하고
+출력된 주소를 ENGCHECK_LT_SERVERS로 넘깁니다:
+    python languagetool_pool.py --size 2
+"""
+import argparse
+import atexit
+import contextlib
+import glob
+import os
+import shutil
+import socket
+import subprocess
+import threading
+import time
+
+import requests
+
+from instrumentation import record_api_failure, record_engine_start
+
+LT_LANGUAGE = "en-US"
+LT_HEAP_MB = int(os.environ.get("ENGCHECK_LT_HEAP_MB", "1024"))
+# 힙 외에 JVM이 추가로 쓰는 메모리 (메타스페이스, 스레드 스택 등)
+LT_JVM_OVERHEAD_MB = int(os.environ.get("ENGCHECK_LT_JVM_OVERHEAD_MB", "256"))
+# 앱 자체(Streamlit, 모델 등)를 위해 남겨둘 메모리
+LT_RESERVED_MB = int(os.environ.get("ENGCHECK_LT_RESERVED_MB", "1024"))
+LT_HEALTH_INTERVAL = float(os.environ.get("ENGCHECK_LT_HEALTH_INTERVAL", "30"))
+LT_STARTUP_TIMEOUT = float(os.environ.get("ENGCHECK_LT_STARTUP_TIMEOUT", "120"))
+
+CGROUP_MEMORY_FILES = ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes")
+
+
+# 컨테이너(cgroup) 메모리 한도를 MB 단위로 반환 (한도가 없으면 None)
+def detect_memory_limit_mb():
+    configured = os.environ.get("ENGCHECK_LT_MEMORY_LIMIT_MB")
+    if configured:
+        return int(configured)
+    for path in CGROUP_MEMORY_FILES:
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        # cgroup v1은 한도가 없으면 아주 큰 값을 돌려줌
+        if value.isdigit() and int(value) < 1 << 50:
+            return int(value) // (1024 * 1024)
+    return None
+
+
+def pool_size_from_memory(memory_limit_mb=None, heap_mb=LT_HEAP_MB):
+    """
+    메모리 한도 안에서 띄울 수 있는 서버 수를 계산합니다 (최소 1, 최대 CPU 수).
+    ENGCHECK_LT_POOL_SIZE가 설정되어 있으면 그 값을 그대로 사용합니다.
+    """
+    configured = os.environ.get("ENGCHECK_LT_POOL_SIZE")
+    if configured:
+        return int(configured)
+    if memory_limit_mb is None:
+        memory_limit_mb = detect_memory_limit_mb()
+    cpu_count = os.cpu_count() or 1
+    if memory_limit_mb is None:
+        return min(2, cpu_count)
+    per_server = heap_mb + LT_JVM_OVERHEAD_MB
+    return max(1, min(cpu_count, (memory_limit_mb - LT_RESERVED_MB) // per_server))
+
+
+def remote_servers_from_env():
+    return [url.strip().rstrip('/') for url in os.environ.get("ENGCHECK_LT_SERVERS", "").split(",") if url.strip()]
+
+
+# LanguageTool 서버 jar 파일 위치 찾기 (없으면 language_tool_python으로 한 번 내려받음)
+def find_server_jar():
+    directories = [os.environ.get("ENGCHECK_LT_JAR_DIR"), os.environ.get("LTP_JAR_DIR_PATH")]
+    try:
+        from language_tool_python.utils import get_language_tool_download_path
+        download_path = str(get_language_tool_download_path())
+    except Exception:
+        download_path = os.path.join(os.path.expanduser("~"), ".cache", "language_tool_python")
+    directories.extend(sorted(glob.glob(os.path.join(download_path, "LanguageTool-*")), reverse=True))
+
+    def search():
+        for directory in directories:
+            if directory:
+                jar = os.path.join(directory, "languagetool-server.jar")
+                if os.path.isfile(jar):
+                    return jar
+        return None
+
+    jar = search()
+    if jar is None:
+        from language_tool_python.download_lt import download_lt
+        download_lt()
+        directories.extend(sorted(glob.glob(os.path.join(download_path, "LanguageTool-*")), reverse=True))
+        jar = search()
+    if jar is None:
+        raise RuntimeError("languagetool-server.jar를 찾을 수 없습니다")
+    return jar
+
+
+def language_tool_client(url, enabled_only=(), disabled=()):
+    """
+    url의 서버로 요청을 보내는 language_tool_python 클라이언트를 만듭니다.
+
+    Parameters:
+    - url: 서버 주소 (예: http://127.0.0.1:8081)
+    - enabled_only: 주어지면 이 규칙들만 검사
+    - disabled: 검사하지 않을 규칙들
+    """
+    import language_tool_python
+    client = language_tool_python.LanguageTool(LT_LANGUAGE, remote_server=url)
+    if enabled_only:
+        client.enabled_rules = set(enabled_only)
+        client.enabled_rules_only = True
+    if disabled:
+        client.disabled_rules = set(disabled)
+    return client
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LanguageToolServer:
+    """
+    풀에 속한 LanguageTool 서버 하나
+
+    Parameters:
+    - url: 서버 주소 (예: http://127.0.0.1:8081)
+    - command: 로컬 서버를 띄우는 명령 (None이면 외부 서버로 보고 다시 띄우지 않음)
+    """
+
+    def __init__(self, url, command=None):
+        self.url = url
+        self.command = command
+        self.process = None
+        self.inflight = 0
+        self.healthy = False
+        self._clients = {}
+
+    @property
+    def local(self):
+        return self.command is not None
+
+    def start(self):
+        if self.local:
+            record_engine_start("languagetool_server")
+            self.process = subprocess.Popen(self.command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self._clients = {}
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process = None
+
+    def check_health(self, timeout=2):
+        """서버가 응답하는지 확인하고 결과를 healthy에 기록합니다."""
+        if self.local and (self.process is None or self.process.poll() is not None):
+            self.healthy = False
+            return False
+        try:
+            response = requests.get(f"{self.url}/v2/languages", timeout=timeout)
+            self.healthy = response.status_code == 200
+        except requests.RequestException:
+            self.healthy = False
+        return self.healthy
+
+    def client(self, enabled_only=(), disabled=()):
+        """이 서버로 요청을 보내는 language_tool_python 클라이언트 (서버가 뜬 뒤에 규칙 조합마다 한 번 생성)"""
+        key = (frozenset(enabled_only), frozenset(disabled))
+        if key not in self._clients:
+            self._clients[key] = language_tool_client(self.url, enabled_only, disabled)
+        return self._clients[key]
+
+
+class LanguageToolPool:
+    """
+    LanguageTool 서버 풀. check()는 language_tool_python.LanguageTool.check와 같은 결과를 반환하므로
+    기존 tool.check(text) 호출을 그대로 대체할 수 있습니다.
+
+    Parameters:
+    - size: 띄울 로컬 서버 수 (None이면 pool_size_from_memory())
+    - remote_servers: 함께 사용할 외부 서버 주소 목록
+    - heap_mb: 로컬 서버 하나의 JVM 최대 힙(MB)
+    """
+
+    def __init__(self, size=None, remote_servers=(), heap_mb=LT_HEAP_MB):
+        self.size = pool_size_from_memory(heap_mb=heap_mb) if size is None else size
+        self.heap_mb = heap_mb
+        self.servers = [LanguageToolServer(url) for url in remote_servers]
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._monitor = None
+
+    def start(self):
+        """로컬 서버를 띄우고 응답할 때까지 기다린 뒤 상태 확인 스레드를 시작합니다."""
+        if self.size > 0:
+            java = shutil.which("java")
+            if java is None:
+                raise RuntimeError("java 실행 파일을 찾을 수 없습니다")
+            jar = find_server_jar()
+            for _ in range(self.size):
+                port = free_port()
+                command = [java, f"-Xmx{self.heap_mb}m", "-cp", jar,
+                           "org.languagetool.server.HTTPServer", "--port", str(port), "--allow-origin", "*"]
+                server = LanguageToolServer(f"http://127.0.0.1:{port}", command)
+                server.start()
+                self.servers.append(server)
+            atexit.register(self.close)
+
+        for server in self.servers:
+            if not server.local:
+                server.check_health()
+        pending = [server for server in self.servers if server.local]
+        deadline = time.monotonic() + LT_STARTUP_TIMEOUT
+        while pending and time.monotonic() < deadline:
+            pending = [server for server in pending if not server.check_health()]
+            if pending:
+                time.sleep(1)
+        if not any(server.healthy for server in self.servers):
+            self.close()
+            raise RuntimeError("응답하는 LanguageTool 서버가 없습니다")
+
+        self._monitor = threading.Thread(target=self._monitor_health, name="languagetool-health", daemon=True)
+        self._monitor.start()
+        return self
+
+    def _monitor_health(self):
+        while not self._closed.wait(LT_HEALTH_INTERVAL):
+            for server in self.servers:
+                if server.check_health() or not server.local:
+                    continue
+                # 응답하지 않는 로컬 서버는 다시 띄움 (다음 확인 주기에 건강해지면 다시 사용)
+                record_api_failure("languagetool_server")
+                with self._lock:
+                    in_use = server.inflight
+                if in_use == 0:
+                    server.stop()
+                    server.start()
+
+    def _pick(self, exclude=()):
+        # 로컬 서버 우선, 그중 처리 중인 요청이 가장 적은 서버
+        candidates = [server for server in self.servers if server.healthy and server not in exclude]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda server: (not server.local, server.inflight))
+
+    @contextlib.contextmanager
+    def acquire(self, exclude=()):
+        """가장 한가한 서버를 골라 그 서버의 클라이언트를 빌려줍니다."""
+        with self._lock:
+            server = self._pick(exclude)
+            if server is None:
+                raise RuntimeError("사용 가능한 LanguageTool 서버가 없습니다")
+            server.inflight += 1
+        try:
+            yield server
+        finally:
+            with self._lock:
+                server.inflight -= 1
+
+    def check(self, text, enabled_only=(), disabled=()):
+        """
+        텍스트를 검사합니다. 서버 하나가 실패하면 다른 서버로 한 번 더 시도합니다.
+        enabled_only를 주면 그 규칙들만, disabled를 주면 그 규칙들을 빼고 검사합니다.
+        """
+        failed = []
+        while True:
+            with self.acquire(exclude=failed) as server:
+                try:
+                    return server.client(enabled_only, disabled).check(text)
+                except Exception:
+                    record_api_failure("languagetool_server")
+                    server.healthy = False
+                    failed.append(server)
+                    with self._lock:
+                        retry = len(failed) < 2 and self._pick(failed) is not None
+                    if not retry:
+                        raise
+
+    def status(self):
+        """서버별 상태 (주소, 로컬 여부, 건강 여부, 처리 중인 요청 수) 목록을 반환합니다."""
+        with self._lock:
+            return [
+                {'url': server.url, 'local': server.local, 'healthy': server.healthy, 'inflight': server.inflight}
+                for server in self.servers
+            ]
+
+    def close(self):
+        self._closed.set()
+        for server in self.servers:
+            server.stop()
+
+
+class LocalLanguageTool:
+    """
+    language_tool_python.LanguageTool('en-US')이 직접 띄운 서버 하나를 풀과 같은
+    check(text, enabled_only=..., disabled=...)로 쓰게 하는 래퍼
+    (규칙을 고른 요청은 같은 서버로 보내는 별도 클라이언트를 사용)
+
+    Parameters:
+    - tool: 서버를 띄운 language_tool_python.LanguageTool
+    """
+
+    def __init__(self, tool):
+        self.tool = tool
+        # tool._url은 "http://127.0.0.1:포트/v2/" 형식이고 remote_server에는 "/v2/" 앞부분을 넘김
+        self.server = LanguageToolServer(tool._url.rsplit("/v2/", 1)[0])
+        self.server._clients[(frozenset(), frozenset())] = tool
+
+    def check(self, text, enabled_only=(), disabled=()):
+        return self.server.client(enabled_only, disabled).check(text)
+
+    def close(self):
+        self.tool.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LanguageTool 서버 풀 단독 실행")
+    parser.add_argument("--size", type=int, help="띄울 서버 수 (기본: 메모리 한도로 계산)")
+    parser.add_argument("--heap-mb", type=int, default=LT_HEAP_MB, help="서버 하나의 JVM 최대 힙(MB)")
+    args = parser.parse_args(argv)
+
+    pool = LanguageToolPool(args.size, heap_mb=args.heap_mb).start()
+    urls = ",".join(server.url for server in pool.servers)
+    print(f"ENGCHECK_LT_SERVERS={urls}", flush=True)
+    try:
+        while True:
+            time.sleep(LT_HEALTH_INTERVAL)
+            print(pool.status(), flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
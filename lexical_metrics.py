@@ -0,0 +1,154 @@
+"""
+어휘 다양성 지표를 토큰 흐름 한 번으로 계산하는 모듈
+
+TTR(고유 단어 수 / 전체 단어 수)은 글이 길수록 낮아져 길이가 다른 글끼리 비교할 수
+없습니다. 이 모듈은 길이에 덜 민감한 지표들을 토큰을 한 번 훑으면서 함께 계산합니다.
+
+지표:
+- mattr: 길이 MATTR_WINDOW인 창을 한 단어씩 옮기며 구한 TTR의 평균 (Moving-Average TTR).
+  창의 단어 수를 세는 Counter를 창에 들어오고 나가는 단어만 고쳐 O(1)로 갱신합니다.
+- mtld: TTR이 MTLD_THRESHOLD 아래로 떨어질 때까지의 구간(factor) 평균 길이.
+  앞에서부터와 뒤에서부터 계산한 값의 평균이며, 뒤쪽 계산은 저장해 둔 단어 번호를
+  거꾸로 다시 훑습니다 (텍스트를 다시 토큰화하지 않음).
+- hdd: 글에서 단어 HDD_SAMPLE개를 무작위로 뽑았을 때 기대되는 TTR (초기하분포, HD-D)
+- yules_k: 단어 빈도 분포로 구한 Yule's K (작을수록 다양함)
+- ttr: 기존 TTR (참고용)
+"""
+from collections import Counter, deque
+from math import comb
+
+MATTR_WINDOW = 50
+MTLD_THRESHOLD = 0.72
+HDD_SAMPLE = 42
+
+
+class MTLDState:
+    """MTLD 한 방향 계산 상태"""
+
+    def __init__(self, threshold=MTLD_THRESHOLD):
+        self.threshold = threshold
+        self.factors = 0.0
+        self.seen = set()
+        self.count = 0
+
+    def update(self, word_id):
+        self.seen.add(word_id)
+        self.count += 1
+        if len(self.seen) / self.count <= self.threshold:
+            self.factors += 1
+            self.seen = set()
+            self.count = 0
+
+    def result(self, token_count):
+        factors = self.factors
+        if self.count:
+            # 끝에 남은 구간은 TTR이 기준까지 내려간 정도만큼만 factor로 셈
+            factors += (1 - len(self.seen) / self.count) / (1 - self.threshold)
+        return token_count / factors if factors else float(token_count)
+
+
+class LexicalMetrics:
+    """
+    토큰을 하나씩 받아 어휘 다양성 지표를 누적 계산합니다.
+
+    Parameters:
+    - window: MATTR 창 길이
+    - threshold: MTLD 기준 TTR
+    - sample: HD-D 표본 크기
+    """
+
+    def __init__(self, window=MATTR_WINDOW, threshold=MTLD_THRESHOLD, sample=HDD_SAMPLE):
+        self.window = window
+        self.threshold = threshold
+        self.sample = sample
+        self.word_ids = {}
+        self.ids = []
+        self.frequencies = Counter()
+        self.window_words = deque()
+        self.window_counts = Counter()
+        self.window_ttr_sum = 0.0
+        self.window_steps = 0
+        self.forward = MTLDState(threshold)
+
+    def update(self, token):
+        word_id = self.word_ids.setdefault(token, len(self.word_ids))
+        self.ids.append(word_id)
+        self.frequencies[word_id] += 1
+        self.forward.update(word_id)
+
+        # 창에 새 단어를 넣고, 창이 넘치면 가장 오래된 단어를 뺌
+        self.window_words.append(word_id)
+        self.window_counts[word_id] += 1
+        if len(self.window_words) > self.window:
+            oldest = self.window_words.popleft()
+            self.window_counts[oldest] -= 1
+            if not self.window_counts[oldest]:
+                del self.window_counts[oldest]
+        if len(self.window_words) == self.window:
+            self.window_ttr_sum += len(self.window_counts) / self.window
+            self.window_steps += 1
+        return self
+
+    def extend(self, tokens):
+        for token in tokens:
+            self.update(token)
+        return self
+
+    def hdd(self):
+        token_count = len(self.ids)
+        if not token_count:
+            return 0.0
+        sample = min(self.sample, token_count)
+        total = comb(token_count, sample)
+        # 단어마다 표본에 한 번 이상 나올 확률의 합 / 표본 크기 = 표본의 기대 TTR
+        return sum(1 - comb(token_count - frequency, sample) / total
+                   for frequency in self.frequencies.values()) / sample
+
+    def yules_k(self):
+        token_count = len(self.ids)
+        if not token_count:
+            return 0.0
+        spectrum = Counter(self.frequencies.values())
+        square_sum = sum(frequency * frequency * types for frequency, types in spectrum.items())
+        return 10000 * (square_sum - token_count) / (token_count * token_count)
+
+    def mtld(self):
+        token_count = len(self.ids)
+        if not token_count:
+            return 0.0
+        backward = MTLDState(self.threshold)
+        for word_id in reversed(self.ids):
+            backward.update(word_id)
+        return (self.forward.result(token_count) + backward.result(token_count)) / 2
+
+    def mattr(self):
+        if self.window_steps:
+            return self.window_ttr_sum / self.window_steps
+        # 글이 창보다 짧으면 글 전체의 TTR
+        return len(self.frequencies) / len(self.ids) if self.ids else 0.0
+
+    def result(self):
+        token_count = len(self.ids)
+        return {
+            'token_count': token_count,
+            'type_count': len(self.frequencies),
+            'ttr': len(self.frequencies) / token_count if token_count else 0.0,
+            'mattr': self.mattr(),
+            'mtld': self.mtld(),
+            'hdd': self.hdd(),
+            'yules_k': self.yules_k(),
+        }
+
+
+def lexical_metrics(tokens, window=MATTR_WINDOW, threshold=MTLD_THRESHOLD, sample=HDD_SAMPLE):
+    """
+    토큰 목록의 어휘 다양성 지표를 계산합니다.
+
+    Parameters:
+    - tokens: 소문자 단어 토큰 목록 (또는 iterable)
+    - window, threshold, sample: LexicalMetrics 참고
+
+    Returns:
+    - token_count, type_count, ttr, mattr, mtld, hdd, yules_k 딕셔너리
+    """
+    return LexicalMetrics(window, threshold, sample).extend(tokens).result()
@@ -0,0 +1,302 @@
+"""
+Gramformer 교정 모델의 ONNX Runtime 실행 경로
+
+Gramformer는 PyTorch 모델을 CPU에서 실행하므로(use_gpu=False) 문장당 시간이 길고 모델 가중치를
+올린 프로세스의 메모리도 큽니다. 이 모듈은 같은 seq2seq 교정 모델을 ONNX로 변환해
+onnxruntime으로 실행합니다.
+
+- export_model(): optimum으로 모델을 ONNX로 변환해 <출력 폴더>/fp32에 저장하고,
+  동적 양자화(int8 가중치)한 모델을 <출력 폴더>/int8에 저장합니다.
+- OnnxGramformer: Gramformer와 같은 correct(문장, max_candidates) → 후보 set 계약을 지키며,
+  여러 문장을 한 번에 교정하는 correct_batch()도 제공합니다.
+  intra-op 스레드 수는 ENGCHECK_ONNX_THREADS로 정합니다. 작업 대기열과 엔진 스레드 풀이
+  이미 여러 요청을 동시에 돌리므로 기본값은 코어 수보다 작게 잡습니다.
+- 명령줄:
+    python onnx_corrector.py --export                 # 변환 + 양자화
+    python onnx_corrector.py --parity --threads 1,2,4 # PyTorch 출력과 비교, 스레드 수별 지연 시간/메모리
+
+디코딩 계약: Gramformer.correct는 후보를 샘플링(do_sample=True, num_beams=7)으로 만들어 같은 문장도
+실행마다 결과가 달라질 수 있습니다. ONNX 경로는 이를 따라 하지 않고 탐욕 디코딩(max_candidates가
+1보다 크면 빔 탐색)으로 결정적인 결과를 냅니다. 즉 ENGCHECK_GRAMFORMER_BACKEND=onnx로 바꾸면
+교정 결과는 "Gramformer 모델의 탐욕 디코딩 결과"가 되며, 비교(parity)와
+tests/test_onnx_parity.py는 torch_correct()로 같은 모델을 같은 설정으로 디코딩한 결과를 기준으로 합니다.
+"""
+import argparse
+import os
+import platform
+import re
+import sys
+import time
+
+try:
+    import onnxruntime
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+    has_onnxruntime = True
+except ImportError:
+    has_onnxruntime = False
+
+GRAMFORMER_MODEL = "prithivida/grammar_error_correcter_v1"
+CORRECTION_PREFIX = "gec: "
+MAX_LENGTH = 128
+
+GRAMFORMER_BACKEND = os.environ.get("ENGCHECK_GRAMFORMER_BACKEND", "torch")
+DEFAULT_ONNX_DIR = os.environ.get(
+    "ENGCHECK_GRAMFORMER_ONNX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "gramformer_onnx")
+)
+DEFAULT_ONNX_VARIANT = os.environ.get("ENGCHECK_GRAMFORMER_ONNX_VARIANT", "int8")
+DEFAULT_INTRA_OP_THREADS = int(os.environ.get("ENGCHECK_ONNX_THREADS", str(min(4, os.cpu_count() or 1))))
+DEFAULT_BATCH_SIZE = 8
+PARITY_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "corpus", "medium.txt")
+
+
+def model_dir(variant=DEFAULT_ONNX_VARIANT, base_dir=DEFAULT_ONNX_DIR):
+    """변환한 모델 폴더 경로 (variant: 'fp32' 또는 'int8')"""
+    return os.path.join(base_dir, variant)
+
+
+def onnx_model_available(variant=DEFAULT_ONNX_VARIANT, base_dir=DEFAULT_ONNX_DIR):
+    """변환한 모델이 있는지 확인합니다."""
+    directory = model_dir(variant, base_dir)
+    return (os.path.exists(os.path.join(directory, "config.json"))
+            and any(name.endswith(".onnx") for name in os.listdir(directory)))
+
+
+def session_options(threads=DEFAULT_INTRA_OP_THREADS):
+    """스레드 수를 고정한 onnxruntime 세션 설정"""
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = threads
+    # 디코더는 연산이 순서대로 이어지므로 연산 간 병렬 실행은 이득이 없음
+    options.inter_op_num_threads = 1
+    options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return options
+
+
+def generation_kwargs(max_candidates=1):
+    """ONNX와 PyTorch 비교 모두에 쓰는 결정적 생성 설정"""
+    return {
+        'max_length': MAX_LENGTH,
+        'num_beams': max(1, max_candidates),
+        'num_return_sequences': max_candidates,
+        'do_sample': False,
+        'early_stopping': max_candidates > 1,
+    }
+
+
+def torch_correct(model, tokenizer, input_sentence, max_candidates=1):
+    """
+    PyTorch 교정 모델을 ONNX 경로와 같은 결정적 설정으로 디코딩합니다.
+
+    Parameters:
+    - model, tokenizer: 교정 모델과 토크나이저 (Gramformer의 correction_model/correction_tokenizer 등)
+    - input_sentence: 교정할 문장
+    - max_candidates: 후보 수
+    Returns:
+    - Gramformer.correct와 같은 교정 후보 set
+    """
+    import torch
+
+    inputs = tokenizer([CORRECTION_PREFIX + input_sentence], return_tensors="pt")
+    with torch.no_grad():
+        outputs = model.generate(**inputs, **generation_kwargs(max_candidates))
+    return {candidate.strip() for candidate in tokenizer.batch_decode(outputs, skip_special_tokens=True)}
+
+
+def quantization_config():
+    """현재 CPU에 맞는 동적 양자화 설정"""
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return AutoQuantizationConfig.arm64(is_static=False, per_channel=False)
+    return AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+
+
+def export_model(model_name=GRAMFORMER_MODEL, base_dir=DEFAULT_ONNX_DIR, quantize=True):
+    """
+    교정 모델을 ONNX로 변환해 저장합니다.
+
+    Parameters:
+    - model_name: Hugging Face 모델 이름 (Gramformer가 쓰는 교정 모델)
+    - base_dir: 저장할 폴더 (fp32, int8 하위 폴더를 만듦)
+    - quantize: True이면 동적 양자화한 모델도 저장
+
+    Returns:
+    - 저장한 모델 폴더 경로 목록
+    """
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True)
+    fp32_dir = model_dir("fp32", base_dir)
+    model.save_pretrained(fp32_dir)
+    tokenizer.save_pretrained(fp32_dir)
+    saved = [fp32_dir]
+
+    if quantize:
+        int8_dir = model_dir("int8", base_dir)
+        # 설정/토크나이저 파일을 복사한 뒤 .onnx 파일만 같은 이름의 양자화 모델로 덮어씀
+        model.save_pretrained(int8_dir)
+        tokenizer.save_pretrained(int8_dir)
+        config = quantization_config()
+        for file_name in sorted(os.listdir(fp32_dir)):
+            if file_name.endswith(".onnx"):
+                quantizer = ORTQuantizer.from_pretrained(fp32_dir, file_name=file_name)
+                quantizer.quantize(save_dir=int8_dir, quantization_config=config, file_suffix="")
+        saved.append(int8_dir)
+    return saved
+
+
+class OnnxGramformer:
+    """
+    Gramformer와 같은 방식으로 쓰는 ONNX Runtime 교정 모델
+
+    Parameters:
+    - directory: export_model()로 저장한 모델 폴더
+    - threads: intra-op 스레드 수
+    - batch_size: correct_batch()가 한 번에 생성하는 문장 수
+    """
+
+    def __init__(self, directory=None, threads=DEFAULT_INTRA_OP_THREADS, batch_size=DEFAULT_BATCH_SIZE):
+        self.directory = directory or model_dir()
+        self.threads = threads
+        self.batch_size = batch_size
+        self.tokenizer = AutoTokenizer.from_pretrained(self.directory)
+        self.model = ORTModelForSeq2SeqLM.from_pretrained(
+            self.directory, session_options=session_options(threads), provider="CPUExecutionProvider"
+        )
+        # 문장 메모 키에 쓰는 버전 (모델 종류나 onnxruntime 버전이 바뀌면 이전 결과를 쓰지 않음)
+        self.version = f"onnx-{os.path.basename(os.path.normpath(self.directory))}-{onnxruntime.__version__}"
+
+    def correct(self, input_sentence, max_candidates=1):
+        """Gramformer.correct와 같이 교정 후보 set을 반환합니다."""
+        return set(self.correct_batch([input_sentence], max_candidates)[0])
+
+    def correct_batch(self, sentences, max_candidates=1):
+        """
+        여러 문장을 batch_size개씩 묶어 교정합니다.
+
+        Returns:
+        - 입력과 같은 순서의 후보 목록 (문장마다 max_candidates개)
+        """
+        results = []
+        for start in range(0, len(sentences), self.batch_size):
+            batch = sentences[start:start + self.batch_size]
+            inputs = self.tokenizer([CORRECTION_PREFIX + sentence for sentence in batch],
+                                    return_tensors="pt", padding=True)
+            outputs = self.model.generate(**inputs, **generation_kwargs(max_candidates))
+            decoded = self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+            for index in range(len(batch)):
+                results.append([candidate.strip() for candidate
+                                in decoded[index * max_candidates:(index + 1) * max_candidates]])
+        return results
+
+
+def resident_memory_mb():
+    """현재 프로세스의 상주 메모리(MB) (/proc가 없으면 None)"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def parity_sentences(path=PARITY_CORPUS, limit=50):
+    """비교에 쓸 문장 목록 (말뭉치 파일을 문장 부호 기준으로 나눔)"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    sentences = [sentence.strip() for sentence in re.split(r"(?<=[.!?])\s+|\n+", text) if sentence.strip()]
+    return list(dict.fromkeys(sentences))[:limit]
+
+
+def torch_corrections(sentences, model_name=GRAMFORMER_MODEL):
+    """같은 생성 설정의 PyTorch 모델 결과와 문장당 시간, 모델을 올리며 늘어난 메모리"""
+    from transformers import AutoModelForSeq2SeqLM
+
+    before = resident_memory_mb()
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name).eval()
+    loaded = resident_memory_mb()
+    started = time.perf_counter()
+    corrections = [next(iter(torch_correct(model, tokenizer, sentence))) for sentence in sentences]
+    seconds = (time.perf_counter() - started) / max(1, len(sentences))
+    memory = loaded - before if before is not None and loaded is not None else None
+    return corrections, seconds, memory
+
+
+def onnx_corrections(sentences, directory, threads):
+    """ONNX 모델 결과와 문장당 시간, 모델을 올리며 늘어난 메모리"""
+    before = resident_memory_mb()
+    corrector = OnnxGramformer(directory, threads=threads)
+    loaded = resident_memory_mb()
+    started = time.perf_counter()
+    corrections = [next(iter(corrector.correct(sentence))) for sentence in sentences]
+    seconds = (time.perf_counter() - started) / max(1, len(sentences))
+    memory = loaded - before if before is not None and loaded is not None else None
+    return corrections, seconds, memory
+
+
+def format_memory(memory):
+    return f"{memory:.0f}MB" if memory is not None else "-"
+
+
+def run_parity(sentences, variants, thread_counts, min_match):
+    """
+    PyTorch 결과와 ONNX 결과를 비교해 출력합니다.
+
+    Returns:
+    - 모든 모델의 일치율이 min_match 이상이면 0, 아니면 1
+    """
+    # 메모리 증가량을 모델마다 따로 보려고 ONNX 모델을 먼저 올림
+    results = {}
+    for variant in variants:
+        for threads in thread_counts:
+            results[(variant, threads)] = onnx_corrections(sentences, model_dir(variant), threads)
+    reference, torch_seconds, torch_memory = torch_corrections(sentences)
+    print(f"문장 {len(sentences)}개")
+    print(f"{'pytorch':<16} {torch_seconds * 1000:8.1f}ms/문장  메모리 +{format_memory(torch_memory)}")
+
+    status = 0
+    for (variant, threads), (corrections, seconds, memory) in results.items():
+        matches = sum(a == b for a, b in zip(reference, corrections))
+        match_rate = matches / max(1, len(sentences))
+        print(f"{variant + ' x' + str(threads):<16} {seconds * 1000:8.1f}ms/문장  메모리 +{format_memory(memory)}  "
+              f"일치 {matches}/{len(sentences)} ({match_rate:.0%})")
+        for sentence, expected, actual in zip(sentences, reference, corrections):
+            if expected != actual:
+                print(f"  - {sentence!r}\n    pytorch: {expected!r}\n    onnx:    {actual!r}")
+        if match_rate < min_match:
+            status = 1
+    return status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gramformer 교정 모델 ONNX 변환/비교")
+    parser.add_argument("--export", action="store_true", help="모델을 ONNX로 변환하고 양자화")
+    parser.add_argument("--no-quantize", action="store_true", help="변환할 때 양자화 모델은 만들지 않음")
+    parser.add_argument("--parity", action="store_true", help="PyTorch 출력과 비교하고 지연 시간/메모리 측정")
+    parser.add_argument("--variants", default="fp32,int8", help="비교할 모델 (쉼표로 구분)")
+    parser.add_argument("--threads", default=str(DEFAULT_INTRA_OP_THREADS), help="비교할 intra-op 스레드 수 (쉼표로 구분)")
+    parser.add_argument("--sentences", default=PARITY_CORPUS, help="비교에 쓸 말뭉치 파일")
+    parser.add_argument("--limit", type=int, default=50, help="비교할 최대 문장 수")
+    parser.add_argument("--min-match", type=float, default=0.9, help="통과로 볼 최소 일치율")
+    args = parser.parse_args(argv)
+
+    if not has_onnxruntime:
+        print("onnxruntime과 optimum이 필요합니다: pip install -r requirements-onnx.txt")
+        return 1
+
+    if args.export:
+        for directory in export_model(quantize=not args.no_quantize):
+            print(f"저장했습니다: {directory}")
+    if args.parity:
+        variants = [variant for variant in args.variants.split(",") if onnx_model_available(variant)]
+        if not variants:
+            print(f"변환한 모델이 없습니다. 먼저 --export를 실행하세요 ({DEFAULT_ONNX_DIR})")
+            return 1
+        thread_counts = [int(threads) for threads in args.threads.split(",")]
+        return run_parity(parity_sentences(args.sentences, args.limit), variants, thread_counts, args.min_match)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,368 @@
+"""
+의존 구문 분석(spaCy) 기반 문법 규칙
+
+정규식으로는 "주어가 무엇이고 그 주어의 동사가 어느 것인지"를 알 수 없어서 주어-동사 일치,
+be 동사 누락, 주어 누락 같은 구조적 규칙이 엉뚱한 곳에서 잡히기 쉽습니다. 이 모듈은
+문장을 작은 spaCy 모델로 한 번 분석한 뒤, 토큰을 한 번 순회하면서 다음 규칙을 함께 검사합니다.
+
+- 주어-동사 일치 (He go → He goes, They is → They are)
+- 관사 a/an (a apple → an apple, an book → a book), 단수 관사 + 복수 명사
+- 한정사/수량 표현과 명사의 수 (one books → one book, many book → many books)
+- 과거 시간 표현과 현재 시제 (Yesterday I go → Yesterday I went)
+- 진행형 be 동사 누락 (I going → I am going)
+- 주어 누락 (Is very good. → It is very good.)
+
+문장은 nlp.pipe로 묶어서 분석하며, 필요 없는 파이프(ner 등)는 불러오지 않습니다.
+분석 결과(Doc)는 프로세스 전체에서 공유하는 LRU 캐시에 문장 단위로 저장됩니다.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from instrumentation import record_cache, record_engine_start
+
+SPACY_MODEL = os.environ.get("ENGCHECK_SPACY_MODEL", "en_core_web_sm")
+SPACY_BATCH_SIZE = int(os.environ.get("ENGCHECK_SPACY_BATCH_SIZE", "64"))
+PARSE_CACHE_SIZE = int(os.environ.get("ENGCHECK_PARSE_CACHE_SIZE", "4096"))
+
+# 규칙에 필요한 것은 태그, 형태 정보, 의존 관계, 원형뿐
+EXCLUDED_PIPES = ["ner", "textcat", "textcat_multilabel", "entity_ruler", "entity_linker", "senter"]
+
+SUBJECT_DEPS = {"nsubj", "nsubjpass", "csubj", "csubjpass", "expl"}
+FIRST_PERSON = {"i"}
+PLURAL_PRONOUNS = {"you", "we", "they", "these", "those"}
+SINGULAR_PRONOUNS = {"he", "she", "it", "this", "that", "everyone", "everybody", "someone",
+                     "somebody", "nobody", "anyone", "anybody", "each"}
+
+# 모음 글자로 시작하지만 자음 소리로 읽는 단어 / 자음 글자로 시작하지만 모음 소리로 읽는 단어
+CONSONANT_SOUND_PREFIXES = ("uni", "use", "usu", "uti", "ure", "eu", "one", "once", "ewe")
+VOWEL_SOUND_PREFIXES = ("hour", "honest", "honor", "honour", "heir")
+# 'a few', 'a lot of' 처럼 관사 뒤에 복수 명사가 와도 되는 표현
+ARTICLE_QUANTIFIERS = {"few", "lot", "lots", "couple", "number", "dozen", "hundred", "thousand",
+                       "million", "great", "good", "variety", "pair", "series"}
+
+# 명사 앞에서 수를 정하는 단어 (관사 a/an은 PARSE_ARTICLE_AN/PARSE_ARTICLE_PLURAL에서 따로 검사)
+SINGULAR_DETERMINERS = {"one", "each", "every", "this", "that", "another"}
+PLURAL_DETERMINERS = {"many", "several", "few", "these", "those", "both", "two", "three", "four", "five",
+                      "six", "seven", "eight", "nine", "ten"}
+IRREGULAR_PLURALS = {
+    "man": "men", "woman": "women", "child": "children", "person": "people", "foot": "feet",
+    "tooth": "teeth", "mouse": "mice", "goose": "geese", "knife": "knives", "leaf": "leaves",
+    "life": "lives", "wife": "wives", "half": "halves", "shelf": "shelves", "wolf": "wolves",
+    "potato": "potatoes", "tomato": "tomatoes", "hero": "heroes",
+}
+IRREGULAR_SINGULARS = {plural: singular for singular, plural in IRREGULAR_PLURALS.items()}
+
+PAST_TIME_WORDS = {"yesterday", "ago"}
+PAST_TIME_AFTER_LAST = {"night", "week", "weekend", "month", "year", "summer", "winter", "spring",
+                        "fall", "autumn", "semester", "time", "monday", "tuesday", "wednesday",
+                        "thursday", "friday", "saturday", "sunday"}
+
+IRREGULAR_PAST = {
+    "be": "was", "have": "had", "do": "did", "go": "went", "come": "came", "eat": "ate",
+    "drink": "drank", "sleep": "slept", "wake": "woke", "see": "saw", "drive": "drove",
+    "get": "got", "make": "made", "take": "took", "give": "gave", "buy": "bought",
+    "bring": "brought", "think": "thought", "teach": "taught", "catch": "caught",
+    "find": "found", "feel": "felt", "keep": "kept", "leave": "left", "meet": "met",
+    "run": "ran", "say": "said", "tell": "told", "sit": "sat", "stand": "stood",
+    "swim": "swam", "write": "wrote", "read": "read", "ride": "rode", "speak": "spoke",
+    "begin": "began", "know": "knew", "grow": "grew", "fly": "flew", "draw": "drew",
+    "win": "won", "lose": "lost", "spend": "spent", "send": "sent", "build": "built",
+    "put": "put", "cut": "cut", "hit": "hit", "let": "let", "set": "set", "become": "became",
+    "choose": "chose", "fall": "fell", "forget": "forgot", "hear": "heard", "hold": "held",
+    "pay": "paid", "sell": "sold", "sing": "sang", "understand": "understood", "wear": "wore",
+}
+
+
+class ParseCache:
+    """문장 → spaCy Doc을 저장하는 스레드 안전 LRU 캐시"""
+
+    def __init__(self, maxsize=PARSE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._docs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sentence):
+        with self._lock:
+            doc = self._docs.get(sentence)
+            if doc is not None:
+                self._docs.move_to_end(sentence)
+        record_cache("spacy_parse", doc is not None)
+        return doc
+
+    def put(self, sentence, doc):
+        with self._lock:
+            self._docs[sentence] = doc
+            self._docs.move_to_end(sentence)
+            while len(self._docs) > self.maxsize:
+                self._docs.popitem(last=False)
+
+
+parse_cache = ParseCache()
+
+
+def load_parser(model=SPACY_MODEL):
+    """
+    규칙에 필요한 파이프만 켠 spaCy 모델을 불러옵니다.
+    모델이 설치되어 있지 않으면 OSError가 발생합니다.
+    """
+    import spacy
+    record_engine_start("spacy")
+    return spacy.load(model, exclude=EXCLUDED_PIPES)
+
+
+def parse_sentences(nlp, sentences, batch_size=SPACY_BATCH_SIZE):
+    """
+    문장 목록을 분석해 같은 순서의 Doc 목록을 반환합니다.
+    캐시에 없는 문장만 중복 없이 모아 nlp.pipe로 한 번에 분석합니다.
+    """
+    docs = [parse_cache.get(sentence) for sentence in sentences]
+    missing = list(dict.fromkeys(sentence for sentence, doc in zip(sentences, docs) if doc is None))
+    if missing:
+        parsed = dict(zip(missing, nlp.pipe(missing, batch_size=batch_size)))
+        for sentence, doc in parsed.items():
+            parse_cache.put(sentence, doc)
+        docs = [doc if doc is not None else parsed[sentence] for sentence, doc in zip(sentences, docs)]
+    return docs
+
+
+# 주어의 인칭/수: 'first'(I), 'singular', 'plural' 또는 판단 불가(None)
+def subject_number(subject):
+    lower = subject.lower_
+    if lower in FIRST_PERSON:
+        return "first"
+    if lower in PLURAL_PRONOUNS:
+        return "plural"
+    if lower in SINGULAR_PRONOUNS:
+        return "singular"
+    if any(child.dep_ == "conj" for child in subject.children):
+        return "plural"
+    if subject.tag_ in ("NNS", "NNPS"):
+        return "plural"
+    if subject.tag_ in ("NN", "NNP"):
+        return "singular"
+    return None
+
+
+def present_be(number):
+    return {"first": "am", "singular": "is"}.get(number, "are")
+
+
+def third_person_singular(lemma):
+    irregular = {"be": "is", "have": "has", "do": "does", "go": "goes"}
+    if lemma in irregular:
+        return irregular[lemma]
+    if lemma.endswith(("s", "sh", "ch", "x", "z", "o")):
+        return lemma + "es"
+    if len(lemma) > 1 and lemma.endswith("y") and lemma[-2] not in "aeiou":
+        return lemma[:-1] + "ies"
+    return lemma + "s"
+
+
+def plural_noun(noun):
+    lower = noun.lower()
+    if lower in IRREGULAR_PLURALS:
+        return match_case(IRREGULAR_PLURALS[lower], noun)
+    if lower.endswith(("s", "sh", "ch", "x", "z")):
+        return noun + "es"
+    if len(lower) > 1 and lower.endswith("y") and lower[-2] not in "aeiou":
+        return noun[:-1] + "ies"
+    return noun + "s"
+
+
+def singular_noun(noun):
+    lower = noun.lower()
+    if lower in IRREGULAR_SINGULARS:
+        return match_case(IRREGULAR_SINGULARS[lower], noun)
+    if lower.endswith("ies") and len(noun) > 3:
+        return noun[:-3] + "y"
+    if lower.endswith(("ses", "shes", "ches", "xes", "zes")):
+        return noun[:-2]
+    if lower.endswith("s") and not lower.endswith("ss"):
+        return noun[:-1]
+    return noun
+
+
+def past_tense(lemma, number=None):
+    if lemma == "be":
+        return "were" if number == "plural" else "was"
+    if lemma in IRREGULAR_PAST:
+        return IRREGULAR_PAST[lemma]
+    if lemma.endswith("e"):
+        return lemma + "d"
+    if len(lemma) > 1 and lemma.endswith("y") and lemma[-2] not in "aeiou":
+        return lemma[:-1] + "ied"
+    return lemma + "ed"
+
+
+def match_case(word, like):
+    return word[:1].upper() + word[1:] if like[:1].isupper() else word
+
+
+def starts_with_vowel_sound(word):
+    lower = word.lower()
+    if lower.startswith(VOWEL_SOUND_PREFIXES):
+        return True
+    if lower.startswith(CONSONANT_SOUND_PREFIXES):
+        return False
+    return lower[:1] in "aeiou"
+
+
+# 동사에 걸린 주어 토큰 (없으면 None)
+def find_subject(verb):
+    for child in verb.children:
+        if child.dep_ in SUBJECT_DEPS:
+            return child
+    return None
+
+
+# 시제와 일치를 결정하는 정동사 (조동사가 있으면 첫 조동사)
+def finite_verb(verb):
+    for child in verb.children:
+        if child.dep_ in ("aux", "auxpass") and child.i < verb.i:
+            return child
+    return verb
+
+
+def has_past_time_marker(doc):
+    for token in doc:
+        if token.lower_ in PAST_TIME_WORDS:
+            return True
+        if token.lower_ == "last" and token.i + 1 < len(doc) and doc[token.i + 1].lower_ in PAST_TIME_AFTER_LAST:
+            return True
+    return False
+
+
+def check_doc(doc, base_offset=0):
+    """
+    분석된 문장 하나에 모든 규칙을 적용해 오류 목록을 반환합니다.
+
+    Parameters:
+    - doc: 문장 하나의 spaCy Doc
+    - base_offset: 원래 글에서 이 문장이 시작하는 위치
+
+    Returns:
+    - 오류 정보 딕셔너리 목록
+    """
+    errors = []
+    sentence = doc.text
+
+    def add(start_token, end_token, message, replacements, rule):
+        start = start_token.idx
+        end = end_token.idx + len(end_token.text)
+        errors.append({
+            'message': message,
+            'offset': base_offset + start,
+            'length': end - start,
+            'replacements': replacements,
+            'rule': rule,
+            'context': sentence
+        })
+
+    past_context = has_past_time_marker(doc)
+    is_question = sentence.rstrip().endswith("?")
+
+    for token in doc:
+        # 관사 a/an
+        if token.lower_ in ("a", "an") and token.dep_ == "det" and token.i + 1 < len(doc):
+            following = doc[token.i + 1]
+            word = following.text
+            if word[:1].isalpha() and not (word.isupper() and len(word) > 1):
+                expected = "an" if starts_with_vowel_sound(word) else "a"
+                if token.lower_ != expected:
+                    add(token, following,
+                        f"'{word}' 앞에는 '{expected}'를 사용해야 합니다",
+                        [f"{match_case(expected, token.text)} {word}"], 'PARSE_ARTICLE_AN')
+                elif token.head.tag_ in ("NNS", "NNPS") and following.lower_ not in ARTICLE_QUANTIFIERS:
+                    add(token, token.head,
+                        f"복수 명사 '{token.head.text}' 앞에는 '{token.text}'를 쓸 수 없습니다",
+                        [doc[token.i + 1:token.head.i + 1].text], 'PARSE_ARTICLE_PLURAL')
+
+        # 한정사/수량 표현과 명사의 수: "one books", "many book" (명사에 걸린 경우만 보므로 "This is"는 제외)
+        head = token.head
+        if token.dep_ in ("det", "nummod", "amod") and head.pos_ == "NOUN" and head.i > token.i:
+            inflected = form = None
+            if token.lower_ in SINGULAR_DETERMINERS and head.tag_ == "NNS":
+                inflected, form = singular_noun(head.text), "단수형"
+            elif token.lower_ in PLURAL_DETERMINERS and head.tag_ == "NN":
+                inflected, form = plural_noun(head.text), "복수형"
+            if inflected and inflected != head.text:
+                add(token, head, f"'{token.text}' 뒤에는 {form}을 사용해야 합니다",
+                    [doc[token.i:head.i].text_with_ws + inflected], 'PARSE_NOUN_NUMBER')
+
+        if token.pos_ not in ("VERB", "AUX") or token.dep_ in ("aux", "auxpass"):
+            continue
+
+        subject = find_subject(token)
+        finite = finite_verb(token)
+        number = subject_number(subject) if subject is not None else None
+        lemma = finite.lemma_.lower()
+
+        # 진행형 be 동사 누락: "I going", "She reading"
+        if token.tag_ == "VBG" and subject is not None and finite is token and token.dep_ == "ROOT":
+            if number is not None:
+                add(subject, token, "진행형에서 be 동사가 필요합니다",
+                    [f"{subject.text} {present_be(number)} {token.text}"], 'PARSE_MISSING_BE')
+            continue
+
+        # 주어 누락: "Is very good.", "Went to school yesterday."
+        if token.dep_ == "ROOT" and subject is None and finite.tag_ in ("VBZ", "VBD", "VBP") \
+                and not is_question and finite.i == doc[0].i:
+            if lemma == "be":
+                replacements = [f"It {finite.lower_}"]
+            else:
+                replacements = [f"I {finite.lower_}"]
+            add(finite, finite, "문장에 주어가 필요합니다", replacements, 'PARSE_MISSING_SUBJECT')
+            continue
+
+        # 과거 시간 표현 + 현재 시제
+        if past_context and finite.tag_ in ("VBZ", "VBP") and token.dep_ in ("ROOT", "conj"):
+            past = past_tense(lemma, number)
+            add(finite, finite, "과거를 나타내는 표현이 있으므로 과거형 동사를 사용해야 합니다",
+                [match_case(past, finite.text)], 'PARSE_PAST_TENSE')
+            continue
+
+        # 주어-동사 일치
+        if subject is None or number is None:
+            continue
+        suggestion = None
+        if finite.tag_ == "VBZ" and number in ("plural", "first"):
+            suggestion = present_be(number) if lemma == "be" else lemma
+        elif finite.tag_ == "VBP":
+            if number == "singular":
+                suggestion = third_person_singular(lemma)
+            elif number == "first" and lemma == "be" and finite.lower_ != "am":
+                suggestion = "am"
+            elif number == "plural" and finite.lower_ == "am":
+                suggestion = "are"
+        elif finite.tag_ == "VBD" and lemma == "be":
+            subjunctive = any(child.dep_ == "mark" and child.lower_ == "if" for child in token.children)
+            if finite.lower_ == "was" and number == "plural":
+                suggestion = "were"
+            elif finite.lower_ == "were" and number in ("singular", "first") and not subjunctive:
+                suggestion = "was"
+        if suggestion and suggestion != finite.lower_:
+            add(finite, finite,
+                f"주어 '{subject.text}'에 맞는 동사 형태는 '{suggestion}'입니다",
+                [match_case(suggestion, finite.text)], 'PARSE_SUBJECT_VERB_AGREEMENT')
+
+    return errors
+
+
+def check_parse_rules(nlp, text, sentence_spans):
+    """
+    글 전체에 구문 분석 규칙을 적용합니다.
+
+    Parameters:
+    - nlp: load_parser()로 불러온 spaCy 모델
+    - text: 원본 텍스트
+    - sentence_spans: (시작, 끝, ...) 형식의 문장 위치 목록
+
+    Returns:
+    - 오류 정보 딕셔너리 목록 (위치는 원래 글 기준)
+    """
+    sentences = [text[start:end] for start, end, *_ in sentence_spans]
+    errors = []
+    for (start, *_), doc in zip(sentence_spans, parse_sentences(nlp, sentences)):
+        errors.extend(check_doc(doc, start))
+    return errors
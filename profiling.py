@@ -0,0 +1,252 @@
+"""
+분석 한 건을 프로파일링하는 모듈
+
+특정 글 하나가 왜 느렸는지 확인할 때만 명시적으로 켜서 사용합니다 (일반 요청에는 영향 없음).
+profile_run() 블록 안의 실행을 두 가지 방식으로 동시에 기록합니다.
+
+- cProfile: 함수별 누적/자체 시간 상위 N개 표 (.txt)와 pstats 원본 (.prof, snakeviz 등으로 열람)
+- 샘플링 프로파일러: 일정 간격으로 호출 스택을 수집해 flame graph용 folded stack (.folded)으로 저장
+  (flamegraph.pl, speedscope, inferno 등에서 바로 열 수 있음)
+
+검사 엔진과 조각 검사는 스레드 풀에서 실행되므로, 풀에 넘기는 작업을 profile_worker()로 감싸면
+profile_run 블록이 열려 있는 동안 그 작업도 같은 기록에 들어갑니다. 작업 스레드의 cProfile 결과는
+블록이 끝날 때 합쳐지고, 샘플링한 스택은 맨 바깥에 스레드 이름(grammar-engine_0 등)을 붙여 구분합니다.
+
+모든 출력 파일 머리에는 텍스트 길이와 사용한 검사 엔진이 함께 기록됩니다.
+"""
+import contextlib
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+DEFAULT_PROFILE_DIR = os.environ.get(
+    "ENGCHECK_PROFILE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "profiles")
+)
+DEFAULT_TOP_N = 30
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+# 현재 context에서 진행 중인 profile_run (작업 스레드에는 contextvars.copy_context()로 전달됨)
+_active_session = contextvars.ContextVar("engcheck_profile_session", default=None)
+
+
+class StackSampler:
+    """
+    대상 스레드의 호출 스택을 일정 간격으로 수집하는 샘플링 프로파일러
+
+    Parameters:
+    - thread_id: 샘플링할 스레드 ID (threading.get_ident() 값)
+    - interval: 샘플링 간격(초)
+    """
+
+    def __init__(self, thread_id, interval=DEFAULT_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        # 작업 중인 동안만 함께 샘플링할 작업 스레드 ID → 스레드 이름
+        self.workers = {}
+        self.worker_names = set()
+        self._workers_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def add_worker(self, thread_id, name):
+        """작업 스레드를 샘플링 대상에 넣습니다. 이미 대상이면 False를 반환합니다."""
+        with self._workers_lock:
+            if thread_id == self.thread_id or thread_id in self.workers:
+                return False
+            self.workers[thread_id] = name
+            self.worker_names.add(name)
+            return True
+
+    def remove_worker(self, thread_id):
+        with self._workers_lock:
+            self.workers.pop(thread_id, None)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._workers_lock:
+                targets = [(self.thread_id, None), *self.workers.items()]
+            for thread_id, thread_name in targets:
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                if thread_name is not None:
+                    stack.append(thread_name)
+                # folded stack 형식은 바깥 호출부터 안쪽 순서
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def folded(self):
+        """flame graph 도구가 읽는 "스택 샘플수" 형식의 문자열을 반환합니다."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileSession:
+    """profile_run 한 번에 작업 스레드가 더하는 cProfile 기록"""
+
+    def __init__(self, sampler):
+        self.sampler = sampler
+        self.profilers = []
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def add_profiler(self, profiler):
+        # 블록이 끝난 뒤에 끝난 작업(시간 예산을 넘긴 엔진 등)은 버림
+        with self._lock:
+            if not self.closed:
+                self.profilers.append(profiler)
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            return list(self.profilers)
+
+
+@contextlib.contextmanager
+def profile_worker():
+    """
+    스레드 풀에서 실행하는 작업을 진행 중인 profile_run 기록에 넣습니다.
+    profile_run 블록 안에서 contextvars.copy_context()로 넘긴 작업이어야 하며,
+    프로파일링 중이 아니거나 profile_run을 연 스레드에서 바로 실행되면 아무것도 하지 않습니다.
+    """
+    session = _active_session.get()
+    thread = threading.current_thread()
+    if session is None or not session.sampler.add_worker(thread.ident, thread.name):
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        session.sampler.remove_worker(thread.ident)
+        session.add_profiler(profiler)
+
+
+# pstats에서 상위 N개 함수 행을 추출
+def top_functions(stats, top_n=DEFAULT_TOP_N, sort_by="cumulative"):
+    stats.sort_stats(sort_by)
+    rows = []
+    for func in stats.fcn_list[:top_n]:
+        primitive_calls, total_calls, self_time, cumulative_time, _ = stats.stats[func]
+        filename, line, name = func
+        rows.append({
+            'function': f"{os.path.basename(filename)}:{line}({name})",
+            'calls': total_calls,
+            'self_seconds': self_time,
+            'cumulative_seconds': cumulative_time,
+        })
+    return rows
+
+
+def format_top_table(rows, tags):
+    """태그 머리말과 상위 함수 표를 사람이 읽기 쉬운 텍스트로 만듭니다."""
+    lines = [f"# {key}: {value}" for key, value in tags.items()]
+    lines.append("")
+    lines.append(f"{'누적(s)':>10} {'자체(s)':>10} {'호출 수':>10}  함수")
+    for row in rows:
+        lines.append(f"{row['cumulative_seconds']:10.4f} {row['self_seconds']:10.4f} {row['calls']:10d}  {row['function']}")
+    return "\n".join(lines) + "\n"
+
+
+@contextlib.contextmanager
+def profile_run(label, text_length=None, engines=(), output_dir=DEFAULT_PROFILE_DIR,
+                top_n=DEFAULT_TOP_N, sample_interval=DEFAULT_SAMPLE_INTERVAL, analysis_profile=None):
+    """
+    블록 안의 실행을 프로파일링하고 결과 파일을 저장합니다.
+    블록은 분석을 실행하는 스레드에서 열어야 하며, 다른 스레드의 작업은 profile_worker()로 감싼 것만 기록됩니다.
+
+    사용 예:
+        with profile_run("check_grammar", len(text), engines) as report:
+            check_grammar(text)
+        report['paths']  # {'table': ..., 'folded': ..., 'pstats': ...}
+
+    Parameters:
+    - label: 프로파일 이름 (파일 이름에 사용)
+    - text_length: 분석한 텍스트 길이 (태그로 기록)
+    - engines: 사용한 검사 엔진 이름 목록 (태그로 기록)
+    - analysis_profile: 문법 검사에 쓴 분석 프로파일 이름 (태그로 기록)
+    - output_dir: 결과 파일을 저장할 디렉터리
+    - top_n: 표에 넣을 함수 수
+    - sample_interval: 샘플링 간격(초)
+
+    Returns:
+    - report 딕셔너리 (블록이 끝나면 elapsed, top, paths가 채워짐)
+    """
+    report = {
+        'tags': {
+            'label': label,
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'text_length': text_length,
+            'analysis_profile': analysis_profile or "-",
+            'engines': ",".join(engines) or "-",
+        }
+    }
+    sampler = StackSampler(threading.get_ident(), sample_interval)
+    session = ProfileSession(sampler)
+    profiler = cProfile.Profile()
+
+    sampler.start()
+    token = _active_session.set(session)
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield report
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - start
+        _active_session.reset(token)
+        worker_profilers = session.close()
+        sampler.stop()
+
+        stats = pstats.Stats(profiler)
+        for worker_profiler in worker_profilers:
+            stats.add(worker_profiler)
+        report['tags']['elapsed_seconds'] = round(elapsed, 4)
+        report['tags']['samples'] = sum(sampler.stacks.values())
+        report['tags']['worker_threads'] = ",".join(sorted(sampler.worker_names)) or "-"
+        report['elapsed'] = elapsed
+        report['top'] = top_functions(stats, top_n)
+
+        os.makedirs(output_dir, exist_ok=True)
+        safe_label = re.sub(r'[^\w.-]+', '_', label)
+        base = os.path.join(output_dir, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{safe_label}")
+        paths = {'table': base + ".txt", 'folded': base + ".folded", 'pstats': base + ".prof"}
+
+        with open(paths['table'], "w", encoding="utf-8") as f:
+            f.write(format_top_table(report['top'], report['tags']))
+        with open(paths['folded'], "w", encoding="utf-8") as f:
+            f.write(sampler.folded())
+        stats.dump_stats(paths['pstats'])
+        report['paths'] = paths
+
+
+def render_report(report):
+    """report의 상위 함수 표를 문자열로 반환합니다 (콘솔 출력용)."""
+    buffer = io.StringIO()
+    buffer.write(format_top_table(report.get('top', []), report['tags']))
+    for kind, path in report.get('paths', {}).items():
+        buffer.write(f"{kind}: {path}\n")
+    return buffer.getvalue()
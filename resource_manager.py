@@ -0,0 +1,212 @@
+"""
+세션별 메모리와 임시 파일 수명 관리
+
+하루 종일 여러 학생이 접속하면 세션마다 쌓이는 음성 파일 경로/재생 상태와 임시 음성,
+내보내기 파일이 지워지지 않아 서버의 메모리와 임시 폴더가 계속 커집니다.
+
+- SessionLRU: st.session_state 안에 크기 제한이 있는 LRU 저장소를 만듭니다. 한도를 넘으면
+  가장 오래 쓰지 않은 항목을 빼고 on_evict로 딸린 파일을 지웁니다.
+- TempFileRegistry: 임시 파일을 전용 폴더(DEFAULT_TEMP_DIR)에 만들고 (파일, 만든 세션, 시각)을
+  기록합니다. 백그라운드 스레드가 주기적으로
+    * TTL이 지난 파일,
+    * 끝난 세션(Streamlit 런타임에서 더 이상 활성이 아닌 세션)의 파일,
+    * 기록에 없는데 TTL보다 오래된 파일 (이전 실행에서 남은 파일)
+  을 지웁니다.
+"""
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from instrumentation import METRIC_HELP, increment
+
+try:
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    has_streamlit_runtime = True
+except ImportError:
+    has_streamlit_runtime = False
+
+DEFAULT_TEMP_DIR = os.environ.get("ENGCHECK_TEMP_DIR", os.path.join(tempfile.gettempdir(), "engcheck"))
+TEMP_FILE_TTL = float(os.environ.get("ENGCHECK_TEMP_TTL", "3600"))
+SWEEP_INTERVAL = float(os.environ.get("ENGCHECK_SWEEP_INTERVAL", "300"))
+SESSION_AUDIO_LIMIT = int(os.environ.get("ENGCHECK_SESSION_AUDIO_LIMIT", "3"))
+
+TEMP_FILES_REMOVED = "engcheck_temp_files_removed_total"
+METRIC_HELP[TEMP_FILES_REMOVED] = "삭제한 임시 파일 수 (reason=released|evicted|expired|session_end|orphaned)"
+
+
+def current_session_id():
+    """현재 Streamlit 세션 ID를 반환합니다 (Streamlit 밖에서 실행 중이면 None)."""
+    if not has_streamlit_runtime:
+        return None
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else None
+
+
+def is_active_session(session_id):
+    """세션이 아직 연결되어 있는지 확인합니다. 런타임이 없으면 항상 활성으로 봅니다."""
+    if not has_streamlit_runtime or not Runtime.exists():
+        return True
+    return Runtime.instance().is_active_session(session_id)
+
+
+class SessionLRU:
+    """
+    세션 상태 안의 크기 제한 LRU 저장소
+
+    Parameters:
+    - state: st.session_state (또는 딕셔너리)
+    - name: 세션 상태에 저장할 키
+    - capacity: 최대 항목 수
+    - on_evict: 항목이 밀려날 때 (키, 값)으로 호출할 함수
+    """
+
+    def __init__(self, state, name, capacity, on_evict=None):
+        if name not in state:
+            state[name] = OrderedDict()
+        self._items = state[name]
+        self.capacity = capacity
+        self.on_evict = on_evict
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=None):
+        if key not in self._items:
+            return default
+        self._items.move_to_end(key)
+        return self._items[key]
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.capacity:
+            evicted_key, evicted_value = self._items.popitem(last=False)
+            if self.on_evict:
+                self.on_evict(evicted_key, evicted_value)
+
+    def clear(self):
+        while self._items:
+            key, value = self._items.popitem(last=False)
+            if self.on_evict:
+                self.on_evict(key, value)
+
+
+class TempFileRegistry:
+    """
+    임시 파일 기록부
+
+    Parameters:
+    - directory: 임시 파일을 만들 전용 폴더 (정리할 때 이 폴더만 봄)
+    - ttl: 파일을 유지할 시간(초)
+    - sweep_interval: 백그라운드 정리 간격(초)
+    """
+
+    def __init__(self, directory=DEFAULT_TEMP_DIR, ttl=TEMP_FILE_TTL, sweep_interval=SWEEP_INTERVAL):
+        self.directory = directory
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        os.makedirs(directory, exist_ok=True)
+        self._files = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._sweeper = None
+
+    def start(self):
+        """백그라운드 정리 스레드를 시작합니다."""
+        if self._sweeper is None:
+            self._sweeper = threading.Thread(target=self._sweep_periodically, name="temp-file-sweeper", daemon=True)
+            self._sweeper.start()
+        return self
+
+    def _sweep_periodically(self):
+        while not self._closed.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"임시 파일 정리 중 오류: {e}")
+
+    def new_path(self, prefix="tmp_", suffix="", owner=None):
+        """
+        전용 폴더에 빈 임시 파일을 만들고 기록한 뒤 경로를 반환합니다.
+
+        Parameters:
+        - prefix, suffix: 파일 이름 접두사/확장자
+        - owner: 파일을 만든 세션 ID (세션이 끝나면 함께 삭제, None이면 TTL로만 삭제)
+        """
+        fd, path = tempfile.mkstemp(prefix=prefix, suffix=suffix, dir=self.directory)
+        os.close(fd)
+        return self.register(path, owner)
+
+    def register(self, path, owner=None):
+        """다른 곳에서 만든 파일을 기록에 추가합니다."""
+        with self._lock:
+            self._files[path] = (owner, time.time())
+        return path
+
+    def release(self, path, reason="released"):
+        """파일을 지우고 기록에서 뺍니다."""
+        with self._lock:
+            self._files.pop(path, None)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            print(f"임시 파일 삭제 오류 ({path}): {e}")
+            return False
+        increment(TEMP_FILES_REMOVED, reason=reason)
+        return True
+
+    def release_owner(self, owner, reason="session_end"):
+        """세션이 만든 파일을 모두 지웁니다."""
+        with self._lock:
+            paths = [path for path, (file_owner, _) in self._files.items() if file_owner == owner]
+        return sum(self.release(path, reason) for path in paths)
+
+    def sweep(self, now=None):
+        """
+        TTL이 지났거나 세션이 끝난 파일과, 기록에 없는 오래된 파일을 지웁니다.
+
+        Returns:
+        - 지운 파일 수
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            files = dict(self._files)
+
+        removed = 0
+        session_states = {}
+        for path, (owner, created) in files.items():
+            if now - created > self.ttl:
+                removed += self.release(path, "expired")
+                continue
+            if owner is not None:
+                if owner not in session_states:
+                    session_states[owner] = is_active_session(owner)
+                if not session_states[owner]:
+                    removed += self.release(path, "session_end")
+
+        # 이전 실행에서 남은 파일 (기록에 없음)
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.path not in files:
+                try:
+                    if now - entry.stat().st_mtime > self.ttl:
+                        removed += self.release(entry.path, "orphaned")
+                except FileNotFoundError:
+                    continue
+        return removed
+
+    def status(self):
+        with self._lock:
+            owners = {owner for owner, _ in self._files.values() if owner is not None}
+            return {'directory': self.directory, 'files': len(self._files), 'sessions': len(owners)}
+
+    def close(self):
+        """정리 스레드를 멈춥니다 (파일은 남겨 둠)."""
+        self._closed.set()
@@ -0,0 +1,233 @@
+"""
+선언형 문법 규칙 엔진
+
+규칙은 rules/*.json 파일에 정의하고, 불러올 때 한 번 컴파일해 앵커 단어 색인을 만듭니다.
+문장마다 그 문장에 나오는 앵커 단어를 가진 규칙만 검사하므로 규칙을 추가해도
+해당 단어가 없는 문장의 검사 시간은 거의 늘지 않습니다.
+
+규칙 파일 형식:
+    {
+      "name": "korean_learner",
+      "source": "KoreanErrRule",              # 오류의 source 값
+      "message_prefix": "한국인 학습자 일반 오류: ",
+      "rules": [
+        {
+          "id": "PREP_ON_DAY_PART",
+          "category": "preposition",
+          "pattern": "\\bin (\\w+ )?(weekend|morning)\\b",
+          "anchors": ["weekend", "morning"],  # 이 단어 중 하나가 문장에 있어야 검사 (비우면 항상 검사)
+          "suggestion": "on {1}{2}",          # 문자열 또는 목록. {0}=일치 전체, {1}..=그룹, {이름}=이름 있는 그룹
+          "message": "...",                   # 제안과 같은 치환 사용 가능
+          "maps": {"base": {"is": "be"}},     # {2|base}처럼 그룹 값을 바꾸는 표
+          "case_sensitive": false,
+          "fallback": false,                  # true면 구문 분석기(parse_rules)를 쓸 수 없을 때만 사용
+          "examples": [{"text": "...", "suggestion": "..."}],
+          "counter_examples": ["..."]
+        }
+      ]
+    }
+
+치환 필터: {1|lower}, {1|past}, {1|third_person}, {1|plural}, {1|singular}, {1|표 이름}
+
+규칙 테스트 (각 규칙의 examples/counter_examples를 검사):
+    python rule_engine.py rules/korean_learner.json rules/additional_patterns.json
+"""
+import argparse
+import json
+import os
+import re
+import sys
+
+from chunked_check import sentence_spans
+from parse_rules import past_tense, plural_noun, singular_noun, third_person_singular
+
+RULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules")
+WORD_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+TEMPLATE_FIELD = re.compile(r"\{(\w+)(?:\|(\w+))?\}")
+
+
+FILTERS = {
+    'lower': str.lower,
+    'past': lambda value: past_tense(value.lower()),
+    'third_person': lambda value: third_person_singular(value.lower()),
+    'plural': plural_noun,
+    'singular': singular_noun,
+}
+
+
+class RuleError(ValueError):
+    """규칙 파일 형식 오류"""
+
+
+class Rule:
+    """컴파일된 규칙 하나"""
+
+    def __init__(self, spec, rule_set):
+        missing = [key for key in ('id', 'pattern', 'message') if key not in spec]
+        if missing:
+            raise RuleError(f"{rule_set}: 규칙에 {', '.join(missing)} 항목이 없습니다 ({spec})")
+        self.id = spec['id']
+        self.category = spec.get('category', '')
+        self.anchors = [anchor.lower() for anchor in spec.get('anchors', [])]
+        self.message = spec['message']
+        suggestions = spec.get('suggestion', [])
+        self.suggestions = [suggestions] if isinstance(suggestions, str) else list(suggestions)
+        self.maps = {name: {key.lower(): value for key, value in table.items()}
+                     for name, table in spec.get('maps', {}).items()}
+        self.fallback = spec.get('fallback', False)
+        self.examples = spec.get('examples', [])
+        self.counter_examples = spec.get('counter_examples', [])
+        try:
+            self.regex = re.compile(spec['pattern'], 0 if spec.get('case_sensitive') else re.IGNORECASE)
+        except re.error as e:
+            raise RuleError(f"{rule_set}: {self.id} 패턴 오류: {e}")
+        for template in self.suggestions + [self.message]:
+            for _, name in TEMPLATE_FIELD.findall(template):
+                if name and name not in FILTERS and name not in self.maps:
+                    raise RuleError(f"{rule_set}: {self.id}에 알 수 없는 필터 '{name}'가 있습니다")
+
+    def render(self, template, match):
+        def field(m):
+            key, name = m.group(1), m.group(2)
+            value = match.group(int(key) if key.isdigit() else key) or ""
+            if name in self.maps:
+                return self.maps[name].get(value.lower(), value)
+            if name:
+                return FILTERS[name](value)
+            return value
+        return TEMPLATE_FIELD.sub(field, template)
+
+
+class RuleSet:
+    """
+    규칙 파일 하나를 컴파일한 규칙 모음
+
+    Parameters:
+    - spec: 규칙 파일 내용 (딕셔너리)
+    """
+
+    def __init__(self, spec):
+        self.name = spec.get('name', 'rules')
+        self.source = spec.get('source', self.name)
+        self.message_prefix = spec.get('message_prefix', '')
+        self.rules = [Rule(rule, self.name) for rule in spec.get('rules', [])]
+
+        ids = [rule.id for rule in self.rules]
+        duplicates = {rule_id for rule_id in ids if ids.count(rule_id) > 1}
+        if duplicates:
+            raise RuleError(f"{self.name}: 규칙 id가 중복되었습니다: {', '.join(sorted(duplicates))}")
+
+        # 앵커 단어 → 규칙 번호 색인. 앵커가 없는 규칙은 모든 문장에서 검사
+        self.anchor_index = {}
+        self.unanchored = []
+        for index, rule in enumerate(self.rules):
+            if not rule.anchors:
+                self.unanchored.append(index)
+            for anchor in rule.anchors:
+                self.anchor_index.setdefault(anchor, []).append(index)
+
+    def candidate_rules(self, sentence, include_fallback=False):
+        """문장에 나온 앵커 단어로 검사할 규칙만 골라 정의 순서대로 반환합니다."""
+        indices = set(self.unanchored)
+        for word in set(WORD_PATTERN.findall(sentence.lower())):
+            indices.update(self.anchor_index.get(word, ()))
+        rules = (self.rules[index] for index in sorted(indices))
+        return [rule for rule in rules if include_fallback or not rule.fallback]
+
+    def check_sentence(self, sentence, base_offset=0, include_fallback=False):
+        """문장 하나를 검사해 오류 목록을 반환합니다 (위치는 base_offset 기준)."""
+        errors = []
+        for rule in self.candidate_rules(sentence, include_fallback):
+            for match in rule.regex.finditer(sentence):
+                if match.end() == match.start():
+                    continue
+                errors.append({
+                    'message': self.message_prefix + rule.render(rule.message, match),
+                    'offset': base_offset + match.start(),
+                    'length': match.end() - match.start(),
+                    'replacements': [rule.render(template, match) for template in rule.suggestions],
+                    'rule': rule.id,
+                    'category': rule.category,
+                    'source': self.source,
+                    'context': sentence
+                })
+        return errors
+
+    def check(self, text, include_fallback=False):
+        """
+        글을 문장 단위로 나누어 검사합니다.
+
+        Parameters:
+        - text: 검사할 텍스트
+        - include_fallback: 구문 분석기를 대신하는 fallback 규칙도 검사할지 여부
+
+        Returns:
+        - 위치 순으로 정렬된 오류 목록
+        """
+        errors = []
+        for start, end, _ in sentence_spans(text):
+            errors.extend(self.check_sentence(text[start:end], start, include_fallback))
+        return sorted(errors, key=lambda error: error['offset'])
+
+
+def load_rule_set(path):
+    """규칙 파일을 읽어 컴파일된 RuleSet을 반환합니다. 상대 경로는 rules/ 기준입니다."""
+    if not os.path.isabs(path) and not os.path.exists(path):
+        path = os.path.join(RULES_DIR, path)
+    with open(path, encoding="utf-8") as f:
+        return RuleSet(json.load(f))
+
+
+def test_rule_set(rule_set):
+    """
+    각 규칙의 예문을 검사해 실패 목록을 반환합니다.
+
+    - examples: 규칙이 일치해야 하고, suggestion이 있으면 제안 목록에 포함되어야 함
+      (앵커 단어가 빠져 색인에서 걸러지는 경우도 실패로 보고)
+    - counter_examples: 규칙이 일치하면 안 됨
+    """
+    failures = []
+    for rule in rule_set.rules:
+        for example in rule.examples:
+            text = example['text'] if isinstance(example, dict) else example
+            found = [error for error in rule_set.check(text, include_fallback=True) if error['rule'] == rule.id]
+            if not found:
+                reason = "일치하지 않음"
+                if rule.regex.search(text):
+                    reason = "패턴은 일치하지만 앵커 단어가 없어 검사되지 않음"
+                failures.append((rule.id, text, reason))
+                continue
+            expected = example.get('suggestion') if isinstance(example, dict) else None
+            if expected is not None and not any(expected in error['replacements'] for error in found):
+                got = [error['replacements'] for error in found]
+                failures.append((rule.id, text, f"제안 '{expected}' 대신 {got}"))
+        for text in rule.counter_examples:
+            if any(error['rule'] == rule.id for error in rule_set.check(text, include_fallback=True)):
+                failures.append((rule.id, text, "일치하면 안 되는 문장에서 일치함"))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="문법 규칙 파일 예문 테스트")
+    parser.add_argument("files", nargs="+", help="규칙 파일 경로 (rules/ 기준 상대 경로 가능)")
+    args = parser.parse_args(argv)
+
+    total_failures = 0
+    for path in args.files:
+        try:
+            rule_set = load_rule_set(path)
+        except (OSError, ValueError) as e:
+            print(f"{path}: 불러오기 실패: {e}")
+            total_failures += 1
+            continue
+        failures = test_rule_set(rule_set)
+        example_count = sum(len(rule.examples) + len(rule.counter_examples) for rule in rule_set.rules)
+        print(f"{path}: 규칙 {len(rule_set.rules)}개, 예문 {example_count}개, 실패 {len(failures)}개")
+        for rule_id, text, reason in failures:
+            print(f"  [{rule_id}] {text!r}: {reason}")
+        total_failures += len(failures)
+    return 1 if total_failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
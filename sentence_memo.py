@@ -0,0 +1,228 @@
+"""
+문장 단위 교정 결과 메모 (Gramformer, LanguageTool)
+
+같은 주제의 작문에는 "I think it is important to ...", "In conclusion, ..." 같은 문장이
+학생마다 반복됩니다. 문장 하나의 교정/검사 결과를 (엔진, 엔진 버전, 정규화한 문장)의
+해시로 저장해 두면, 다른 학생의 글에 같은 문장이 나왔을 때 모델을 다시 실행하지 않습니다.
+
+- 메모리 계층: 크기 제한이 있는 LRU (프로세스 전체 공유)
+- 영구 계층(선택): SQLite 파일. ENGCHECK_SENTENCE_MEMO_DB에 경로를 주면 켜지며,
+  서버를 다시 시작해도 결과가 유지됩니다.
+- 적중률: 문장마다 record_cache("sentence_memo:엔진", 적중 여부)로 기록하고,
+  영구 계층에서 찾은 경우는 "sentence_memo_disk:엔진"으로 따로 기록합니다.
+
+엔진 버전(또는 MEMO_SCHEMA_VERSION)이 바뀌면 키가 달라지므로 이전 결과는 쓰이지 않습니다.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from importlib import metadata
+
+from instrumentation import record_cache
+
+MEMO_SCHEMA_VERSION = "1"
+DEFAULT_MEMO_SIZE = int(os.environ.get("ENGCHECK_SENTENCE_MEMO_SIZE", "20000"))
+DEFAULT_MEMO_DB_PATH = os.environ.get("ENGCHECK_SENTENCE_MEMO_DB") or None
+SENTENCE_SEPARATOR = "\n\n"
+
+WHITESPACE_RUN = re.compile(r"\s+")
+WHITESPACE_CHAR = re.compile(r"\s")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sentence_memo (
+    key TEXT PRIMARY KEY,
+    engine TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+"""
+
+
+def collapse_whitespace(sentence):
+    """공백 묶음을 한 칸으로 줄입니다 (결과가 문장 문자열인 엔진용)."""
+    return WHITESPACE_RUN.sub(" ", sentence.strip())
+
+
+def uniform_whitespace(sentence):
+    """공백 문자를 모두 ' '로 바꿉니다. 길이가 바뀌지 않아 문장 기준 오류 위치를 그대로 쓸 수 있습니다."""
+    return WHITESPACE_CHAR.sub(" ", sentence)
+
+
+def package_version(package):
+    """설치된 패키지 버전을 반환합니다 (없으면 'none')."""
+    try:
+        return metadata.version(package)
+    except metadata.PackageNotFoundError:
+        return "none"
+
+
+class SentenceMemo:
+    """
+    문장 → 결과 메모
+
+    Parameters:
+    - engine: 엔진 이름 (지표와 키에 사용)
+    - version: 엔진 버전 문자열 (모델/패키지 버전이 바뀌면 다른 키가 됨)
+    - normalize: 키를 만들기 전에 문장에 적용할 정규화 함수
+    - maxsize: 메모리 계층 최대 문장 수
+    - path: 영구 계층 SQLite 파일 경로 (None이면 메모리 계층만 사용)
+    """
+
+    def __init__(self, engine, version, normalize=collapse_whitespace, maxsize=DEFAULT_MEMO_SIZE,
+                 path=DEFAULT_MEMO_DB_PATH):
+        self.engine = engine
+        self.version = version
+        self.normalize = normalize
+        self.maxsize = maxsize
+        self.path = path
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._connection() as conn:
+                conn.executescript(SCHEMA)
+
+    # 스레드별 연결 (sqlite3 연결은 스레드 간에 공유하지 않음)
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def key(self, sentence):
+        material = "\x1f".join((MEMO_SCHEMA_VERSION, self.engine, self.version, self.normalize(sentence)))
+        return hashlib.sha1(material.encode("utf-8")).hexdigest()
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def get_many(self, sentences):
+        """
+        메모에 있는 문장의 결과를 {키: 결과}로 반환합니다. 문장마다 적중 여부를 기록합니다.
+        """
+        keys = {sentence: self.key(sentence) for sentence in sentences}
+        found = {}
+        with self._lock:
+            for key in keys.values():
+                if key in self._items:
+                    self._items.move_to_end(key)
+                    found[key] = self._items[key]
+
+        missing = [key for key in dict.fromkeys(keys.values()) if key not in found]
+        if missing and self.path:
+            conn = self._connection()
+            placeholders = ", ".join("?" * len(missing))
+            rows = conn.execute(f"SELECT key, value FROM sentence_memo WHERE key IN ({placeholders})",
+                                missing).fetchall()
+            for key, value in rows:
+                found[key] = json.loads(value)
+                self._remember(key, found[key])
+            for key in missing:
+                record_cache(f"sentence_memo_disk:{self.engine}", key in found)
+
+        for key in keys.values():
+            record_cache(f"sentence_memo:{self.engine}", key in found)
+        return found
+
+    def put_many(self, results):
+        """{문장: 결과}를 메모에 저장합니다 (결과는 JSON으로 저장할 수 있어야 함)."""
+        rows = []
+        for sentence, value in results.items():
+            key = self.key(sentence)
+            self._remember(key, value)
+            rows.append((key, self.engine, json.dumps(value, ensure_ascii=False)))
+        if rows and self.path:
+            with self._write_lock:
+                conn = self._connection()
+                with conn:
+                    conn.executemany("INSERT OR REPLACE INTO sentence_memo (key, engine, value) VALUES (?, ?, ?)", rows)
+
+    def lookup(self, sentences, compute):
+        """
+        문장 목록의 결과를 같은 순서로 반환합니다.
+        메모에 없는 문장만 중복 없이 모아 compute(문장 목록)로 한 번에 계산하고 저장합니다.
+
+        Parameters:
+        - sentences: 문장 목록
+        - compute: 문장 목록을 받아 같은 순서의 결과 목록을 반환하는 함수
+        """
+        found = self.get_many(sentences)
+        missing = list(dict.fromkeys(sentence for sentence in sentences if self.key(sentence) not in found))
+        if missing:
+            computed = dict(zip(missing, compute(missing)))
+            self.put_many(computed)
+            found.update((self.key(sentence), value) for sentence, value in computed.items())
+        return [found[self.key(sentence)] for sentence in sentences]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def status(self):
+        with self._lock:
+            return {'engine': self.engine, 'version': self.version, 'size': len(self._items),
+                    'maxsize': self.maxsize, 'persistent': bool(self.path)}
+
+
+def join_sentences(sentences, separator=SENTENCE_SEPARATOR):
+    """문장들을 구분자로 이어 붙인 텍스트와 각 문장의 시작 위치를 반환합니다."""
+    starts = []
+    position = 0
+    for sentence in sentences:
+        starts.append(position)
+        position += len(sentence) + len(separator)
+    return separator.join(sentences), starts
+
+
+def split_errors(errors, starts, sentences):
+    """
+    이어 붙인 텍스트 기준 오류 목록을 문장별 오류 목록(문장 기준 위치, context 제외)으로 나눕니다.
+    문장 경계를 넘는 오류는 버립니다 (LanguageTool에서 여러 문장에 걸친 규칙은 글 전체 검사로 따로 처리).
+    """
+    per_sentence = [[] for _ in sentences]
+    for error in errors:
+        index = bisect_right(starts, error['offset']) - 1
+        if index < 0:
+            continue
+        offset = error['offset'] - starts[index]
+        if offset + error.get('length', 0) > len(sentences[index]):
+            continue
+        error = {key: value for key, value in error.items() if key != 'context'}
+        error['offset'] = offset
+        per_sentence[index].append(error)
+    return per_sentence
+
+
+def merge_sentence_errors(text, spans, per_sentence):
+    """
+    문장별 오류 목록을 원래 글 기준 위치로 옮겨 합치고 문맥(context)을 다시 만듭니다.
+
+    Parameters:
+    - text: 원래 글
+    - spans: 문장 (시작, 끝, ...) 목록
+    - per_sentence: spans와 같은 순서의 문장별 오류 목록
+    """
+    errors = []
+    for span_info, sentence_errors in zip(spans, per_sentence):
+        start = span_info[0]
+        for error in sentence_errors:
+            offset = start + error['offset']
+            length = error.get('length', 0)
+            errors.append(dict(error, offset=offset,
+                               context=text[max(0, offset - 20):min(len(text), offset + length + 20)]))
+    return errors
@@ -0,0 +1,363 @@
+"""
+제출 작문 유사도 색인 (MinHash + LSH)
+
+학생끼리 작문을 베꼈거나 재작성 결과(rewrite_text)를 그대로 붙여 넣었는지 확인하기 위해
+제출된 글을 색인해 두고, 새 글과 비슷한 이전 글을 찾습니다.
+
+- 글의 단어 토큰을 SHINGLE_SIZE 단어씩 겹쳐 자른 shingle 집합으로 바꾸고
+  NUM_PERM개의 해시 함수로 MinHash 서명을 만듭니다. 두 서명에서 값이 같은 위치의 비율이
+  두 글의 Jaccard 유사도 추정값입니다.
+- 서명을 BANDS개의 띠(band)로 나누어 띠마다 해시한 값을 버킷으로 저장합니다(LSH).
+  새 글은 띠 하나라도 버킷이 같은 글만 후보로 가져와 비교하므로 전체 기록과
+  하나씩 비교하지 않습니다. 기본값(32띠 × 4행)은 유사도 약 0.4 이상인 글을 후보로 잡습니다.
+- 같은 학생의 같은 글(서명이 같은 글)은 다시 분석해도 한 번만 저장하고, 찾은 결과는 학생(과 글 종류)마다
+  가장 비슷한 글 하나만 보여 주어 한 학생의 글이 결과를 모두 차지하지 않게 합니다.
+- 새 제출 글은 add_and_query()로 저장하면서 다른 학생의 이전 글과 비교하고, 비슷한 글을 찾으면
+  essay_matches에 남겨 교사 화면(recent_matches)에서 확인할 수 있게 합니다.
+- 색인은 제출 기록 데이터베이스와 같은 폴더의 SQLite 파일에 저장합니다.
+
+기존 제출 기록으로 색인 다시 만들기:
+    python similarity_index.py --rebuild
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from history_store import DEFAULT_HISTORY_DB_PATH
+
+DEFAULT_SIMILARITY_DB_PATH = os.environ.get(
+    "ENGCHECK_SIMILARITY_DB",
+    os.path.join(os.path.dirname(DEFAULT_HISTORY_DB_PATH), "similarity.db")
+)
+SHINGLE_SIZE = 3
+NUM_PERM = 128
+BANDS = 32
+DEFAULT_TOP_K = 5
+DEFAULT_MIN_SIMILARITY = 0.3
+PREVIEW_CHARS = 200
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS essays (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    preview TEXT NOT NULL,
+    token_count INTEGER NOT NULL,
+    signature BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lsh_buckets (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    essay_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_lsh_buckets ON lsh_buckets (band, bucket);
+CREATE INDEX IF NOT EXISTS idx_essays_student_signature ON essays (student, signature);
+CREATE TABLE IF NOT EXISTS essay_matches (
+    essay_id INTEGER NOT NULL,
+    match_id INTEGER NOT NULL,
+    similarity REAL NOT NULL,
+    PRIMARY KEY (essay_id, match_id)
+);
+"""
+
+
+def hash64(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little", signed=True)
+
+
+def shingles(tokens, size=SHINGLE_SIZE):
+    """단어 토큰을 size 단어씩 겹쳐 자른 shingle의 32비트 해시 배열을 반환합니다 (글이 짧으면 글 전체 하나)."""
+    if len(tokens) < size:
+        grams = [" ".join(tokens)] if tokens else []
+    else:
+        grams = {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+    return np.array([hash64(gram.encode("utf-8")) & 0xFFFFFFFF for gram in grams], dtype=np.uint64)
+
+
+class MinHasher:
+    """
+    고정된 시드로 만든 해시 함수 묶음 (모든 글에 같은 함수를 써야 서명을 비교할 수 있음)
+
+    Parameters:
+    - num_perm: 해시 함수(서명 길이) 수
+    - seed: 해시 함수 계수를 만드는 시드
+    """
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        generator = np.random.RandomState(seed)
+        self.a = generator.randint(1, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self.b = generator.randint(0, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+
+    def signature(self, shingle_hashes):
+        """shingle 해시 배열의 MinHash 서명(uint64 배열)을 반환합니다."""
+        if not len(shingle_hashes):
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        # (shingle 수 × 해시 함수 수) 행렬에서 열마다 최솟값
+        with np.errstate(over='ignore'):
+            values = (np.outer(shingle_hashes, self.a) + self.b) % MERSENNE_PRIME & MAX_HASH
+        return values.min(axis=0)
+
+
+def band_buckets(signature, bands=BANDS):
+    """서명을 띠로 나누어 띠마다 버킷 해시를 반환합니다."""
+    return [hash64(band.tobytes()) for band in np.array_split(signature, bands)]
+
+
+def estimate_similarity(signature, other):
+    """두 MinHash 서명으로 Jaccard 유사도를 추정합니다."""
+    return float(np.mean(signature == other))
+
+
+class SimilarityIndex:
+    """
+    제출 작문 유사도 색인
+
+    Parameters:
+    - path: SQLite 데이터베이스 파일 경로
+    - num_perm, bands: 서명 길이와 띠 수 (num_perm은 bands로 나누어떨어져야 함)
+    - shingle_size: shingle 하나의 단어 수
+    """
+
+    def __init__(self, path=DEFAULT_SIMILARITY_DB_PATH, num_perm=NUM_PERM, bands=BANDS,
+                 shingle_size=SHINGLE_SIZE):
+        if num_perm % bands:
+            raise ValueError(f"num_perm({num_perm})은 bands({bands})로 나누어떨어져야 합니다")
+        self.path = path
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self.hasher = MinHasher(num_perm)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    # 스레드별 연결 (sqlite3 연결은 스레드 간에 공유하지 않음)
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def signature(self, tokens):
+        return self.hasher.signature(shingles(tokens, self.shingle_size))
+
+    def add(self, student, text, tokens, kind="제출", timestamp=None, signature=None):
+        """
+        글 하나를 색인에 추가하고 색인 번호를 반환합니다.
+        같은 학생의 서명이 같은 글이 이미 있으면 새로 추가하지 않고 그 글의 번호를 반환합니다.
+
+        Parameters:
+        - student: 학생 이름
+        - text: 글 (미리보기로 앞부분만 저장)
+        - tokens: 글의 소문자 단어 토큰 목록
+        - kind: 글 종류 (예: "제출", "재작성 결과")
+        - timestamp: 제출 시각 문자열 (None이면 현재 시각)
+        - signature: 이미 계산한 서명 (None이면 tokens로 계산)
+        """
+        if signature is None:
+            signature = self.signature(tokens)
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                row = conn.execute("SELECT id FROM essays WHERE student = ? AND signature = ?",
+                                   (student, signature.tobytes())).fetchone()
+                if row is not None:
+                    return row[0]
+                cursor = conn.execute(
+                    "INSERT INTO essays (student, timestamp, kind, preview, token_count, signature) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (student, timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S"), kind,
+                     text[:PREVIEW_CHARS], len(tokens), signature.tobytes())
+                )
+                essay_id = cursor.lastrowid
+                conn.executemany(
+                    "INSERT INTO lsh_buckets (band, bucket, essay_id) VALUES (?, ?, ?)",
+                    [(band, bucket, essay_id) for band, bucket in enumerate(band_buckets(signature, self.bands))]
+                )
+        return essay_id
+
+    def query(self, tokens, top_k=DEFAULT_TOP_K, min_similarity=DEFAULT_MIN_SIMILARITY,
+              exclude_student=None, signature=None):
+        """
+        글과 비슷한 이전 글을 찾습니다.
+
+        Parameters:
+        - tokens: 찾을 글의 소문자 단어 토큰 목록
+        - top_k: 반환할 최대 개수
+        - min_similarity: 이 값보다 추정 유사도가 낮은 글은 제외
+        - exclude_student: 이 학생의 글은 제외 (자기 이전 초안 제외용)
+        - signature: 이미 계산한 서명 (None이면 tokens로 계산)
+
+        Returns:
+        - 유사도가 높은 순서의 딕셔너리 목록 (id, student, timestamp, kind, preview, similarity).
+          학생과 글 종류마다 가장 비슷한 글 하나만 들어갑니다
+        """
+        if not tokens:
+            return []
+        if signature is None:
+            signature = self.signature(tokens)
+        buckets = band_buckets(signature, self.bands)
+        conn = self._connection()
+
+        # 띠마다 버킷이 같은 글을 후보로 모음 (인덱스 조회이므로 기록 수에 비례하지 않음)
+        candidate_ids = set()
+        for band, bucket in enumerate(buckets):
+            rows = conn.execute("SELECT essay_id FROM lsh_buckets WHERE band = ? AND bucket = ?", (band, bucket))
+            candidate_ids.update(row[0] for row in rows)
+        if not candidate_ids:
+            return []
+
+        placeholders = ", ".join("?" * len(candidate_ids))
+        rows = conn.execute(
+            f"SELECT id, student, timestamp, kind, preview, signature FROM essays WHERE id IN ({placeholders})",
+            tuple(candidate_ids)
+        ).fetchall()
+
+        matches = []
+        for row in rows:
+            if exclude_student is not None and row['student'] == exclude_student:
+                continue
+            similarity = estimate_similarity(signature, np.frombuffer(row['signature'], dtype=np.uint64))
+            if similarity >= min_similarity:
+                matches.append({
+                    'id': row['id'],
+                    'student': row['student'],
+                    'timestamp': row['timestamp'],
+                    'kind': row['kind'],
+                    'preview': row['preview'],
+                    'similarity': similarity,
+                })
+        matches.sort(key=lambda match: match['similarity'], reverse=True)
+        # 한 학생이 비슷한 초안을 여러 번 제출했어도 다른 학생의 글이 밀려나지 않도록 하나만 남김
+        best = {}
+        for match in matches:
+            best.setdefault((match['student'], match['kind']), match)
+        return list(best.values())[:top_k]
+
+    def add_and_query(self, student, text, tokens, kind="제출", top_k=DEFAULT_TOP_K,
+                      min_similarity=DEFAULT_MIN_SIMILARITY):
+        """
+        새 제출 글과 비슷한 이전 글(같은 학생의 글 제외)을 찾은 뒤 글을 색인에 추가하고,
+        찾은 글을 essay_matches에 기록합니다. 서명은 한 번만 계산합니다.
+        """
+        signature = self.signature(tokens)
+        matches = self.query(tokens, top_k, min_similarity, exclude_student=student, signature=signature)
+        essay_id = self.add(student, text, tokens, kind, signature=signature)
+        if matches:
+            with self._write_lock:
+                conn = self._connection()
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO essay_matches (essay_id, match_id, similarity) VALUES (?, ?, ?)",
+                        [(essay_id, match['id'], match['similarity']) for match in matches]
+                    )
+        return matches
+
+    def recent_matches(self, limit=20):
+        """
+        add_and_query로 제출할 때 찾은 비슷한 글 쌍을 최근 제출 순으로 반환합니다.
+
+        Returns:
+        - 딕셔너리 목록 (student, timestamp, kind, preview: 새 제출 글 / match_student, match_timestamp,
+          match_kind, match_preview: 비슷한 이전 글 / similarity)
+        """
+        rows = self._connection().execute(
+            "SELECT e.student, e.timestamp, e.kind, e.preview, m.student AS match_student, "
+            "m.timestamp AS match_timestamp, m.kind AS match_kind, m.preview AS match_preview, x.similarity "
+            "FROM essay_matches x JOIN essays e ON e.id = x.essay_id JOIN essays m ON m.id = x.match_id "
+            "ORDER BY x.essay_id DESC, x.similarity DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def students(self):
+        """색인에 글이 있는 학생 목록"""
+        return [row[0] for row in self._connection().execute("SELECT DISTINCT student FROM essays ORDER BY student")]
+
+    def count(self):
+        return self._connection().execute("SELECT COUNT(*) FROM essays").fetchone()[0]
+
+    def clear(self):
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM essay_matches")
+                conn.execute("DELETE FROM lsh_buckets")
+                conn.execute("DELETE FROM essays")
+
+
+def rebuild_from_history(index, tokenize, history_path=DEFAULT_HISTORY_DB_PATH):
+    """
+    제출 기록 데이터베이스의 모든 글로 색인을 다시 만듭니다.
+
+    Parameters:
+    - index: SimilarityIndex
+    - tokenize: 텍스트를 소문자 단어 토큰 목록으로 바꾸는 함수
+    - history_path: 제출 기록 데이터베이스 경로
+
+    Returns:
+    - 색인한 글 수
+    """
+    index.clear()
+    conn = sqlite3.connect(history_path, timeout=30)
+    try:
+        cursor = conn.execute("SELECT student, timestamp, text FROM submissions ORDER BY timestamp, id")
+        count = 0
+        seen = set()
+        for student, timestamp, text in cursor:
+            # 같은 학생이 같은 글로 여러 작업을 했으면 한 번만 색인
+            if (student, text) in seen:
+                continue
+            seen.add((student, text))
+            index.add(student, text, tokenize(text), timestamp=timestamp)
+            count += 1
+        return count
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="제출 작문 유사도 색인")
+    parser.add_argument("--rebuild", action="store_true", help="제출 기록으로 색인을 다시 만듦")
+    parser.add_argument("--query", help="이 파일과 비슷한 이전 글 찾기")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP_K, help="찾을 글 수")
+    args = parser.parse_args(argv)
+
+    from engcheck_loader import load_eng_check
+
+    checker = load_eng_check()
+    index = SimilarityIndex()
+    if args.rebuild:
+        count = rebuild_from_history(index, checker.vocabulary_tokens)
+        print(f"글 {count}개를 색인했습니다 ({index.path})")
+    if args.query:
+        with open(args.query, encoding="utf-8") as f:
+            tokens = checker.vocabulary_tokens(f.read())
+        for match in index.query(tokens, args.top):
+            print(f"{match['similarity']:.2f}  {match['student']}  {match['timestamp']}  {match['kind']}  "
+                  f"{match['preview'][:60]!r}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
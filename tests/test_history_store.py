@@ -0,0 +1,103 @@
+"""
+제출 기록 저장소
+
+저장에 실패한 기록이 버려지지 않고 다음 저장 때 순서대로 들어가는지,
+대시보드 집계 테이블보다 먼저 저장된 기록이 집계에 한 번만 더해지는지 확인합니다.
+
+    python -m unittest tests.test_history_store
+"""
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import history_store  # noqa: E402
+from history_store import HistoryStore  # noqa: E402
+
+SUMMARY = {'score': 80.0, 'error_count': 1, 'categories': {"철자": 1}, 'vocab_level': {}}
+
+
+class FlushFailureTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # 주기적 저장이 끼어들지 않도록 간격을 길게 둠
+        self.store = HistoryStore(os.path.join(directory.name, "history.db"), flush_interval=3600)
+        self.addCleanup(self.store.close)
+
+    def test_failed_flush_keeps_records(self):
+        self.store.append("s1", "first", "분석", error_count=1, summary=SUMMARY)
+        self.store.append("s1", "second", "분석", error_count=1, summary=SUMMARY)
+        locked = sqlite3.OperationalError("database is locked")
+        with mock.patch.object(history_store.dashboard_stats, 'apply_summary', side_effect=locked):
+            with self.assertRaises(sqlite3.OperationalError):
+                self.store.flush()
+        # 실패한 트랜잭션은 롤백되어 아무것도 저장되지 않음
+        self.assertEqual(self.store._connection().execute("SELECT COUNT(*) FROM submissions").fetchone()[0], 0)
+
+        self.store.append("s1", "third", "분석", error_count=1, summary=SUMMARY)
+        self.store.flush()
+        rows = self.store.page("s1")
+        self.assertEqual(sorted(row['text'] for row in rows), ["first", "second", "third"])
+        self.assertEqual([row['id'] for row in sorted(rows, key=lambda row: row['text'])], [1, 2, 3])
+        self.assertEqual(self.store.dashboard()['students'][0]['submissions'], 3)
+
+    def test_append_does_not_raise_when_batch_flush_fails(self):
+        self.store.batch_size = 1
+        with mock.patch.object(history_store.dashboard_stats, 'apply_summary',
+                               side_effect=sqlite3.OperationalError("database is locked")), \
+                self.assertLogs(history_store.logger, "ERROR"):
+            self.store.append("s1", "first", "분석", error_count=1, summary=SUMMARY)
+        self.store.flush()
+        self.assertEqual(self.store.count("s1"), 1)
+
+
+class DashboardBackfillTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "history.db")
+        # 집계 테이블이 생기기 전 버전의 데이터베이스 (분석 결과가 있는 기록, 없는 기록, 재작성 기록)
+        analysis = {
+            'grammar_errors': [{'rule': 'MORFOLOGIK_RULE_EN_US', 'source': 'spelling', 'message': "철자 오류"}],
+            'stats': {'word_count': 10},
+            'vocab_level': {'basic': 0.8, 'intermediate': 0.2, 'advanced': 0.0},
+        }
+        conn = sqlite3.connect(self.path)
+        with conn:
+            conn.executescript(history_store.SCHEMA)
+            conn.executemany(
+                "INSERT INTO submissions (student, timestamp, action, text, error_count, analysis) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [("s1", "2024-03-01 09:00:00", "분석", "one two three four five", 0, None),
+                 ("s1", "2024-03-02 09:00:00", "분석", "text", 1, json.dumps(analysis)),
+                 ("s1", "2024-03-03 09:00:00", "재작성 (고급 수준)", "text", None, None)]
+            )
+        conn.close()
+
+    def open_store(self):
+        store = HistoryStore(self.path, flush_interval=3600)
+        self.addCleanup(store.close)
+        return store
+
+    def test_existing_records_are_backfilled_once(self):
+        for _ in range(2):
+            dashboard = self.open_store().dashboard()
+            student, = dashboard['students']
+            self.assertEqual((student['submissions'], student['total_errors']), (2, 1))
+            self.assertEqual((student['last_score'], student['avg_score']), (5.0, 7.5))
+            self.assertEqual(dashboard['error_categories'], [{'category': "철자", 'count': 1}])
+            self.assertEqual(len(dashboard['vocab_levels']), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+실행 중인 분석/재작성 작업 취소
+
+"취소" 버튼(JobQueue.cancel)은 실행 중인 작업에 취소를 요청만 하므로, 처리 함수가 진행 상황을
+알릴 때와 단계 사이에 요청을 확인해 'cancelled'로 끝나는지, 기록과 유사도 색인에는 남지 않는지 확인합니다.
+
+    python -m unittest tests.test_job_cancel
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from engcheck_loader import load_eng_check  # noqa: E402
+from history_store import HistoryStore  # noqa: E402
+from job_queue import JobQueue  # noqa: E402
+from similarity_index import SimilarityIndex  # noqa: E402
+
+TEXT = "Yesterday I go to the library with my friend. He are very kind."
+WAIT_SECONDS = 10
+
+
+class RunningJobCancelTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.checker = load_eng_check()
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.history = HistoryStore(os.path.join(directory.name, "history.db"))
+        self.addCleanup(self.history.close)
+        self.index = SimilarityIndex(os.path.join(directory.name, "similarity.db"))
+        for name, value in (('get_history_store', lambda: self.history),
+                            ('get_similarity_index', lambda: self.index)):
+            patcher = mock.patch.object(self.checker, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.queue = JobQueue(path=None, max_running=1)
+        self.queue.register('analysis', self.checker.run_analysis_job)
+        self.queue.register('rewrite', self.checker.run_rewrite_job)
+        self.queue.start()
+        self.addCleanup(self.queue.close)
+
+        # 작업이 단계 하나를 실행하는 동안 취소를 요청하도록 그 단계를 멈춰 둠
+        self.started = threading.Event()
+        self.proceed = threading.Event()
+
+    def blocking(self, result):
+        def run(*args, **kwargs):
+            self.started.set()
+            self.proceed.wait(WAIT_SECONDS)
+            return result(*args, **kwargs)
+        return run
+
+    def cancel_while_running(self, job_id):
+        self.assertTrue(self.started.wait(WAIT_SECONDS), "작업이 시작되지 않았습니다")
+        self.assertEqual(self.queue.get(job_id)['status'], 'running')
+        self.queue.cancel(job_id)
+        self.proceed.set()
+        deadline = time.monotonic() + WAIT_SECONDS
+        while self.queue.get(job_id)['status'] == 'running' and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return self.queue.get(job_id)
+
+    def assert_nothing_saved(self):
+        self.history.flush()
+        self.assertEqual(self.history.count(), 0)
+        self.assertEqual(self.index.count(), 0)
+
+    def test_analysis_job_stops_at_progress_report(self):
+        def check_grammar(text, on_progress=None, analysis_profile=None):
+            on_progress([], ['languagetool'])
+            return [], []
+
+        with mock.patch.object(self.checker, 'check_grammar_with_progress', self.blocking(check_grammar)):
+            job_id = self.queue.submit('analysis', {'text': TEXT, 'role': 'student'}, student="s1")
+            job = self.cancel_while_running(job_id)
+        self.assertEqual(job['status'], 'cancelled')
+        self.assertIsNone(job['result'])
+        self.assert_nothing_saved()
+
+    def test_analysis_job_stops_between_stages(self):
+        # 진행 상황을 알리지 않는 단계(어휘 분석)에서 취소해도 다음 단계 전에 멈춤
+        with mock.patch.object(self.checker, 'check_grammar_with_progress', lambda *args: ([], [])), \
+                mock.patch.object(self.checker, 'analyze_vocabulary', self.blocking(self.checker.analyze_vocabulary)):
+            job_id = self.queue.submit('analysis', {'text': TEXT, 'role': 'student'}, student="s1")
+            job = self.cancel_while_running(job_id)
+        self.assertEqual(job['status'], 'cancelled')
+        self.assert_nothing_saved()
+
+    def test_rewrite_job(self):
+        with mock.patch.object(self.checker, 'rewrite_text', self.blocking(lambda text, level: text)):
+            job_id = self.queue.submit('rewrite', {'text': TEXT, 'level': 'similar', 'level_label': "비슷한 수준"},
+                                       student="s1")
+            job = self.cancel_while_running(job_id)
+        self.assertEqual(job['status'], 'cancelled')
+        self.assert_nothing_saved()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+ONNX 교정 모델과 PyTorch Gramformer의 출력 비교
+
+OnnxGramformer.correct()가 Gramformer가 올린 같은 교정 모델을 같은 결정적 설정(탐욕 디코딩)으로
+실행한 결과와 같은지 확인합니다. Gramformer.correct 자체는 샘플링하므로 기준으로 쓰지 않습니다
+(onnx_corrector.py의 디코딩 계약 참고).
+
+onnxruntime/optimum, torch, gramformer가 없거나 모델을 변환하지 않았으면 건너뜁니다.
+실행하려면 선택 패키지를 설치하고 모델을 변환합니다 (README 참고).
+
+    pip install -r requirements-onnx.txt
+    python onnx_corrector.py --export
+    python -m unittest tests.test_onnx_parity
+"""
+import importlib.util
+import os
+import sys
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from onnx_corrector import (OnnxGramformer, has_onnxruntime, model_dir, onnx_model_available,  # noqa: E402
+                            torch_correct)
+
+PARITY_SENTENCES = [
+    "Yesterday I go to the library with my friend.",
+    "He are very kind and he always help me.",
+    "It was a apple day because we read many book together.",
+    "I discussed about the problem with my parents.",
+    "We is a good team and we wins many games.",
+    "The students finished their homework before dinner.",
+]
+# 양자화 모델은 가중치가 달라 일부 문장에서 다른 교정을 낼 수 있음
+INT8_MIN_MATCH = 0.8
+
+missing = [name for name, available in (
+    ("onnxruntime/optimum", has_onnxruntime),
+    ("torch", importlib.util.find_spec("torch") is not None),
+    ("gramformer", importlib.util.find_spec("gramformer") is not None),
+) if not available]
+
+
+@unittest.skipIf(missing, f"필요한 패키지 없음: {', '.join(missing)}")
+class OnnxParityTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        if not onnx_model_available("fp32"):
+            raise unittest.SkipTest("변환한 모델이 없습니다 (python onnx_corrector.py --export)")
+        from gramformer import Gramformer
+
+        gf = Gramformer(models=1, use_gpu=False)
+        cls.model = gf.correction_model.eval()
+        cls.tokenizer = gf.correction_tokenizer
+        cls.reference = {sentence: torch_correct(cls.model, cls.tokenizer, sentence)
+                         for sentence in PARITY_SENTENCES}
+
+    def test_fp32_matches_greedy_pytorch(self):
+        corrector = OnnxGramformer(model_dir("fp32"), threads=1)
+        for sentence in PARITY_SENTENCES:
+            with self.subTest(sentence=sentence):
+                self.assertEqual(corrector.correct(sentence), self.reference[sentence])
+
+    def test_batch_matches_single_sentence(self):
+        corrector = OnnxGramformer(model_dir("fp32"), threads=1, batch_size=4)
+        batched = corrector.correct_batch(PARITY_SENTENCES)
+        for sentence, candidates in zip(PARITY_SENTENCES, batched):
+            with self.subTest(sentence=sentence):
+                self.assertEqual(set(candidates), self.reference[sentence])
+
+    def test_int8_mostly_matches_greedy_pytorch(self):
+        if not onnx_model_available("int8"):
+            self.skipTest("양자화 모델이 없습니다")
+        corrector = OnnxGramformer(model_dir("int8"), threads=1)
+        matches = sum(corrector.correct(sentence) == self.reference[sentence] for sentence in PARITY_SENTENCES)
+        self.assertGreaterEqual(matches / len(PARITY_SENTENCES), INT8_MIN_MATCH)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+제출 작문 유사도 색인
+
+같은 글을 다시 분석해도 한 번만 저장되는지, 한 학생의 글이 결과를 모두 차지하지 않는지,
+제출할 때 찾은 비슷한 글이 기록되는지 확인합니다.
+
+    python -m unittest tests.test_similarity_index
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from similarity_index import SimilarityIndex  # noqa: E402
+
+ESSAY = ("my favorite season is summer because i can swim in the sea with my family and eat "
+         "ice cream every day after school with my best friends")
+NEAR_COPY = ESSAY.replace("best friends", "classmates")
+DRAFTS = [ESSAY + " " + ending for ending in ("yes", "really", "always", "forever", "again")]
+
+
+def tokens(text):
+    return text.split()
+
+
+class SimilarityIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.index = SimilarityIndex(os.path.join(directory.name, "similarity.db"))
+
+    def test_same_essay_is_stored_once(self):
+        first = self.index.add("s1", ESSAY, tokens(ESSAY))
+        for _ in range(4):
+            self.assertEqual(self.index.add("s1", ESSAY, tokens(ESSAY)), first)
+        self.assertEqual(self.index.count(), 1)
+        # 다른 학생이 같은 글을 제출하면 따로 저장
+        self.index.add("s2", ESSAY, tokens(ESSAY))
+        self.assertEqual(self.index.count(), 2)
+
+    def test_one_student_does_not_fill_results(self):
+        for draft in DRAFTS:
+            self.index.add("s1", draft, tokens(draft))
+        self.index.add("s2", NEAR_COPY, tokens(NEAR_COPY))
+        students = [match['student'] for match in self.index.query(tokens(ESSAY))]
+        self.assertEqual(sorted(students), ["s1", "s2"])
+
+    def test_querying_student_is_excluded(self):
+        self.index.add("s1", ESSAY, tokens(ESSAY))
+        self.index.add("s2", NEAR_COPY, tokens(NEAR_COPY))
+        matches = self.index.query(tokens(ESSAY), exclude_student="s1")
+        self.assertEqual([match['student'] for match in matches], ["s2"])
+
+    def test_submission_is_checked_and_recorded(self):
+        self.assertEqual(self.index.add_and_query("s1", ESSAY, tokens(ESSAY)), [])
+        # 자기 글을 다시 제출해도 자기 글과 비교하지 않음
+        self.assertEqual(self.index.add_and_query("s1", ESSAY, tokens(ESSAY)), [])
+        matches = self.index.add_and_query("s2", NEAR_COPY, tokens(NEAR_COPY))
+        self.assertEqual([match['student'] for match in matches], ["s1"])
+        recorded = self.index.recent_matches()
+        self.assertEqual([(pair['student'], pair['match_student']) for pair in recorded], [("s2", "s1")])
+        self.assertEqual(self.index.students(), ["s1", "s2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,193 @@
+"""
+단어 빈도 순위 기반 어휘 프로파일 (NumPy)
+
+단어 빈도 목록을 한 번 "단어 → 순위" 표로 만들어 두고, 글의 토큰을 정수 순위 배열로
+바꾼 뒤 모든 지표를 배열 연산으로 계산합니다. 글 하나든 학급 전체든 같은 함수로
+한 번에 계산하며, 학급 전체는 (글 수 × 구간 수) 행렬로 돌려줍니다.
+
+지표:
+- band_counts: 빈도 구간(1K, 2K, 3K, 5K, 10K, 20K, 50K, 목록 밖)별 토큰 수
+- mean_rank / median_rank: 목록에 있는 토큰의 평균/중앙 빈도 순위
+- rare_ratio: 목록에 있는 토큰 중 순위가 RARE_RANK보다 낮은(드문) 단어 비율
+- off_list_ratio: 빈도 목록에 없는 토큰 비율 (고유명사, 철자 오류 등)
+- awl_coverage: 학술 단어 목록(AWL)에 속한 토큰 비율
+- sophistication: 목록에 있는 토큰 중 상위 2,000단어 밖의 비율 (Beyond-2000)
+- levels: 고유 단어 중 기초(상위 20%)/중급(20~50%)/고급(50% 이후) 비율
+  (기존 evaluate_vocabulary_level 결과와 같은 형식)
+"""
+import re
+
+import numpy as np
+
+BAND_EDGES = np.array([1000, 2000, 3000, 5000, 10000, 20000, 50000])
+BAND_LABELS = ["1K", "2K", "3K", "5K", "10K", "20K", "50K", "목록 밖"]
+RARE_RANK = 5000
+SOPHISTICATED_RANK = 2000
+LEVELS = ('basic', 'intermediate', 'advanced')
+# 내려받은 빈도 목록을 받아들이는 최소 단어 수와 줄 형식 ("단어 빈도")
+MIN_FREQUENCY_WORDS = 10000
+FREQUENCY_LINE = re.compile(r"\S+ \d+")
+
+
+def is_frequency_text(text, min_words=MIN_FREQUENCY_WORDS):
+    """
+    텍스트가 FrequencyWords 형식("단어 빈도" 줄 목록)의 빈도 목록인지 확인합니다.
+
+    Parameters:
+    - text: 확인할 텍스트
+    - min_words: 필요한 최소 줄 수
+    Returns:
+    - 빈 줄을 뺀 모든 줄이 형식에 맞고 줄 수가 min_words 이상이면 True
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    return len(lines) >= min_words and all(FREQUENCY_LINE.fullmatch(line) for line in lines)
+
+
+class FrequencyRanks:
+    """
+    단어 → 빈도 순위(1부터) 표와 어휘 수준 경계
+
+    Parameters:
+    - words: 빈도가 높은 순서로 정렬된 단어 목록
+    - level_cutoffs: (기초 마지막 순위, 중급 마지막 순위). None이면 상위 20% / 50%
+    """
+
+    def __init__(self, words, level_cutoffs=None):
+        self.rank_of = {}
+        for word in words:
+            self.rank_of.setdefault(word.lower(), len(self.rank_of) + 1)
+        self.size = len(self.rank_of)
+        if level_cutoffs is None:
+            level_cutoffs = (int(self.size * 0.2), int(self.size * 0.5))
+        self.level_cutoffs = np.array(level_cutoffs)
+
+    @classmethod
+    def from_frequency_text(cls, text):
+        """"단어 빈도" 형식의 줄 목록(FrequencyWords 형식)으로 만듭니다."""
+        return cls(line.split()[0] for line in text.splitlines() if ' ' in line)
+
+    @classmethod
+    def from_level_sets(cls, vocabulary_sets):
+        """{'basic': 집합, 'intermediate': 집합, 'advanced': 집합}으로 만듭니다 (빈도 목록이 없을 때)."""
+        words = []
+        for level in LEVELS:
+            words.extend(sorted(vocabulary_sets[level]))
+        basic = len(vocabulary_sets['basic'])
+        return cls(words, (basic, basic + len(vocabulary_sets['intermediate'])))
+
+    def lookup(self, words):
+        """단어 배열의 순위 배열을 반환합니다 (목록에 없으면 0)."""
+        return np.fromiter((self.rank_of.get(word, 0) for word in words), dtype=np.int64, count=len(words))
+
+
+def empty_profile():
+    return {
+        'token_count': 0,
+        'band_counts': dict.fromkeys(BAND_LABELS, 0),
+        'mean_rank': 0.0,
+        'median_rank': 0.0,
+        'rare_ratio': 0.0,
+        'off_list_ratio': 0.0,
+        'awl_coverage': 0.0,
+        'sophistication': 0.0,
+        'levels': dict.fromkeys(LEVELS, 0),
+    }
+
+
+def profile_batch(token_lists, frequency_ranks, academic_words=frozenset()):
+    """
+    여러 글의 어휘 프로파일을 한 번에 계산합니다.
+
+    Parameters:
+    - token_lists: 글마다 소문자 단어 토큰 목록
+    - frequency_ranks: FrequencyRanks
+    - academic_words: 학술 단어 집합
+
+    Returns:
+    - 지표 이름 → 배열 딕셔너리. band_counts는 (글 수, 구간 수), levels는 (글 수, 3) 행렬이고
+      나머지는 길이가 글 수인 배열입니다
+    """
+    essay_count = len(token_lists)
+    lengths = np.array([len(tokens) for tokens in token_lists], dtype=np.int64)
+    essay_index = np.repeat(np.arange(essay_count), lengths)
+    all_tokens = np.array([token for tokens in token_lists for token in tokens], dtype=object)
+
+    # 고유 단어만 한 번씩 표에서 찾고, 토큰은 고유 단어 번호로 순위를 가져옴
+    if len(all_tokens):
+        unique_words, word_ids = np.unique(all_tokens.astype(str), return_inverse=True)
+    else:
+        unique_words, word_ids = np.array([], dtype=str), np.array([], dtype=np.int64)
+    unique_ranks = frequency_ranks.lookup(unique_words)
+    unique_academic = np.fromiter((word in academic_words for word in unique_words), dtype=bool,
+                                  count=len(unique_words))
+    ranks = unique_ranks[word_ids]
+    in_list = ranks > 0
+
+    # 빈도 구간별 토큰 수 행렬
+    band_count = len(BAND_LABELS)
+    bands = np.where(in_list, np.minimum(np.searchsorted(BAND_EDGES, ranks), band_count - 2), band_count - 1)
+    band_counts = np.bincount(essay_index * band_count + bands,
+                              minlength=essay_count * band_count).reshape(essay_count, band_count)
+
+    in_list_counts = np.bincount(essay_index[in_list], minlength=essay_count)
+    safe_lengths = np.maximum(lengths, 1)
+    safe_in_list = np.maximum(in_list_counts, 1)
+
+    rank_sums = np.bincount(essay_index[in_list], weights=ranks[in_list], minlength=essay_count)
+    rare = np.bincount(essay_index[in_list & (ranks > RARE_RANK)], minlength=essay_count)
+    sophisticated = np.bincount(essay_index[in_list & (ranks > SOPHISTICATED_RANK)], minlength=essay_count)
+    academic = np.bincount(essay_index[unique_academic[word_ids]], minlength=essay_count)
+
+    # 중앙값: (글 번호, 순위)로 정렬한 뒤 글마다 가운데 위치를 한 번에 읽음
+    sorted_ranks = ranks[in_list][np.lexsort((ranks[in_list], essay_index[in_list]))]
+    starts = np.concatenate(([0], np.cumsum(in_list_counts)[:-1]))
+    lower = starts + np.maximum(in_list_counts - 1, 0) // 2
+    upper = starts + in_list_counts // 2
+    median_rank = np.zeros(essay_count)
+    has_ranks = in_list_counts > 0
+    if len(sorted_ranks):
+        median_rank[has_ranks] = (sorted_ranks[lower[has_ranks]] + sorted_ranks[upper[has_ranks]]) / 2
+
+    # 어휘 수준: 글마다 고유 단어 기준 (기존 evaluate_vocabulary_level과 같은 방식)
+    pairs = np.unique(essay_index * max(len(unique_words), 1) + word_ids)
+    pair_essays = pairs // max(len(unique_words), 1)
+    pair_ranks = unique_ranks[pairs % max(len(unique_words), 1)]
+    pair_in_list = pair_ranks > 0
+    pair_levels = np.searchsorted(frequency_ranks.level_cutoffs, pair_ranks[pair_in_list], side='left')
+    level_counts = np.bincount(pair_essays[pair_in_list] * 3 + pair_levels,
+                               minlength=essay_count * 3).reshape(essay_count, 3)
+    levels = level_counts / np.maximum(level_counts.sum(axis=1, keepdims=True), 1)
+
+    return {
+        'token_count': lengths,
+        'band_counts': band_counts,
+        'mean_rank': np.where(has_ranks, rank_sums / safe_in_list, 0.0),
+        'median_rank': median_rank,
+        'rare_ratio': rare / safe_in_list,
+        'off_list_ratio': (lengths - in_list_counts) / safe_lengths,
+        'awl_coverage': academic / safe_lengths,
+        'sophistication': sophisticated / safe_in_list,
+        'levels': levels,
+    }
+
+
+def batch_row(batch, index):
+    """profile_batch 결과에서 글 하나의 프로파일을 딕셔너리로 꺼냅니다."""
+    if batch['token_count'][index] == 0:
+        return empty_profile()
+    return {
+        'token_count': int(batch['token_count'][index]),
+        'band_counts': dict(zip(BAND_LABELS, batch['band_counts'][index].tolist())),
+        'mean_rank': float(batch['mean_rank'][index]),
+        'median_rank': float(batch['median_rank'][index]),
+        'rare_ratio': float(batch['rare_ratio'][index]),
+        'off_list_ratio': float(batch['off_list_ratio'][index]),
+        'awl_coverage': float(batch['awl_coverage'][index]),
+        'sophistication': float(batch['sophistication'][index]),
+        'levels': dict(zip(LEVELS, batch['levels'][index].tolist())),
+    }
+
+
+def profile_tokens(tokens, frequency_ranks, academic_words=frozenset()):
+    """글 하나의 어휘 프로파일을 딕셔너리로 반환합니다."""
+    return batch_row(profile_batch([tokens], frequency_ranks, academic_words), 0)